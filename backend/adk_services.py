@@ -1,32 +1,75 @@
+import asyncio
 from google.adk.agents import LlmAgent
+from google.adk.agents.readonly_context import ReadonlyContext
 from google.adk.runners import Runner
 from google.adk.sessions import DatabaseSessionService
 from database import DATABASE_URL
-from tools import get_transactions, get_budgets, get_goals, add_transaction
+from tools import (
+    get_transactions, get_budgets, get_goals, add_transaction, get_item_spending,
+    get_spending_summary, get_budget_utilization,
+)
+from model_router import model_router
+from snapshot import snapshot_cache
+from tool_runner import tool_runner
+from session_cache import CachedSessionService
+from metrics import instrument_engine
+from tracing import trace_engine
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Define the financial agent
-financial_agent = LlmAgent(
-    model="gemini-2.0-flash-live-001",
-    name="FinancialAgent",
-    instruction="""You are a helpful and friendly financial assistant.
+FINANCIAL_AGENT_INSTRUCTION = """You are a helpful and friendly financial assistant.
 A user is asking for advice about their finances or wants to log a transaction.
-- If the user asks about their spending, transactions, or recent activity, use the `get_transactions` tool.
-- If the user asks about their budgets, use the `get_budgets` tool.
+- If the user asks about totals, trends, categories, merchants or comparisons with earlier periods, use the `get_spending_summary` tool with a date range, category and grouping. It returns computed totals, so don't add numbers up yourself.
+- If the user asks about specific recent transactions, use the `get_transactions` tool.
+- If the user asks how they are doing against their budgets, use the `get_budget_utilization` tool; use `get_budgets` only for the configured limits.
 - If the user asks about their financial goals, use the `get_goals` tool.
+- If the user asks how much they spent on a specific item (e.g. 'coffee this quarter'), use the `get_item_spending` tool.
 - If the user says something like 'I bought something for this amount' or wants to log a purchase, use the `add_transaction` tool. If the user does not provide category, type, or date, you can decide/fill them yourself. Only description (what they bought) and amount (price) are required.
 - For general financial advice, answer based on your knowledge.
 The user ID is always provided by the backend; never ask the user for their ID. Assume all data you see is for the current user.
 Respond in a conversational, clear, and concise manner.
 Analyze the results from the tools to provide specific, actionable advice.
-""",
-    tools=[get_transactions, get_budgets, get_goals, add_transaction],
+"""
+
+async def financial_agent_instruction(ctx: ReadonlyContext) -> str:
+    """Base instruction plus the user's memoized financial snapshot, rebuilt only after writes."""
+    invocation = getattr(ctx, "_invocation_context", None)
+    user_id = getattr(invocation, "user_id", None) or "default"
+    try:
+        snapshot = await asyncio.to_thread(snapshot_cache.render, user_id)
+    except Exception as e:
+        logger.warning(f"Could not build financial snapshot: {e}")
+        return FINANCIAL_AGENT_INSTRUCTION
+    return (
+        FINANCIAL_AGENT_INSTRUCTION
+        + "\nCurrent financial snapshot for this user (JSON). Answer from it directly when it has what you need; "
+        + "use tools only for details it does not include or after recording a transaction:\n"
+        + snapshot
+    )
+
+AGENT_TOOLS = [
+    get_transactions, get_budgets, get_goals, add_transaction, get_item_spending,
+    get_spending_summary, get_budget_utilization,
+]
+tool_runner.register(AGENT_TOOLS)
+
+# Define the financial agent
+# Live sessions are long-lived, so the live tier is chosen once at startup
+financial_agent = LlmAgent(
+    model=model_router.route("live", needs_tools=True).model,
+    name="FinancialAgent",
+    instruction=financial_agent_instruction,
+    tools=AGENT_TOOLS,
+    # Runs every tool off the event loop with a timeout; see tool_runner.py
+    before_tool_callback=tool_runner.before_tool_callback,
 )
 
 # Setup ADK services
-session_service = DatabaseSessionService(db_url=DATABASE_URL)
+session_service = CachedSessionService(DatabaseSessionService(db_url=DATABASE_URL))
+# Count and time ADK's own session queries too; see metrics.py
+instrument_engine(session_service.inner.db_engine, "adk_sessions")
+trace_engine(session_service.inner.db_engine, "adk_sessions")
 runner = Runner(
     agent=financial_agent,
     app_name="PennyWise",
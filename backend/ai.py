@@ -1,23 +1,39 @@
 import os
 from dotenv import load_dotenv; load_dotenv()
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, HTTPException, Depends, WebSocket, UploadFile, File
-from fastapi.responses import StreamingResponse
-import base64
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, UploadFile, File, Request
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.websockets import WebSocketState
 import asyncio
+import time
 from sqlalchemy.orm import Session
 import logging
 from google.genai import types
 from google.genai.types import Content, Part, Blob
 from pydantic import BaseModel
 from google.adk.events import Event
-from google.adk.agents.run_config import RunConfig
-from google.adk.agents import LiveRequestQueue
 import json
 
-from database import get_db
+from database import get_db, get_data_version
 from adk_services import runner, session_service
 from receipt_service import receipt_service
+from gemini_service import gemini
+from response_cache import chat_cache, cache_opt_out
+from intents import intent_matcher
+from model_router import model_router
+from snapshot import snapshot_cache
+from tool_runner import tool_runner
+from session_compaction import session_compactor
+from session_registry import session_registry, session_identity, SessionIdentity, validate_id, DEFAULT_CONVERSATION_ID
+from receipt_store import receipt_store, ImageTooLargeError, UnsupportedImageTypeError
+from voice_protocol import VoiceProtocol, sample_rate_of, INPUT_SAMPLE_RATE
+from voice_outbound import OutboundAudioQueue, outbound_stats
+from voice_vad import VoiceActivityDetector, vad_stats, VAD_ENABLED
+from voice_pool import warm_pool
+from voice_resume import resume_store
+from voice_latency import latency_stats
+from tracing import current_context
+from voice_admission import voice_admission, CLOSE_TRY_AGAIN_LATER, VOICE_ADMISSION_WAIT_SECONDS
 
 # --- Pydantic Models ---
 
@@ -41,80 +57,123 @@ router = APIRouter(prefix="/api/ai", tags=["AI"])
 import json
 
 @router.websocket("/voice/ws/{user_id}")
-async def ai_voice_chat_ws(websocket: WebSocket, user_id: str):
-    """WebSocket endpoint for live AI voice chat (bidirectional audio/text)."""
+async def ai_voice_chat_ws(
+    websocket: WebSocket,
+    user_id: str,
+    conversation_id: str = DEFAULT_CONVERSATION_ID,
+    protocol: Optional[str] = None,
+    codec: Optional[str] = None,
+    rate: Optional[int] = None,
+    resume_token: Optional[str] = None,
+):
+    """
+    WebSocket endpoint for live AI voice chat (bidirectional audio/text).
+    Pass ?protocol=binary for binary audio frames, and optionally codec and rate
+    to negotiate the transport codec and the client's sample rate (see voice_protocol.py).
+    Pass the resume_token from the first message after a dropped connection to pick
+    the same live session back up (see voice_resume.py).
+    """
     await websocket.accept()
-    logger.info(f"Voice chat WebSocket connected for user: {user_id}")
-    
-    session_id = f"{user_id}_session"
-    
-    # Ensure session exists
+    voice = VoiceProtocol(websocket, protocol, codec, rate)
+    logger.info(f"Voice chat WebSocket connected for user: {user_id}, conversation: {conversation_id}")
+
     try:
-        session = await session_service.get_session(
-            app_name="PennyWise", user_id=user_id, session_id=session_id
+        identity = SessionIdentity(
+            user_id=validate_id(user_id, "user id"),
+            conversation_id=validate_id(conversation_id, "conversation id"),
         )
-        logger.info(f"Retrieved existing session: {session_id}")
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+
+    # A client coming back from a dropped connection reattaches to its parked live session
+    parked = resume_store.resume(resume_token, identity.user_id) if resume_token else None
+    if parked:
+        identity = parked.identity
+
+    # Cap concurrent live sessions; a resumed one still holds its slot (see voice_admission.py)
+    if not parked and not await voice_admission.acquire(identity.user_id, warm_pool.has_warm(identity)):
+        await voice.send_control({
+            "error": True,
+            "type": "capacity",
+            "message": "Voice chat is at capacity, please try again shortly",
+            "retry_after_seconds": VOICE_ADMISSION_WAIT_SECONDS,
+        })
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Voice capacity reached")
+        return
+
+    # Each user/conversation gets its own session
+    try:
+        session = await session_registry.acquire(identity, "voice")
+        logger.info(f"Using session: {identity.session_id}")
     except Exception as e:
-        logger.info(f"Creating new session: {session_id}, reason: {e}")
-        try:
-            session = await session_service.create_session(
-                app_name="PennyWise", user_id=user_id, session_id=session_id
-            )
-            logger.info(f"Successfully created new session: {session_id}")
-        except Exception as create_error:
-            logger.error(f"Failed to create session: {create_error}")
-            await websocket.close(code=1011, reason="Session creation failed")
-            return
+        logger.error(f"Failed to get or create session {identity.session_id}: {e}")
+        if parked:
+            resume_store.park(parked.token, identity, parked.live, parked.outbound, parked.agent_task)
+        else:
+            voice_admission.release(identity.user_id)
+        await websocket.close(code=1011, reason="Session creation failed")
+        return
 
-    # Set up ADK live session for AUDIO modality with optimized VAD
+    # Claim a pre-warmed live session for this conversation, or start one (see voice_pool.py)
+    live = None
     try:
-        run_config = RunConfig(
-            response_modalities=["AUDIO"],
-            realtime_input_config={
-                "automatic_activity_detection": {
-                    "disabled": False,  # Enable automatic VAD
-                    # Optimized settings for better responsiveness
-                    "start_of_speech_sensitivity": types.StartSensitivity.START_SENSITIVITY_HIGH,
-                    "end_of_speech_sensitivity": types.EndSensitivity.END_SENSITIVITY_HIGH,
-                    "prefix_padding_ms": 200,  # Capture beginning of speech
-                    "silence_duration_ms": 600,  # Faster response time
-                }
-            }
-        )
-        
-        live_request_queue = LiveRequestQueue()
-        live_events = runner.run_live(
-            session=session,
-            live_request_queue=live_request_queue,
-            run_config=run_config,
-        )
-        logger.info("Live session started successfully with optimized VAD")
+        if parked:
+            live, outbound, agent_task = parked.live, parked.outbound, parked.agent_task
+            token = parked.token
+            outbound.attach(voice)
+        else:
+            live, was_warm = await warm_pool.claim(identity, session)
+            logger.info(f"Live session started successfully with optimized VAD ({'warm' if was_warm else 'cold'})")
+            # Everything for the client goes through this queue; see voice_outbound.py
+            outbound = OutboundAudioQueue(voice)
+            # Per-turn timing, end of speech to first audio byte; see voice_latency.py
+            outbound.on_audio_sent = live.turns.audio_sent
+            agent_task = None
+            token = resume_store.new_token() if resume_store.enabled else None
+        live_request_queue = live.queue
+        turns = live.turns
+        turns.trace_parent = current_context()
+        await voice.send_hello({"resume_token": token, "resumed": parked is not None})
+        # Silence is dropped before it reaches the model; see voice_vad.py
+        vad = VoiceActivityDetector(INPUT_SAMPLE_RATE, identity.session_id) if VAD_ENABLED else None
         
     except Exception as e:
         logger.error(f"Failed to start live session: {e}")
+        session_registry.release(identity, "voice")
+        if parked:
+            # Leave it for another attempt within the grace period
+            resume_store.park(parked.token, identity, parked.live, parked.outbound, parked.agent_task)
+        else:
+            if live:
+                live.close()
+            voice_admission.release(identity.user_id)
         await websocket.close(code=1011, reason="Live session setup failed")
         return
 
     async def agent_to_client():
         try:
-            async for event in live_events:
+            async for event in live.events():
+                turns.model_event(event)
                 # Handle turn complete/interrupted with immediate response
                 if getattr(event, "turn_complete", False):
                     logger.info("AI turn completed")
-                    message = {
+                    turns.turn_complete()
+                    outbound.push_control({
                         "turn_complete": True,
                         "interrupted": False,
-                    }
-                    await websocket.send_text(json.dumps(message))
+                    })
                     continue
                     
                 if getattr(event, "interrupted", False):
                     logger.info("AI generation interrupted")
-                    message = {
+                    turns.interrupted()
+                    # Barge-in: stop playback of anything not yet sent
+                    outbound.purge()
+                    outbound.push_control({
                         "turn_complete": False,
                         "interrupted": True,
-                    }
-                    await websocket.send_text(json.dumps(message))
+                    })
                     continue
 
                 part = event.content.parts[0] if event.content and event.content.parts else None
@@ -126,11 +185,7 @@ async def ai_voice_chat_ws(websocket: WebSocket, user_id: str):
                     audio_data = part.inline_data.data
                     if audio_data:
                         logger.debug(f"Sending audio response: {len(audio_data)} bytes")
-                        message = {
-                            "mime_type": "audio/pcm",
-                            "data": base64.b64encode(audio_data).decode("ascii")
-                        }
-                        await websocket.send_text(json.dumps(message))
+                        outbound.push_audio(audio_data, sample_rate_of(part.inline_data.mime_type))
                     continue
                     
                 # Text response (for live transcript during generation)
@@ -138,33 +193,61 @@ async def ai_voice_chat_ws(websocket: WebSocket, user_id: str):
                     # Only send partial text if it's meaningful
                     text_content = part.text.strip()
                     if text_content and len(text_content) > 2:
-                        message = {
+                        outbound.push_control({
                             "mime_type": "text/plain",
                             "data": text_content,
                             "partial": getattr(event, "partial", False)
-                        }
-                        await websocket.send_text(json.dumps(message))
+                        })
         except Exception as e:
             logger.error(f"Error in agent_to_client: {e}")
             # Send error message to client
-            error_message = {
+            outbound.push_control({
                 "error": True,
                 "message": "Connection error occurred"
-            }
-            try:
-                await websocket.send_text(json.dumps(error_message))
-            except:
-                pass
+            })
+
+    # Close code the client sent, if it closed the socket itself
+    close_code = None
 
     async def client_to_agent():
+        nonlocal close_code
         try:
             while True:
-                message_json = await websocket.receive_text()
-                message = json.loads(message_json)
+                received = await websocket.receive()
+                if received["type"] == "websocket.disconnect":
+                    close_code = received.get("code")
+                    return
+                try:
+                    audio, message = voice.parse_incoming(received)
+                    pcm = await voice.to_model_pcm(audio) if audio else None
+                except ValueError as e:
+                    logger.warning(f"Dropping malformed voice frame: {e}")
+                    continue
+
+                if pcm:
+                    for kind, data in (vad.process(pcm) if vad else [("audio", pcm)]):
+                        if kind == "audio":
+                            turns.audio_chunk()
+                            # Use send_realtime for immediate processing
+                            live_request_queue.send_realtime(
+                                types.Blob(data=data, mime_type=f"audio/pcm;rate={INPUT_SAMPLE_RATE}")
+                            )
+                        else:
+                            # Speech segment started/ended; the hangover already carries the
+                            # trailing silence Gemini needs to close the turn
+                            logger.debug(f"VAD activity {kind} on {identity.session_id}")
+                            if kind == "end":
+                                turns.vad_end(vad.hangover_ms)
+                            outbound.push_control({"type": "vad", "activity": kind})
+                    continue
+                if message is None:
+                    continue
                 
                 # Handle interrupt message with priority
                 if message.get("type") == "interrupt":
                     logger.info("Received interrupt signal from client")
+                    outbound.purge()
+                    turns.interrupted()
                     # Cancel current AI response immediately
                     try:
                         if hasattr(live_request_queue, "cancel"):
@@ -180,22 +263,9 @@ async def ai_voice_chat_ws(websocket: WebSocket, user_id: str):
                 data = message.get("data")
                 
                 if mime_type == "text/plain" and data:
+                    turns.text()
                     content = types.Content(role="user", parts=[types.Part.from_text(text=data)])
                     live_request_queue.send_content(content=content)
-                    
-                elif mime_type == "audio/pcm" and data:
-                    try:
-                        decoded_data = base64.b64decode(data)
-                        # Use send_realtime for immediate processing
-                        live_request_queue.send_realtime(
-                            types.Blob(data=decoded_data, mime_type="audio/pcm;rate=16000")
-                        )
-                        # Log audio data size occasionally for debugging
-                        if len(decoded_data) > 0:
-                            logger.debug(f"Processed audio chunk: {len(decoded_data)} bytes")
-                    except Exception as e:
-                        logger.warning(f"Error processing audio data: {e}")
-                        continue
                         
         except Exception as e:
             logger.error(f"Error in client_to_agent: {e}")
@@ -203,18 +273,37 @@ async def ai_voice_chat_ws(websocket: WebSocket, user_id: str):
             return
 
     # Run both directions concurrently with better error handling
+    park = False
     try:
-        agent_task = asyncio.create_task(agent_to_client())
+        # A resumed connection keeps the task that has been filling the queue while it was away
+        if agent_task is None:
+            agent_task = asyncio.create_task(agent_to_client())
         client_task = asyncio.create_task(client_to_agent())
+        sender_task = asyncio.create_task(outbound.run())
         
-        # Wait for either task to complete or fail
+        # Stop as soon as any side ends: client gone, model stream over, or socket send failed
         done, pending = await asyncio.wait(
-            [agent_task, client_task], 
-            return_when=asyncio.FIRST_EXCEPTION
+            [agent_task, client_task, sender_task], 
+            return_when=asyncio.FIRST_COMPLETED
         )
         
+        # The model stream ended (or failed and queued an error): let the client get
+        # what is still queued, the tail of the reply and that error, before stopping
+        if agent_task in done and sender_task in pending:
+            if not await outbound.drain():
+                logger.warning("Voice output not drained in time, dropping the rest")
+
+        # The socket dropped without a normal close while the model is still connected:
+        # keep the live session and its output for the client to resume
+        park = (
+            token is not None and close_code != 1000
+            and not agent_task.done() and live.alive
+        )
+
         # Cancel pending tasks
         for task in pending:
+            if park and task is agent_task:
+                continue
             task.cancel()
             try:
                 await task
@@ -232,47 +321,148 @@ async def ai_voice_chat_ws(websocket: WebSocket, user_id: str):
         logger.error(f"WebSocket connection error: {e}")
     finally:
         # Clean up resources
-        try:
-            live_request_queue.close()
-        except Exception as e:
-            logger.warning(f"Error closing live_request_queue: {e}")
+        session_registry.release(identity, "voice")
+        if vad:
+            vad.close()
+        if park:
+            resume_store.park(token, identity, live, outbound, agent_task)
+        else:
+            agent_task.cancel()
+            live.close()
+            voice_admission.release(identity.user_id)
+            # The socket dropped rather than being closed on purpose: have a live session
+            # ready for the reconnect. A client that hung up warms again via /voice/warm.
+            if close_code not in (None, 1000, 1001):
+                warm_pool.warm(identity)
         
         try:
-            if websocket.client_state.CONNECTED:
+            if websocket.client_state == WebSocketState.CONNECTED:
                 await websocket.close()
         except Exception as e:
             logger.warning(f"Error closing websocket: {e}")
 
+def sse_event(data: str, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event; multi-line text becomes several data: lines."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+async def open_routed_stream(decision, contents):
+    """
+    Start a streaming call on the routed model and wait for its first chunk.
+    If that takes longer than the tier's timeout or fails, move on to the next tier.
+    Returns (stream, first_chunk); first_chunk is None for an empty response.
+    """
+    candidates = decision.candidates
+    for index, candidate in enumerate(candidates):
+        stream = gemini.generate_content_stream(model=candidate["model"], contents=contents)
+        try:
+            first_chunk = await asyncio.wait_for(anext(stream, None), timeout=candidate["timeout_s"])
+            return stream, first_chunk
+        except Exception as e:
+            await stream.aclose()
+            if index == len(candidates) - 1:
+                raise
+            if isinstance(e, asyncio.TimeoutError):
+                model_router.observe(candidate["model"], candidate["timeout_s"] * 1000, error=True)
+            logger.warning(f"Chat model {candidate['model']} failed ({e!r}), falling back to {candidates[index + 1]['model']}")
+
+async def prepend_chunk(first_chunk, stream):
+    if first_chunk is not None:
+        yield first_chunk
+    async for chunk in stream:
+        yield chunk
+
 @router.post("/chat/stream")
-async def chat_stream(request: FinancialAdviceRequest):
-    """Stream AI chat response using standard Gemini API for text chat."""
-    from google import genai
+async def chat_stream(request: FinancialAdviceRequest, http_request: Request):
+    """Stream AI chat response token by token using the async Gemini streaming API."""
+    # Questions answerable exactly from the database skip the model entirely
+    local_answer = await asyncio.to_thread(intent_matcher.answer, request.prompt)
+    if local_answer is not None:
+        intent, text = local_answer
+        logger.info(f"Answered chat locally via intent '{intent}'")
+        
+        async def local_event_generator():
+            yield sse_event(text)
+            yield sse_event(json.dumps({"ttft_ms": 0, "total_ms": 0, "local": True, "intent": intent}), event="done")
+        
+        return StreamingResponse(
+            local_event_generator(), media_type="text/event-stream",
+            headers={**SSE_HEADERS, "X-Answered-By": "local"}
+        )
+    
+    use_cache = not cache_opt_out(http_request.headers.get("cache-control"))
+    # Read before generating, so an answer that raced a write is never cached as current
+    data_version = get_data_version()
+    cached_chunks = chat_cache.get("chat", request.prompt, data_version) if use_cache else None
     
     try:
-        # Initialize Gemini client
-        client = genai.Client()
+        async def cached_event_generator():
+            # Replay a cached answer over the same streaming protocol
+            logger.info(f"Serving cached chat response: {request.prompt[:50]}...")
+            for text in cached_chunks:
+                yield sse_event(text)
+            yield sse_event(json.dumps({"ttft_ms": 0, "total_ms": 0, "cached": True}), event="done")
         
         async def event_generator():
+            started = time.perf_counter()
+            first_token_ms = None
+            stream = None
+            chunks = []
             try:
                 logger.info(f"Using standard Gemini API for text chat: {request.prompt[:50]}...")
                 
-                # Use standard Gemini model for text chat (not live model)
-                response = client.models.generate_content(
-                    model='gemini-2.5-flash-lite-preview-06-17',
-                    contents=[request.prompt]
-                )
+                # Use a routed standard Gemini model for text chat (not live model)
+                decision = model_router.route("chat", prompt_chars=len(request.prompt))
+                stream, first_chunk = await open_routed_stream(decision, [request.prompt])
                 
-                if response.text:
-                    logger.info(f"Generated response: {response.text[:100]}...")
-                    yield f"data: {response.text}\n\n"
-                else:
-                    yield f"data: I apologize, but I couldn't generate a response. Please try again.\n\n"
+                async for chunk in prepend_chunk(first_chunk, stream):
+                    if await http_request.is_disconnected():
+                        logger.info("Chat stream client disconnected, cancelling generation")
+                        return
+                    if not chunk.text:
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - started) * 1000
+                        logger.info(f"Chat stream time to first token: {first_token_ms:.0f}ms")
+                    chunks.append(chunk.text)
+                    yield sse_event(chunk.text)
+                
+                if first_token_ms is None:
+                    yield sse_event("I apologize, but I couldn't generate a response. Please try again.")
+                elif use_cache:
+                    chat_cache.put("chat", request.prompt, chunks, data_version)
+                
+                total_ms = (time.perf_counter() - started) * 1000
+                logger.info(f"Chat stream completed in {total_ms:.0f}ms")
+                yield sse_event(json.dumps({
+                    "ttft_ms": round(first_token_ms or total_ms),
+                    "total_ms": round(total_ms),
+                    "cached": False,
+                }), event="done")
                     
+            except asyncio.CancelledError:
+                logger.info("Chat stream cancelled by client disconnect")
+                raise
             except Exception as e:
                 logger.error(f"Error in standard Gemini API: {e}")
-                yield f"data: Error processing request: {str(e)}\n\n"
+                yield sse_event(f"Error processing request: {str(e)}", event="error")
+            finally:
+                # Closing the response stream aborts the upstream HTTP request
+                if stream is not None:
+                    await stream.aclose()
 
-        return StreamingResponse(event_generator(), media_type="text/plain")
+        if cached_chunks is not None:
+            return StreamingResponse(
+                cached_event_generator(), media_type="text/event-stream",
+                headers={**SSE_HEADERS, "X-Cache": "HIT"}
+            )
+        return StreamingResponse(
+            event_generator(), media_type="text/event-stream",
+            headers={**SSE_HEADERS, "X-Cache": "MISS" if use_cache else "BYPASS"}
+        )
         
     except Exception as e:
         logger.error(f"Chat stream error: {e}")
@@ -293,22 +483,33 @@ async def upload_receipt(file: UploadFile = File(...)):
                 message="File must be an image (JPEG, PNG, etc.)"
             )
         
-        # Read file data
-        image_data = await file.read()
-        
-        # Check file size (limit to 20MB as per Gemini docs)
-        if len(image_data) > 20 * 1024 * 1024:
+        # Stream the upload into the content-addressed store (limit 20MB as per Gemini docs)
+        try:
+            image_hash = await receipt_store.save_upload(
+                file, mime_type=file.content_type, max_bytes=20 * 1024 * 1024
+            )
+        except ImageTooLargeError:
             return ReceiptUploadResponse(
                 success=False,
                 error="File too large. Maximum size is 20MB.",
                 message="Please upload a smaller image file."
             )
+        except UnsupportedImageTypeError:
+            return ReceiptUploadResponse(
+                success=False,
+                error=f"Unsupported image type: {file.content_type}",
+                message="Please upload a JPEG, PNG, WebP or HEIC image."
+            )
+        
+        # Gemini needs the image inline, so read it back from the store
+        image_data = await asyncio.to_thread(receipt_store.read_bytes, image_hash)
         
         # Process the receipt
         receipt_data = await receipt_service.extract_receipt_data(
             image_data=image_data,
             mime_type=file.content_type
         )
+        receipt_data["image_hash"] = image_hash
         
         # Check if processing was successful
         if "error" in receipt_data:
@@ -333,10 +534,26 @@ async def upload_receipt(file: UploadFile = File(...)):
         )
 
 
+def _format_line_items(receipt_data: Dict[str, Any]) -> str:
+    """Items with their prices, so the agent can pass amounts on to add_transaction."""
+    line_items = receipt_data.get("line_items") or [{"name": name} for name in receipt_data.get("items", [])]
+    parts = []
+    for item in line_items:
+        text = str(item.get("name", ""))
+        quantity, amount = item.get("quantity"), item.get("amount")
+        if isinstance(quantity, (int, float)):
+            text += f" x{quantity:g}"
+        if isinstance(amount, (int, float)):
+            text += f" ${amount:.2f}"
+        parts.append(text)
+    return ", ".join(parts) or "none"
+
+
 @router.post("/chat/receipt")
 async def chat_with_receipt_data(
     prompt: str,
-    receipt_data: Dict[str, Any]
+    receipt_data: Dict[str, Any],
+    identity: SessionIdentity = Depends(session_identity)
 ):
     """
     Send receipt data to AI chat for transaction creation suggestions.
@@ -350,27 +567,18 @@ Receipt Information Extracted:
 - Date: {receipt_data.get('date', 'Unknown')}
 - Category: {receipt_data.get('category', 'miscellaneous')}
 - Description: {receipt_data.get('description', 'Receipt purchase')}
-- Items: {', '.join(receipt_data.get('items', []))}
+- Items: {_format_line_items(receipt_data)}
 - Confidence: {receipt_data.get('confidence', 'medium')}
+- Receipt image: {receipt_data.get('image_hash', 'none')}
 
 User Request: {prompt}
 
-Please help the user with this receipt data. If they want to add this as a transaction, you can use the add_transaction tool with the extracted information.
+Please help the user with this receipt data. If they want to add this as a transaction, you can use the add_transaction tool with the extracted information, including the receipt image and the items as objects with name, amount and quantity.
 """
         
-        # Use the existing chat stream functionality
-        user_id = "user_123"
-        session_id = f"{user_id}_session"
-        
-        # Get or create session
-        try:
-            session = await session_service.get_session(
-                app_name="PennyWise", user_id=user_id, session_id=session_id
-            )
-        except Exception:
-            session = await session_service.create_session(
-                app_name="PennyWise", user_id=user_id, session_id=session_id
-            )
+        # Run in the caller's own conversation session
+        user_id = identity.user_id
+        session_id = identity.session_id
         
         # Create user message with receipt context
         user_message = types.Content(role='user', parts=[types.Part(text=receipt_summary)])
@@ -378,6 +586,7 @@ Please help the user with this receipt data. If they want to add this as a trans
         # Stream the response
         async def event_generator():
             try:
+                await session_registry.acquire(identity, "chat")
                 response_found = False
                 async for event in runner.run_async(
                     user_id=user_id, session_id=session_id, new_message=user_message
@@ -390,18 +599,20 @@ Please help the user with this receipt data. If they want to add this as a trans
                         if event.content and event.content.parts:
                             text = event.content.parts[0].text
                             if text:
-                                yield f"data: {text}\n\n"
+                                yield sse_event(text)
                                 response_found = True
                         break
                 
                 if not response_found:
-                    yield f"data: I've received the receipt information. Would you like me to add this as a transaction to your records?\n\n"
+                    yield sse_event("I've received the receipt information. Would you like me to add this as a transaction to your records?")
                         
             except Exception as e:
                 logger.error(f"Error in receipt chat: {e}")
-                yield f"data: Error processing receipt chat: {str(e)}\n\n"
+                yield sse_event(f"Error processing receipt chat: {str(e)}", event="error")
+            finally:
+                session_registry.release(identity, "chat")
         
-        return StreamingResponse(event_generator(), media_type="text/plain")
+        return StreamingResponse(event_generator(), media_type="text/event-stream", headers=SSE_HEADERS)
         
     except Exception as e:
         logger.error(f"Receipt chat error: {e}")
@@ -409,48 +620,50 @@ Please help the user with this receipt data. If they want to add this as a trans
 
 
 @router.post("/session/init")
-async def initialize_session():
-    """Initialize or reset the AI chat session."""
-    user_id = "user_123"
-    session_id = f"{user_id}_session"
-    
+async def initialize_session(new_conversation: bool = False, identity: SessionIdentity = Depends(session_identity)):
+    """Initialize the caller's AI chat session; new_conversation=true starts a fresh one."""
+    if new_conversation:
+        identity = SessionIdentity(identity.user_id, session_registry.new_conversation_id())
+
     try:
-        # Following ADK documentation pattern - just create a new session
-        session = await session_service.create_session(
-            app_name="PennyWise", user_id=user_id, session_id=session_id
-        )
-        logger.info(f"Initialized session: {session_id}")
-        
-        return {"status": "success", "session_id": session_id, "message": "Session initialized successfully"}
-        
+        await session_registry.get_or_create(identity)
+        logger.info(f"Initialized session: {identity.session_id}")
+        return {
+            "status": "success",
+            "user_id": identity.user_id,
+            "conversation_id": identity.conversation_id,
+            "session_id": identity.session_id,
+            "message": "Session initialized successfully"
+        }
     except Exception as e:
-        # Session might already exist, which is fine
-        logger.info(f"Session may already exist: {e}")
-        return {"status": "success", "session_id": session_id, "message": "Session ready (may have already existed)"}
+        logger.error(f"Failed to initialize session {identity.session_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to initialize session: {str(e)}")
 
 
 @router.get("/session/status")
-async def get_session_status():
-    """Get the status of the current AI chat session."""
-    user_id = "user_123"
-    session_id = f"{user_id}_session"
-    
+async def get_session_status(identity: SessionIdentity = Depends(session_identity)):
+    """Get the status of the caller's AI chat session."""
     try:
-        session = await session_service.get_session(
-            app_name="PennyWise", user_id=user_id, session_id=session_id
-        )
+        exists = await session_registry.exists(identity)
         return {
-            "status": "exists",
-            "session_id": session_id,
-            "message": "Session is ready"
+            "status": "exists" if exists else "not_found",
+            "conversation_id": identity.conversation_id,
+            "session_id": identity.session_id,
+            "message": "Session is ready" if exists else "Session not found"
         }
     except Exception as e:
         return {
             "status": "not_found",
-            "session_id": session_id,
+            "session_id": identity.session_id,
             "message": f"Session not found: {str(e)}"
         }
 
+
+@router.get("/sessions")
+async def list_conversations(identity: SessionIdentity = Depends(session_identity)):
+    """The caller's recently used conversations and their live connections."""
+    return {"user_id": identity.user_id, "conversations": session_registry.conversations(identity.user_id)}
+
 @router.get("/health")
 async def ai_health_check():
     """Health check for AI service."""
@@ -461,17 +674,85 @@ async def ai_health_check():
             "service": "AI Chat",
             "runner_available": runner is not None,
             "session_service_available": session_service is not None,
+            "gemini_calls": gemini.stats(),
+            "chat_cache": chat_cache.stats(),
+            "fast_path": intent_matcher.stats(),
+            "model_health": model_router.stats(),
+            "financial_snapshot": snapshot_cache.stats(),
             "message": "AI service is operational"
         }
     except Exception as e:
         logger.error(f"AI health check failed: {e}")
         raise HTTPException(status_code=500, detail=f"AI service unhealthy: {str(e)}")
 
+def _process_usage() -> Dict[str, Any]:
+    """CPU time and resident memory of this worker, so load tests can work out cost per voice session."""
+    times = os.times()
+    usage = {"cpu_seconds": round(times.user + times.system, 3), "rss_mb": None}
+    try:
+        with open("/proc/self/statm") as f:
+            usage["rss_mb"] = round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        pass  # Not Linux
+    return usage
+
+@router.get("/voice/stats")
+async def voice_stats():
+    """Voice counters: outbound frames/drops/purges, VAD forwarded vs suppressed, warm pool claims and ready latency, resumes, admission, process usage."""
+    return {
+        "outbound": outbound_stats(),
+        "vad": vad_stats(),
+        "warm_pool": warm_pool.stats(),
+        "resume": resume_store.stats(),
+        "admission": voice_admission.stats(),
+        "process": _process_usage(),
+    }
+
+@router.get("/voice/latency")
+async def voice_latency():
+    """Per-turn voice latency histograms (end of speech to first audio byte, tool calls, ...) and the latest turns."""
+    return latency_stats()
+
+@router.get("/voice/capacity")
+async def voice_capacity():
+    """
+    This worker's live voice utilization, for load balancer health checks:
+    503 while every slot is taken, so new sessions go to workers with room.
+    """
+    stats = voice_admission.stats()
+    return JSONResponse(stats, status_code=200 if stats["accepting"] else 503)
+
+@router.post("/voice/warm")
+async def warm_voice_session(identity: SessionIdentity = Depends(session_identity)):
+    """Pre-establish a live session for the caller's conversation, e.g. when the voice screen opens."""
+    warm_pool.warm(identity)
+    return {"status": "warming", "session_id": identity.session_id}
+
+@router.get("/tools/stats")
+async def tool_stats():
+    """Latency histograms, timeouts and errors for each agent tool."""
+    return tool_runner.stats()
+
+@router.get("/sessions/stats")
+async def session_stats():
+    """Session cache hit rate and write batching, plus compaction results per session."""
+    return {
+        "registry": session_registry.stats(),
+        "cache": session_service.stats(),
+        "compaction": session_compactor.stats(),
+    }
+
+@router.post("/sessions/compact")
+async def compact_sessions():
+    """Run a compaction pass now instead of waiting for the background task."""
+    await session_compactor.compact_all()
+    return {"cache": session_service.stats(), "compaction": session_compactor.stats()}
+
 @router.get("/debug/session")
-async def debug_session():
+async def debug_session(identity: SessionIdentity = Depends(session_identity)):
     """Debug endpoint to check session service functionality."""
-    user_id = "user_123"
-    session_id = f"{user_id}_session"
+    user_id = identity.user_id
+    session_id = identity.session_id
     
     try:
         # Test session retrieval first
@@ -484,8 +765,8 @@ async def debug_session():
             retrieved_session = await session_service.get_session(
                 app_name="PennyWise", user_id=user_id, session_id=session_id
             )
-            session_exists = True
-            logger.info("Session already exists")
+            session_exists = retrieved_session is not None
+            logger.info(f"Session exists: {session_exists}")
         except Exception as get_error:
             logger.info(f"Session doesn't exist: {get_error}")
         
@@ -526,10 +807,10 @@ async def debug_session():
         }
 
 @router.get("/debug/runner")
-async def debug_runner():
+async def debug_runner(identity: SessionIdentity = Depends(session_identity)):
     """Debug endpoint to check runner configuration."""
-    user_id = "user_123"
-    session_id = f"{user_id}_session"
+    user_id = identity.user_id
+    session_id = identity.session_id
     
     try:
         # Check runner configuration
@@ -567,10 +848,10 @@ async def debug_runner():
         }
 
 @router.post("/debug/chat")
-async def debug_chat(request: FinancialAdviceRequest):
+async def debug_chat(request: FinancialAdviceRequest, identity: SessionIdentity = Depends(session_identity)):
     """Debug endpoint that mimics the chat functionality step by step."""
-    user_id = "user_123"
-    session_id = f"{user_id}_session"
+    user_id = identity.user_id
+    session_id = identity.session_id
     
     debug_info = {
         "user_id": user_id,
@@ -581,11 +862,9 @@ async def debug_chat(request: FinancialAdviceRequest):
     
     try:
         # Step 1: Check session exists
-        debug_info["steps"].append("Checking session exists...")
-        session = await session_service.get_session(
-            app_name="PennyWise", user_id=user_id, session_id=session_id
-        )
-        debug_info["steps"].append("✅ Session found")
+        debug_info["steps"].append("Getting or creating session...")
+        await session_registry.get_or_create(identity)
+        debug_info["steps"].append("✅ Session ready")
         
         # Step 2: Create user message
         debug_info["steps"].append("Creating user message...")
@@ -0,0 +1,243 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import TransactionDB, BudgetDB, GoalDB, TransactionType, BudgetPeriod
+
+# Shared by the /api/analytics endpoints and the AI fast path
+
+
+def total_balance(db: Session) -> float:
+    return db.query(func.sum(TransactionDB.amount)).scalar() or 0.0
+
+def monthly_income(db: Session) -> float:
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    
+    # Parse date strings and filter by current month/year
+    transactions = db.query(TransactionDB).filter(
+        TransactionDB.type == TransactionType.income
+    ).all()
+    
+    income = 0.0
+    for transaction in transactions:
+        try:
+            transaction_date = datetime.fromisoformat(transaction.date.replace('Z', '+00:00'))
+            if (transaction_date.month == current_month and 
+                transaction_date.year == current_year):
+                income += transaction.amount
+        except:
+            continue
+    
+    return income
+
+def monthly_expenses(db: Session) -> float:
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    
+    # Parse date strings and filter by current month/year
+    transactions = db.query(TransactionDB).filter(
+        TransactionDB.type == TransactionType.expense
+    ).all()
+    
+    expenses = 0.0
+    for transaction in transactions:
+        try:
+            transaction_date = datetime.fromisoformat(transaction.date.replace('Z', '+00:00'))
+            if (transaction_date.month == current_month and 
+                transaction_date.year == current_year):
+                expenses += abs(transaction.amount)
+        except:
+            continue
+    
+    return expenses
+
+def spending_by_category(db: Session, days: int = 30) -> Dict[str, float]:
+    cutoff_date = datetime.now() - timedelta(days=days)
+    
+    # Get expense transactions within the date range
+    transactions = db.query(TransactionDB).filter(
+        TransactionDB.type == TransactionType.expense
+    ).all()
+    
+    spending = {}
+    for transaction in transactions:
+        try:
+            transaction_date = datetime.fromisoformat(transaction.date.replace('Z', '+00:00'))
+            if transaction_date >= cutoff_date:
+                category = transaction.category
+                amount = abs(transaction.amount)
+                spending[category] = spending.get(category, 0.0) + amount
+        except:
+            continue
+    
+    return spending
+
+
+# Aggregates for the agent tools. Dates are stored as ISO strings in mixed
+# precision, so comparisons and grouping use their YYYY-MM-DD prefix in SQL.
+
+_day = func.substr(TransactionDB.date, 1, 10)
+_GROUPINGS = {
+    "category": TransactionDB.category,
+    "merchant": TransactionDB.description,
+    "day": _day,
+    "week": func.strftime("%Y-W%W", _day),
+    "month": func.substr(TransactionDB.date, 1, 7),
+}
+
+
+def _totals(db: Session, start_date: str, end_date: str, category: Optional[str]) -> Dict[str, float]:
+    query = db.query(
+        TransactionDB.type,
+        func.coalesce(func.sum(func.abs(TransactionDB.amount)), 0.0),
+        func.count(TransactionDB.id),
+    ).filter(_day >= start_date, _day <= end_date)
+    if category:
+        query = query.filter(func.lower(TransactionDB.category) == category.lower())
+    totals = {"income": 0.0, "expenses": 0.0, "count": 0}
+    for tx_type, total, count in query.group_by(TransactionDB.type).all():
+        totals["income" if tx_type == TransactionType.income else "expenses"] += total
+        totals["count"] += count
+    return totals
+
+
+def _delta(current: float, previous: float) -> Dict[str, Optional[float]]:
+    change = current - previous
+    return {
+        "previous": round(previous, 2),
+        "change": round(change, 2),
+        "change_pct": round(change / previous * 100, 1) if previous else None,
+    }
+
+
+def spending_summary(
+    db: Session,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    category: Optional[str] = None,
+    group_by: str = "category",
+    top_n: int = 5,
+) -> Dict[str, Any]:
+    """Totals, grouped expenses, top merchants and change vs. the previous period of equal length."""
+    today = datetime.now().date()
+    start = date.fromisoformat(start_date[:10]) if start_date else today.replace(day=1)
+    end = date.fromisoformat(end_date[:10]) if end_date else today
+    start_s, end_s = start.isoformat(), end.isoformat()
+    group_column = _GROUPINGS.get(group_by, TransactionDB.category)
+
+    totals = _totals(db, start_s, end_s, category)
+    previous_end = start - timedelta(days=1)
+    previous_start = previous_end - (end - start)
+    previous = _totals(db, previous_start.isoformat(), previous_end.isoformat(), category)
+
+    def expense_groups(column, limit):
+        query = db.query(
+            column,
+            func.sum(func.abs(TransactionDB.amount)).label("total"),
+            func.count(TransactionDB.id),
+        ).filter(
+            TransactionDB.type == TransactionType.expense,
+            _day >= start_s,
+            _day <= end_s,
+        )
+        if category:
+            query = query.filter(func.lower(TransactionDB.category) == category.lower())
+        rows = query.group_by(column).order_by(func.sum(func.abs(TransactionDB.amount)).desc()).limit(limit).all()
+        return [{"key": key, "total": round(total, 2), "count": count} for key, total, count in rows]
+
+    return {
+        "start_date": start_s,
+        "end_date": end_s,
+        "category": category,
+        "income": round(totals["income"], 2),
+        "expenses": round(totals["expenses"], 2),
+        "net": round(totals["income"] - totals["expenses"], 2),
+        "transaction_count": totals["count"],
+        "group_by": group_by if group_by in _GROUPINGS else "category",
+        "groups": expense_groups(group_column, 12),
+        "top_merchants": expense_groups(TransactionDB.description, top_n),
+        "vs_previous_period": {
+            "start_date": previous_start.isoformat(),
+            "end_date": previous_end.isoformat(),
+            "expenses": _delta(totals["expenses"], previous["expenses"]),
+            "income": _delta(totals["income"], previous["income"]),
+        },
+    }
+
+
+def budget_utilization(db: Session) -> List[Dict[str, Any]]:
+    """Each budget's limit against expenses in its current week/month, computed in one grouped query per period."""
+    today = datetime.now().date()
+    period_starts = {
+        BudgetPeriod.weekly: today - timedelta(days=today.weekday()),
+        BudgetPeriod.monthly: today.replace(day=1),
+    }
+
+    spent_by_period = {}
+    for period, start in period_starts.items():
+        rows = db.query(
+            func.lower(TransactionDB.category),
+            func.sum(func.abs(TransactionDB.amount)),
+        ).filter(
+            TransactionDB.type == TransactionType.expense,
+            _day >= start.isoformat(),
+            _day <= today.isoformat(),
+        ).group_by(func.lower(TransactionDB.category)).all()
+        spent_by_period[period] = dict(rows)
+
+    result = []
+    for budget in db.query(BudgetDB).all():
+        spent = spent_by_period[budget.period].get(budget.category.lower(), 0.0)
+        result.append({
+            "category": budget.category,
+            "period": budget.period.value,
+            "limit": round(budget.limit, 2),
+            "spent": round(spent, 2),
+            "remaining": round(budget.limit - spent, 2),
+            "utilization_pct": round(spent / budget.limit * 100, 1) if budget.limit else None,
+        })
+    return sorted(result, key=lambda b: b["utilization_pct"] or 0, reverse=True)
+
+
+# Row listings returned by the agent tools and the financial snapshot
+
+def recent_transactions(db: Session, limit: int = 5, category: Optional[str] = None) -> List[Dict[str, Any]]:
+    query = db.query(TransactionDB)
+    if category:
+        query = query.filter(func.lower(TransactionDB.category) == category.lower())
+    transactions = query.order_by(TransactionDB.date.desc(), TransactionDB.created_at.desc()).limit(limit).all()
+    return [
+        {
+            "description": t.description,
+            "amount": t.amount,
+            "category": t.category,
+            "date": t.date,
+            "type": t.type.value,
+        }
+        for t in transactions
+    ]
+
+def budget_list(db: Session) -> List[Dict[str, Any]]:
+    return [
+        {
+            "category": b.category,
+            "limit": b.limit,
+            "spent": b.spent,
+            "period": b.period.value,
+        }
+        for b in db.query(BudgetDB).all()
+    ]
+
+def goal_list(db: Session) -> List[Dict[str, Any]]:
+    return [
+        {
+            "title": g.title,
+            "target_amount": g.target_amount,
+            "current_amount": g.current_amount,
+            "deadline": g.deadline,
+            "category": g.category,
+        }
+        for g in db.query(GoalDB).all()
+    ]
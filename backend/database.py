@@ -1,5 +1,9 @@
-from sqlalchemy import create_engine
+import itertools
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker
+from metrics import instrument_engine
+from slow_queries import slow_query_log
+from tracing import trace_engine
 from models import Base, TransactionDB, BudgetDB, GoalDB, TransactionType, BudgetPeriod
 import os
 from dotenv import load_dotenv
@@ -13,10 +17,53 @@ DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "financ
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Query counts and latency, overall and per request; see metrics.py
+instrument_engine(engine, "app")
+# Per-shape timings, and a log with query plans for slow statements; see slow_queries.py
+slow_query_log.attach(engine)
+# A span per statement when tracing is on; see tracing.py
+trace_engine(engine, "app")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Version stamp of the finance data, advanced on every committed write.
+# Caches key their entries on it so a write invalidates dependent answers.
+_version_counter = itertools.count(1)
+_data_version = 0
+
+def get_data_version() -> int:
+    return _data_version
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_write(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here
+    if session.new or session.dirty or session.deleted:
+        session.info["has_writes"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _advance_data_version(session):
+    global _data_version
+    if session.info.pop("has_writes", False):
+        _data_version = next(_version_counter)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _clear_write_mark(session):
+    session.info.pop("has_writes", None)
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+
+def add_missing_columns():
+    """create_all() never alters existing tables, so add nullable columns introduced after the first run."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                    print(f"Added column {table.name}.{column.name}")
 
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Optional
+import httpx
+from google import genai
+from google.genai import errors, types
+
+from model_router import model_router
+from metrics import registry
+from tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY_PER_MODEL = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "8.0"))
+
+# One keep-alive pool shared by every call made through the manager
+POOL_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=60.0)
+
+_gemini_duration = registry.histogram("gemini_request_duration_seconds", "Gemini call latency, retries included", ("model", "outcome"))
+_gemini_tokens = registry.counter("gemini_tokens_total", "Gemini tokens by model and direction", ("model", "direction"))
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (httpx.TimeoutException, httpx.NetworkError))
+
+
+class GeminiClientManager:
+    """
+    Process-wide access point for Gemini calls.
+
+    Holds a single genai.Client (and so a single pooled HTTP connection pool),
+    bounds in-flight calls per model with a semaphore, retries 429/5xx with
+    jittered exponential backoff and records latency and token usage per model.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY_PER_MODEL, max_retries: int = MAX_RETRIES):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._client: Optional[genai.Client] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+            "calls": 0, "errors": 0, "retries": 0, "in_flight": 0,
+            "latency_ms_total": 0.0, "latency_ms_max": 0.0,
+            "prompt_tokens": 0, "output_tokens": 0,
+        })
+
+    @property
+    def client(self) -> genai.Client:
+        # Created lazily so importing this module never needs an API key
+        if self._client is None:
+            self._client = genai.Client(http_options=types.HttpOptions(
+                client_args={"limits": POOL_LIMITS},
+                async_client_args={"limits": POOL_LIMITS},
+            ))
+        return self._client
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[model]
+
+    async def _backoff(self, model: str, attempt: int, error: Exception):
+        # Full jitter: sleep anywhere between 0 and the exponential cap
+        delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+        self._stats[model]["retries"] += 1
+        logger.warning(f"Gemini {model} call failed ({error}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    def _record(self, model: str, started: float, usage: Any, error: bool = False, cancelled: bool = False):
+        stats = self._stats[model]
+        latency_ms = (time.perf_counter() - started) * 1000
+        if not cancelled:
+            # Cancelled streams say nothing about model health
+            model_router.observe(model, latency_ms, error)
+        stats["calls"] += 1
+        stats["errors"] += int(error)
+        stats["latency_ms_total"] += latency_ms
+        stats["latency_ms_max"] = max(stats["latency_ms_max"], latency_ms)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+        output_tokens = getattr(usage, "candidates_token_count", None) or 0
+        stats["prompt_tokens"] += prompt_tokens
+        stats["output_tokens"] += output_tokens
+        outcome = "cancelled" if cancelled else "error" if error else "ok"
+        _gemini_duration.observe(latency_ms / 1000, model, outcome)
+        _gemini_tokens.inc(prompt_tokens, model, "prompt")
+        _gemini_tokens.inc(output_tokens, model, "output")
+        record_span(f"gemini {model}", started, attributes={
+            "gen_ai.request.model": model,
+            "gen_ai.usage.input_tokens": prompt_tokens,
+            "gen_ai.usage.output_tokens": output_tokens,
+            "outcome": outcome,
+        }, error=error)
+        logger.info(
+            f"Gemini {model}: {latency_ms:.0f}ms, {prompt_tokens} prompt / {output_tokens} output tokens"
+            + (" (failed)" if error else "")
+        )
+
+    async def generate_content(self, model: str, contents: Any, config: Optional[types.GenerateContentConfig] = None):
+        """Non-streaming generate_content with concurrency limit, retries and accounting."""
+        async with self._semaphore(model):
+            self._stats[model]["in_flight"] += 1
+            started = time.perf_counter()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        response = await self.client.aio.models.generate_content(
+                            model=model, contents=contents, config=config
+                        )
+                        break
+                    except Exception as e:
+                        if attempt >= self.max_retries or not _is_retryable(e):
+                            raise
+                        await self._backoff(model, attempt, e)
+                self._record(model, started, response.usage_metadata)
+                return response
+            except Exception:
+                self._record(model, started, None, error=True)
+                raise
+            finally:
+                self._stats[model]["in_flight"] -= 1
+
+    async def generate_content_stream(
+        self, model: str, contents: Any, config: Optional[types.GenerateContentConfig] = None
+    ) -> AsyncIterator[types.GenerateContentResponse]:
+        """
+        Streaming generate_content. Retries only happen before the first chunk,
+        since chunks already forwarded to a client cannot be taken back.
+        """
+        async with self._semaphore(model):
+            self._stats[model]["in_flight"] += 1
+            started = time.perf_counter()
+            usage = None
+            stream = None
+            try:
+                first = None
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        stream = await self.client.aio.models.generate_content_stream(
+                            model=model, contents=contents, config=config
+                        )
+                        first = await stream.__anext__()
+                        break
+                    except StopAsyncIteration:
+                        break
+                    except Exception as e:
+                        if attempt >= self.max_retries or not _is_retryable(e):
+                            raise
+                        if stream is not None:
+                            await stream.aclose()
+                            stream = None
+                        await self._backoff(model, attempt, e)
+
+                if first is not None:
+                    usage = first.usage_metadata or usage
+                    yield first
+                    async for chunk in stream:
+                        usage = chunk.usage_metadata or usage
+                        yield chunk
+                self._record(model, started, usage)
+            except (asyncio.CancelledError, GeneratorExit):
+                self._record(model, started, usage, cancelled=True)
+                raise
+            except Exception:
+                self._record(model, started, usage, error=True)
+                raise
+            finally:
+                if stream is not None:
+                    await stream.aclose()
+                self._stats[model]["in_flight"] -= 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-model call counts, latency and token totals."""
+        result = {}
+        for model, stats in self._stats.items():
+            calls = stats["calls"] or 1
+            result[model] = {**stats, "latency_ms_avg": round(stats["latency_ms_total"] / calls, 1)}
+        return result
+
+# Global instance
+gemini = GeminiClientManager()
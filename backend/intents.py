@@ -0,0 +1,135 @@
+import logging
+import re
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+import analytics
+from database import SessionLocal
+from models import GoalDB
+from response_cache import normalize_prompt
+
+logger = logging.getLogger(__name__)
+
+# Filler the matcher ignores at the start of a question ("hey, can you tell me ...")
+_PREFIX = re.compile(r"^((hey|hi|ok|okay|so|please|quick question)[ ,]+)*((can|could) you )?(tell me|let me know)?[ ,]*")
+
+
+def _money(amount: float) -> str:
+    return f"${amount:,.2f}"
+
+
+def _balance(db: Session, match: re.Match) -> Optional[str]:
+    return f"Your current balance is {_money(analytics.total_balance(db))}."
+
+
+def _monthly_expenses(db: Session, match: re.Match) -> Optional[str]:
+    month = datetime.now().strftime("%B")
+    return f"You've spent {_money(analytics.monthly_expenses(db))} so far in {month}."
+
+
+def _monthly_income(db: Session, match: re.Match) -> Optional[str]:
+    month = datetime.now().strftime("%B")
+    return f"Your income so far in {month} is {_money(analytics.monthly_income(db))}."
+
+
+def _goal_progress(db: Session, match: re.Match) -> Optional[str]:
+    words = set(re.findall(r"[a-z0-9]+", match.group("goal"))) - {"my", "the", "for", "a", "an", "goal"}
+    if not words:
+        return None
+
+    # Pick the goal whose title/category shares the most words with the question
+    best, best_overlap = None, 0
+    for goal in db.query(GoalDB).all():
+        goal_words = set(re.findall(r"[a-z0-9]+", f"{goal.title} {goal.category}".lower()))
+        overlap = len(words & goal_words)
+        if overlap > best_overlap:
+            best, best_overlap = goal, overlap
+    if best is None:
+        return None
+
+    remaining = max(best.target_amount - best.current_amount, 0.0)
+    percent = (best.current_amount / best.target_amount * 100) if best.target_amount else 0.0
+    deadline = best.deadline[:10]
+    if remaining == 0:
+        return f"You've reached your {best.title} goal of {_money(best.target_amount)}!"
+    return (
+        f"You've saved {_money(best.current_amount)} of {_money(best.target_amount)} "
+        f"for {best.title} ({percent:.0f}%). {_money(remaining)} to go before {deadline}."
+    )
+
+
+class IntentMatcher:
+    """
+    Answers common, exactly-answerable finance questions straight from the
+    analytics queries, without a model call. Anything unrecognised returns
+    None so the caller falls through to Gemini.
+    """
+
+    def __init__(self):
+        self._intents: List[Tuple[str, List[re.Pattern], Callable[[Session, re.Match], Optional[str]]]] = [
+            ("balance", [
+                re.compile(r"^(what('s| is)|show( me)?|check) (my )?(current |total |account )?balance( right now| now)?$"),
+                re.compile(r"^how much (money )?(do i have|have i got)( left)?( in total| right now| now)?$"),
+            ], _balance),
+            ("monthly_expenses", [
+                re.compile(r"^how much (did|have) i (spend|spent)( so far| in total)?( this month| so far this month)$"),
+                re.compile(r"^what (did|have) i (spend|spent)( so far)? this month$"),
+                re.compile(r"^what (are|were|is) my (total |monthly )?(expenses|spending)( for| this| for this)? month$"),
+            ], _monthly_expenses),
+            ("monthly_income", [
+                re.compile(r"^how much (did|have) i (earn|earned|make|made)( so far)? this month$"),
+                re.compile(r"^what('s| is) my (monthly )?income( this month)?$"),
+            ], _monthly_income),
+            ("goal_progress", [
+                re.compile(r"^how (close|far) am i (to|from) (reaching |hitting )?(my |the )?(?P<goal>.+?) goal$"),
+                re.compile(r"^how('s| is) my (?P<goal>.+?) goal( going| doing| coming along)?$"),
+                re.compile(r"^what('s| is) my progress (on|toward|towards) (my |the )?(?P<goal>.+?)( goal)?$"),
+            ], _goal_progress),
+        ]
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.local = 0
+        self.by_intent: Dict[str, int] = {}
+
+    def match(self, prompt: str) -> Optional[Tuple[str, re.Match, Callable]]:
+        text = _PREFIX.sub("", normalize_prompt(prompt.replace("’", "'"))).strip()
+        for name, patterns, handler in self._intents:
+            for pattern in patterns:
+                found = pattern.match(text)
+                if found:
+                    return name, found, handler
+        return None
+
+    def answer(self, prompt: str) -> Optional[Tuple[str, str]]:
+        """Return (intent, answer) if the question can be answered locally, else None."""
+        matched = self.match(prompt)
+        answer = None
+        if matched:
+            name, found, handler = matched
+            db = SessionLocal()
+            try:
+                answer = handler(db, found)
+            except Exception as e:
+                logger.warning(f"Fast-path intent {name} failed, falling back to model: {e}")
+            finally:
+                db.close()
+
+        with self._lock:
+            self.requests += 1
+            if answer is not None:
+                self.local += 1
+                self.by_intent[name] = self.by_intent.get(name, 0) + 1
+        return (name, answer) if answer is not None else None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "requests": self.requests,
+            "served_locally": self.local,
+            "local_share": round(self.local / self.requests, 3) if self.requests else 0.0,
+            "by_intent": dict(self.by_intent),
+        }
+
+# Global instance
+intent_matcher = IntentMatcher()
@@ -0,0 +1,97 @@
+import re
+from datetime import datetime, date as date_type
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy import insert, func, or_
+from sqlalchemy.orm import Session
+
+from models import TransactionItemDB
+from receipt_service import receipt_service
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_item_name(name: str) -> str:
+    """Lowercase an item name and collapse punctuation/whitespace so 'Coffee, Lg.' matches 'coffee lg'."""
+    return _NON_WORD.sub(" ", str(name).lower()).strip()
+
+
+def _item_date(date: str) -> str:
+    """Reduce any ISO date/datetime string to YYYY-MM-DD so string comparisons order correctly."""
+    return (date or datetime.now().isoformat())[:10]
+
+
+def insert_line_items(db: Session, transaction_id: str, date: str, items: Iterable[Any]) -> int:
+    """
+    Insert all line items for a transaction with a single executemany INSERT.
+    Items may be plain strings or dicts with name/amount/quantity. Does not commit.
+    Returns the number of rows inserted.
+    """
+    item_date = _item_date(date)
+    rows = []
+    for item in items:
+        if isinstance(item, dict):
+            name, amount, quantity = item.get("name"), item.get("amount"), item.get("quantity")
+        elif hasattr(item, "name"):
+            name, amount, quantity = item.name, getattr(item, "amount", None), getattr(item, "quantity", None)
+        else:
+            name, amount, quantity = item, None, None
+        # Tool arguments can carry prices as strings, e.g. "$3.50"
+        amount, quantity = receipt_service._parse_number(amount), receipt_service._parse_number(quantity)
+        normalized = normalize_item_name(name or "")
+        if not normalized:
+            continue
+        rows.append({
+            "transaction_id": transaction_id,
+            "name": str(name).strip(),
+            "normalized_name": normalized,
+            "amount": abs(amount) if amount is not None else None,
+            "quantity": quantity,
+            "date": item_date,
+        })
+    if rows:
+        db.execute(insert(TransactionItemDB), rows)
+    return len(rows)
+
+
+def period_bounds(period: Optional[str], today: Optional[date_type] = None) -> Tuple[str, str]:
+    """Return (start, end) YYYY-MM-DD bounds for 'month', 'quarter', 'year' or all time."""
+    today = today or datetime.now().date()
+    if period == "month":
+        start = today.replace(day=1)
+    elif period == "quarter":
+        start = today.replace(month=3 * ((today.month - 1) // 3) + 1, day=1)
+    elif period == "year":
+        start = today.replace(month=1, day=1)
+    else:
+        return "0000-01-01", today.isoformat()
+    return start.isoformat(), today.isoformat()
+
+
+def item_spending(db: Session, item: str, start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    Total spend on line items with a word starting with `item` between two dates (inclusive),
+    so "milk" matches both "milk 2l" and "oat milk". The name prefix is a range on the
+    (normalized_name, date) index; later words need a LIKE scan.
+    """
+    term = normalize_item_name(item)
+    query = db.query(
+        func.coalesce(func.sum(TransactionItemDB.amount), 0.0),
+        func.count(TransactionItemDB.id),
+    ).filter(
+        TransactionItemDB.date >= _item_date(start_date),
+        TransactionItemDB.date <= _item_date(end_date),
+    )
+    if term:
+        upper = term[:-1] + chr(ord(term[-1]) + 1)
+        query = query.filter(or_(
+            (TransactionItemDB.normalized_name >= term) & (TransactionItemDB.normalized_name < upper),
+            TransactionItemDB.normalized_name.like(f"% {term}%"),
+        ))
+    total, count = query.one()
+    return {
+        "item": term,
+        "total": round(float(total or 0.0), 2),
+        "count": int(count or 0),
+        "start_date": _item_date(start_date),
+        "end_date": _item_date(end_date),
+    }
@@ -1,23 +1,38 @@
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from datetime import datetime, timedelta
-from typing import List, Dict
+from datetime import datetime
+from typing import List, Dict, Optional
 import os
+import asyncio
 from dotenv import load_dotenv
 
 from database import get_db, create_tables, seed_database, engine
 from models import (
     TransactionDB, BudgetDB, GoalDB,
-    Transaction, TransactionCreate,
+    Transaction, TransactionCreate, ReceiptTransactionCreate,
     Budget, BudgetCreate, BudgetUpdate,
     Goal, GoalCreate, GoalUpdate,
     AnalyticsBalance, AnalyticsIncome, AnalyticsExpenses, AnalyticsSpending,
-    TransactionType
+    AnalyticsItemSpending, TransactionType
 )
+import analytics
+from line_items import insert_line_items, item_spending, period_bounds
+from receipt_store import receipt_store
 from ai import router as ai_router
-from adk_services import initialize_adk_services
+from adk_services import initialize_adk_services, session_service
+from session_compaction import session_compactor
+from voice_pool import warm_pool
+from voice_resume import resume_store
+from voice_admission import voice_admission
+from response_cache import chat_cache
+from snapshot import snapshot_cache
+from intents import intent_matcher
+from gemini_service import gemini
+from metrics import registry, MetricsMiddleware
+from slow_queries import slow_query_log
+from tracing import TracingMiddleware, TRACING_ENABLED, shutdown_tracing
 
 load_dotenv()
 
@@ -35,6 +50,32 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the timing covers CORS handling too
+app.add_middleware(MetricsMiddleware)
+# Root span per request and WebSocket when TRACE_EXPORTER is set; see tracing.py
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
+# Counters the caches and voice components already keep, read when /metrics is scraped
+registry.callback("cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"), "counter", lambda: {
+    ("chat_response", "hit"): chat_cache.hits,
+    ("chat_response", "miss"): chat_cache.misses,
+    ("adk_session", "hit"): session_service.stats()["hits"],
+    ("adk_session", "miss"): session_service.stats()["misses"],
+    ("financial_snapshot", "hit"): snapshot_cache.hits,
+    ("financial_snapshot", "miss"): snapshot_cache.builds,
+    ("fast_path_intent", "hit"): intent_matcher.local,
+    ("fast_path_intent", "miss"): intent_matcher.requests - intent_matcher.local,
+})
+registry.callback("gemini_in_flight", "Gemini calls in progress", ("model",), "gauge", lambda: {
+    (model,): stats["in_flight"] for model, stats in gemini.stats().items()
+})
+registry.callback("voice_sessions", "Live voice sessions: admitted (connected or parked for resume), waiting for a slot, parked, warm", ("state",), "gauge", lambda: {
+    ("admitted",): voice_admission.stats()["active"],
+    ("waiting",): voice_admission.stats()["waiting"],
+    ("parked",): len(resume_store.stats()["parked_now"]),
+    ("warm",): warm_pool.stats()["size"],
+})
 
 # Initialize database on startup
 @app.on_event("startup")
@@ -42,28 +83,46 @@ async def startup_event():
     create_tables()
     initialize_adk_services(engine)
     seed_database()
-    
-    # Pre-create the default session to avoid timing issues
-    try:
-        from adk_services import session_service
-        user_id = "user_123"
-        session_id = f"{user_id}_session"
-        
-        print(f"Pre-creating session: {session_id}")
-        session = await session_service.create_session(
-            app_name="PennyWise", user_id=user_id, session_id=session_id
-        )
-        print(f"✅ Session pre-created successfully: {session_id}")
-        
-    except Exception as e:
-        print(f"⚠️  Session pre-creation failed (may already exist): {e}")
-        # This is okay - session might already exist
+    # Chat sessions are created per user/conversation on first use (see session_registry.py)
+
+    # Keep ADK session histories bounded in the background
+    app.state.compaction_task = asyncio.create_task(session_compactor.run_forever())
+    # Close warm live sessions nobody claimed
+    app.state.warm_pool_task = asyncio.create_task(warm_pool.run_reaper())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for name in ("compaction_task", "warm_pool_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    resume_store.close_all()
+    warm_pool.close_all()
+    # Write out any session events still queued in the session cache
+    await session_service.flush()
+    shutdown_tracing()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of request, DB, Gemini, voice and cache metrics."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/db/slow-queries")
+def slow_queries(limit: int = 20, order: str = "total"):
+    """Top query shapes by total, max or avg time, with call counts, routes and query plans."""
+    return {**slow_query_log.stats(), "queries": slow_query_log.top(limit, order)}
 
 # Health check
 @app.get("/")
 def read_root():
     return {"message": "PennyWise Finance API is running!"}
 
+def _checked_receipt_image(image_hash: Optional[str]) -> Optional[str]:
+    """Reject references to receipt images that were never uploaded."""
+    if image_hash and not receipt_store.image_path(image_hash):
+        raise HTTPException(status_code=400, detail="Unknown receipt image")
+    return image_hash
+
 # Transaction endpoints
 @app.get("/api/transactions", response_model=List[Transaction])
 def get_transactions(db: Session = Depends(get_db)):
@@ -77,7 +136,8 @@ def get_transactions(db: Session = Depends(get_db)):
             amount=t.amount,
             category=t.category,
             date=t.date,
-            type=t.type.value  # Convert enum to string
+            type=t.type.value,  # Convert enum to string
+            receipt_image=t.receipt_image
         ))
     return result
 
@@ -92,7 +152,8 @@ def create_transaction(transaction: TransactionCreate, db: Session = Depends(get
         amount=transaction.amount,
         category=transaction.category,
         date=transaction.date,
-        type=TransactionType(transaction.type)
+        type=TransactionType(transaction.type),
+        receipt_image=_checked_receipt_image(transaction.receipt_image)
     )
     
     db.add(db_transaction)
@@ -106,7 +167,40 @@ def create_transaction(transaction: TransactionCreate, db: Session = Depends(get
         amount=db_transaction.amount,
         category=db_transaction.category,
         date=db_transaction.date,
-        type=db_transaction.type.value
+        type=db_transaction.type.value,
+        receipt_image=db_transaction.receipt_image
+    )
+
+@app.post("/api/transactions/receipt", response_model=Transaction)
+def create_receipt_transaction(receipt: ReceiptTransactionCreate, db: Session = Depends(get_db)):
+    """Save a reviewed receipt as a transaction together with its line items."""
+    transaction_id = str(int(datetime.now().timestamp() * 1000))
+    
+    db_transaction = TransactionDB(
+        id=transaction_id,
+        description=receipt.description,
+        amount=receipt.amount,
+        category=receipt.category,
+        date=receipt.date,
+        type=TransactionType(receipt.type),
+        receipt_image=_checked_receipt_image(receipt.receipt_image)
+    )
+    db.add(db_transaction)
+    db.flush()
+    
+    # One bulk INSERT for all items, committed with the transaction
+    insert_line_items(db, transaction_id, receipt.date, receipt.items)
+    db.commit()
+    db.refresh(db_transaction)
+    
+    return Transaction(
+        id=db_transaction.id,
+        description=db_transaction.description,
+        amount=db_transaction.amount,
+        category=db_transaction.category,
+        date=db_transaction.date,
+        type=db_transaction.type.value,
+        receipt_image=db_transaction.receipt_image
     )
 
 @app.delete("/api/transactions/{transaction_id}")
@@ -120,6 +214,23 @@ def delete_transaction(transaction_id: str, db: Session = Depends(get_db)):
     
     return {"message": "Transaction deleted successfully"}
 
+# Receipt image endpoints (content-addressed, so responses never change)
+RECEIPT_CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+@app.get("/api/receipts/{image_hash}")
+def get_receipt_image(image_hash: str):
+    path = receipt_store.image_path(image_hash)
+    if not path:
+        raise HTTPException(status_code=404, detail="Receipt image not found")
+    return FileResponse(path, media_type=receipt_store.media_type(path), headers=RECEIPT_CACHE_HEADERS)
+
+@app.get("/api/receipts/{image_hash}/thumbnail")
+def get_receipt_thumbnail(image_hash: str):
+    path = receipt_store.thumbnail_path(image_hash)
+    if not path:
+        raise HTTPException(status_code=404, detail="Receipt thumbnail not found")
+    return FileResponse(path, media_type="image/jpeg", headers=RECEIPT_CACHE_HEADERS)
+
 # Budget endpoints
 @app.get("/api/budgets", response_model=List[Budget])
 def get_budgets(db: Session = Depends(get_db)):
@@ -228,74 +339,33 @@ def update_goal(goal_id: str, goal_update: GoalUpdate, db: Session = Depends(get
 # Analytics endpoints
 @app.get("/api/analytics/balance", response_model=AnalyticsBalance)
 def get_total_balance(db: Session = Depends(get_db)):
-    total = db.query(func.sum(TransactionDB.amount)).scalar() or 0.0
-    return AnalyticsBalance(balance=total)
+    return AnalyticsBalance(balance=analytics.total_balance(db))
 
 @app.get("/api/analytics/income", response_model=AnalyticsIncome)
 def get_monthly_income(db: Session = Depends(get_db)):
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    
-    # Parse date strings and filter by current month/year
-    transactions = db.query(TransactionDB).filter(
-        TransactionDB.type == TransactionType.income
-    ).all()
-    
-    monthly_income = 0.0
-    for transaction in transactions:
-        try:
-            transaction_date = datetime.fromisoformat(transaction.date.replace('Z', '+00:00'))
-            if (transaction_date.month == current_month and 
-                transaction_date.year == current_year):
-                monthly_income += transaction.amount
-        except:
-            continue
-    
-    return AnalyticsIncome(monthly_income=monthly_income)
+    return AnalyticsIncome(monthly_income=analytics.monthly_income(db))
 
 @app.get("/api/analytics/expenses", response_model=AnalyticsExpenses)
 def get_monthly_expenses(db: Session = Depends(get_db)):
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    
-    # Parse date strings and filter by current month/year
-    transactions = db.query(TransactionDB).filter(
-        TransactionDB.type == TransactionType.expense
-    ).all()
-    
-    monthly_expenses = 0.0
-    for transaction in transactions:
-        try:
-            transaction_date = datetime.fromisoformat(transaction.date.replace('Z', '+00:00'))
-            if (transaction_date.month == current_month and 
-                transaction_date.year == current_year):
-                monthly_expenses += abs(transaction.amount)
-        except:
-            continue
-    
-    return AnalyticsExpenses(monthly_expenses=monthly_expenses)
+    return AnalyticsExpenses(monthly_expenses=analytics.monthly_expenses(db))
 
 @app.get("/api/analytics/spending", response_model=AnalyticsSpending)
 def get_spending_by_category(days: int = 30, db: Session = Depends(get_db)):
-    cutoff_date = datetime.now() - timedelta(days=days)
-    
-    # Get expense transactions within the date range
-    transactions = db.query(TransactionDB).filter(
-        TransactionDB.type == TransactionType.expense
-    ).all()
-    
-    spending_by_category = {}
-    for transaction in transactions:
-        try:
-            transaction_date = datetime.fromisoformat(transaction.date.replace('Z', '+00:00'))
-            if transaction_date >= cutoff_date:
-                category = transaction.category
-                amount = abs(transaction.amount)
-                spending_by_category[category] = spending_by_category.get(category, 0.0) + amount
-        except:
-            continue
-    
-    return AnalyticsSpending(spending_by_category=spending_by_category)
+    return AnalyticsSpending(spending_by_category=analytics.spending_by_category(db, days))
+
+@app.get("/api/analytics/items", response_model=AnalyticsItemSpending)
+def get_item_spending(
+    item: str,
+    period: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Total spent on receipt line items matching `item` (e.g. ?item=coffee&period=quarter)."""
+    default_start, default_end = period_bounds(period)
+    return AnalyticsItemSpending(**item_spending(
+        db, item, start_date or default_start, end_date or default_end
+    ))
 
 if __name__ == "__main__":
     import uvicorn
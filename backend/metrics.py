@@ -0,0 +1,302 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+
+# Seconds; covers fast SQLite queries up to long model calls and streamed responses
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Queries per request
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+class _PerThread:
+    """
+    Metric values sharded by thread. Each thread only ever writes its own
+    dict, so recording takes no lock (the event loop and threadpool workers
+    never contend); a scrape adds the shards up.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[LabelValues, Any]] = []
+        self._lock = threading.Lock()  # only taken the first time a thread records
+
+    def mine(self) -> Dict[LabelValues, Any]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def shards(self) -> List[Dict[LabelValues, Any]]:
+        with self._lock:
+            return [dict(shard) for shard in self._shards]
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = _PerThread()
+
+    def inc(self, amount: float = 1.0, *labelvalues: str):
+        shard = self._values.mine()
+        shard[labelvalues] = shard.get(labelvalues, 0.0) + amount
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._values.shards():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0.0) + value
+        for key, value in sorted(totals.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Counter):
+    """Up/down value; inc() with a negative amount to decrement."""
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0, *labelvalues: str):
+        self.inc(-amount, *labelvalues)
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = _PerThread()
+
+    def observe(self, value: float, *labelvalues: str):
+        shard = self._values.mine()
+        cell = shard.get(labelvalues)
+        if cell is None:
+            # Per-bucket counts (last one is +Inf), then sum
+            cell = shard[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for shard in self._values.shards():
+            for key, cell in shard.items():
+                total = totals.setdefault(key, [0] * len(cell))
+                for i, value in enumerate(list(cell)):
+                    total[i] += value
+        for key, cell in sorted(totals.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), cell[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_bound(bound)}, cumulative
+            yield f"{self.name}_sum", labels, cell[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+
+class CallbackMetric:
+    """Read at scrape time from counters a component already keeps, so its hot path is untouched."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], type: str,
+                 read: Callable[[], Dict[LabelValues, float]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.type = type
+        self.read = read
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        for key, value in sorted(self.read().items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Metric families rendered in the Prometheus text exposition format at /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, labelnames: Sequence[str], type: str,
+                 read: Callable[[], Dict[LabelValues, float]]) -> CallbackMetric:
+        return self._add(CallbackMetric(name, documentation, labelnames, type, read))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+                continue
+            for name, labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                value_text = _format_value(value)
+                lines.append(f"{name}{{{label_text}}} {value_text}" if label_text else f"{name} {value_text}")
+        return "\n".join(lines) + "\n"
+
+# Global instance
+registry = MetricsRegistry()
+
+
+# --- HTTP and WebSocket requests ---
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_duration = registry.histogram("http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route"))
+websocket_active = registry.gauge("websocket_active", "Open WebSocket connections", ("route",))
+websocket_total = registry.counter("websocket_connections_total", "WebSocket connections accepted or refused", ("route",))
+
+# --- Database ---
+
+db_queries = registry.counter("db_queries_total", "SQL statements executed", ("engine", "operation"))
+db_duration = registry.histogram("db_query_duration_seconds", "SQL statement latency", ("engine",))
+db_request_queries = registry.histogram("db_queries_per_request", "SQL statements per HTTP request", ("route",), COUNT_BUCKETS)
+db_request_time = registry.histogram("db_time_per_request_seconds", "Time in SQL per HTTP request", ("route",))
+
+# Query count and seconds of the HTTP request being handled. A mutable cell, so queries
+# run in threadpool workers (which get a copy of the context) add to the same totals.
+_request_db: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("request_db", default=None)
+
+
+def instrument_engine(engine, name: str):
+    """Count and time every statement on this engine, overall and per HTTP request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_queries.inc(1, name, operation)
+        db_duration.observe(elapsed, name)
+        request = _request_db.get()
+        if request is not None:
+            request[0] += 1
+            request[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def route_of(scope) -> str:
+    # FastAPI puts the matched route in the scope; raw paths would explode label cardinality
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# ASGI scope of the request or WebSocket being handled, for code that wants to know its caller
+_request_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_scope", default=None)
+
+
+def current_route() -> str:
+    """Route template of the request running this code, or "background" outside any request."""
+    scope = _request_scope.get()
+    return route_of(scope) if scope is not None else "background"
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no per-request task or body buffering) that
+    records latency, status and DB usage per route for HTTP, and open and
+    total connections for WebSockets.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        scope_token = _request_scope.set(scope)
+        try:
+            if scope["type"] == "websocket":
+                await self._websocket(scope, receive, send)
+            else:
+                await self._http(scope, receive, send)
+        finally:
+            _request_scope.reset(scope_token)
+
+    async def _http(self, scope, receive, send):
+        started = time.perf_counter()
+        status = [500]
+        db = [0, 0.0]
+        token = _request_db.set(db)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_db.reset(token)
+            route = route_of(scope)
+            http_requests.inc(1, scope["method"], route, str(status[0]))
+            http_duration.observe(time.perf_counter() - started, scope["method"], route)
+            db_request_queries.observe(db[0], route)
+            db_request_time.observe(db[1], route)
+
+    async def _websocket(self, scope, receive, send):
+        # The route is only known once routing ran, so count on the first message we send
+        route: List[str] = []
+
+        async def send_counted(message):
+            if not route:
+                route.append(route_of(scope))
+                websocket_total.inc(1, route[0])
+                websocket_active.inc(1, route[0])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            if route:
+                websocket_active.dec(1, route[0])
@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tiers are tried in order; the first one whose limits fit the request and
+# whose recent latency/error rate is healthy wins. Later tiers are fallbacks.
+#   max_prompt_chars / max_image_bytes: skip the tier for larger inputs
+#   tools: whether the tier may be used when the request needs tool calls
+#   max_latency_ms: treat the model as degraded above this recent average
+#   timeout_s: how long to wait for a first response before falling back
+DEFAULT_ROUTING = {
+    "chat": [
+        {"tier": "lite", "model": "gemini-2.5-flash-lite-preview-06-17",
+         "max_prompt_chars": 4000, "tools": False, "max_latency_ms": 4000, "timeout_s": 8},
+        {"tier": "standard", "model": "gemini-2.5-flash", "max_latency_ms": 15000, "timeout_s": 20},
+    ],
+    # Extraction accuracy has not been compared on the lite model, so receipts stay on
+    # gemini-2.5-flash; a lite tier can be put in front of it through MODEL_ROUTING
+    "receipt": [
+        {"tier": "standard", "model": "gemini-2.5-flash", "max_latency_ms": 20000, "timeout_s": 30},
+    ],
+    "live": [
+        {"tier": "live", "model": "gemini-2.0-flash-live-001"},
+    ],
+}
+
+EWMA_ALPHA = 0.2
+MIN_SAMPLES = 3
+MAX_ERROR_RATE = 0.5
+# A degraded model gets no traffic, so retry it after this long without samples
+RECOVERY_SECONDS = float(os.getenv("MODEL_ROUTING_RECOVERY_SECONDS", "30"))
+
+
+def load_routing_table() -> Dict[str, List[Dict[str, Any]]]:
+    """Routing table from MODEL_ROUTING_FILE (a JSON file) or MODEL_ROUTING (inline JSON), else the default."""
+    path = os.getenv("MODEL_ROUTING_FILE")
+    raw = os.getenv("MODEL_ROUTING")
+    try:
+        if path:
+            with open(path) as f:
+                return {**DEFAULT_ROUTING, **json.load(f)}
+        if raw:
+            return {**DEFAULT_ROUTING, **json.loads(raw)}
+    except (OSError, ValueError) as e:
+        logger.error(f"Invalid model routing config, using defaults: {e}")
+    return DEFAULT_ROUTING
+
+
+@dataclass
+class RouteDecision:
+    task: str
+    tier: str
+    model: str
+    reason: str
+    fallbacks: List[Dict[str, Any]] = field(default_factory=list)
+    timeout_s: Optional[float] = None
+
+    @property
+    def candidates(self) -> List[Dict[str, Any]]:
+        """The chosen tier followed by its fallbacks, as {model, tier, timeout_s} dicts."""
+        chosen = {"model": self.model, "tier": self.tier, "timeout_s": self.timeout_s}
+        return [chosen] + self.fallbacks
+
+
+class ModelRouter:
+    """
+    Picks a model tier per request from cheap local signals (prompt length,
+    tool use, image size) and each model's recent latency and error rate,
+    which are tracked as exponentially weighted moving averages.
+    """
+
+    def __init__(self, table: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        self.table = table or load_routing_table()
+        self._health: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, latency_ms: float, error: bool = False):
+        """Feed one call outcome into the model's moving averages."""
+        with self._lock:
+            health = self._health.setdefault(model, {"latency_ms": latency_ms, "error_rate": 0.0, "samples": 0})
+            health["latency_ms"] += EWMA_ALPHA * (latency_ms - health["latency_ms"])
+            health["error_rate"] += EWMA_ALPHA * (float(error) - health["error_rate"])
+            health["samples"] += 1
+            health["updated"] = time.monotonic()
+
+    def _degraded(self, tier: Dict[str, Any]) -> Optional[str]:
+        health = self._health.get(tier["model"])
+        if not health or health["samples"] < MIN_SAMPLES:
+            return None
+        if time.monotonic() - health["updated"] > RECOVERY_SECONDS:
+            return None
+        if health["error_rate"] > MAX_ERROR_RATE:
+            return f"error rate {health['error_rate']:.0%}"
+        max_latency = tier.get("max_latency_ms")
+        if max_latency and health["latency_ms"] > max_latency:
+            return f"latency {health['latency_ms']:.0f}ms > {max_latency}ms"
+        return None
+
+    def _fits(self, tier: Dict[str, Any], prompt_chars: int, image_bytes: int, needs_tools: bool) -> bool:
+        if tier.get("max_prompt_chars") and prompt_chars > tier["max_prompt_chars"]:
+            return False
+        if tier.get("max_image_bytes") and image_bytes > tier["max_image_bytes"]:
+            return False
+        return not (needs_tools and tier.get("tools", True) is False)
+
+    def route(self, task: str, prompt_chars: int = 0, image_bytes: int = 0, needs_tools: bool = False) -> RouteDecision:
+        tiers = self.table.get(task) or DEFAULT_ROUTING[task]
+        eligible = [t for t in tiers if self._fits(t, prompt_chars, image_bytes, needs_tools)] or tiers[-1:]
+
+        chosen, skipped = None, []
+        for tier in eligible:
+            problem = self._degraded(tier)
+            if problem:
+                skipped.append(f"{tier['tier']} degraded ({problem})")
+                continue
+            chosen = tier
+            break
+        if chosen is None:
+            chosen = eligible[0]
+            skipped.append("all tiers degraded")
+
+        reason = "; ".join(skipped) or f"fits {chosen['tier']} tier"
+        fallbacks = [
+            {"model": t["model"], "tier": t["tier"], "timeout_s": t.get("timeout_s")}
+            for t in eligible if t is not chosen
+        ]
+        decision = RouteDecision(
+            task=task, tier=chosen["tier"], model=chosen["model"], reason=reason,
+            fallbacks=fallbacks, timeout_s=chosen.get("timeout_s"),
+        )
+        logger.info(
+            f"Model route [{task}] -> {decision.model} ({decision.tier}): {reason} "
+            f"(prompt_chars={prompt_chars}, image_bytes={image_bytes}, tools={needs_tools})"
+        )
+        return decision
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                model: {k: round(v, 3) for k, v in h.items() if k != "updated"}
+                for model, h in self._health.items()
+            }
+
+# Global instance
+model_router = ModelRouter()
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 import enum
 
 Base = declarative_base()
@@ -26,8 +27,27 @@ class TransactionDB(Base):
     category = Column(String, nullable=False)
     date = Column(String, nullable=False)  # ISO string format
     type = Column(Enum(TransactionType), nullable=False)
+    receipt_image = Column(String, nullable=True)  # SHA-256 of the stored receipt image
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    items = relationship("TransactionItemDB", cascade="all, delete-orphan")
+
+class TransactionItemDB(Base):
+    __tablename__ = "transaction_items"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    transaction_id = Column(String, ForeignKey("transactions.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)
+    normalized_name = Column(String, nullable=False)  # Lowercased, punctuation-free
+    amount = Column(Float, nullable=True)
+    quantity = Column(Float, nullable=True)
+    date = Column(String, nullable=False)  # YYYY-MM-DD, copied from the transaction
+    
+    __table_args__ = (
+        Index("ix_transaction_items_name_date", "normalized_name", "date"),
+        Index("ix_transaction_items_transaction_id", "transaction_id"),
+    )
+
 class BudgetDB(Base):
     __tablename__ = "budgets"
     
@@ -56,10 +76,19 @@ class TransactionBase(BaseModel):
     category: str
     date: str
     type: Literal["income", "expense"]
+    receipt_image: Optional[str] = None
 
 class TransactionCreate(TransactionBase):
     pass
 
+class LineItem(BaseModel):
+    name: str
+    amount: Optional[float] = None
+    quantity: Optional[float] = None
+
+class ReceiptTransactionCreate(TransactionCreate):
+    items: List[LineItem] = []
+
 class Transaction(TransactionBase):
     id: str
     
@@ -121,4 +150,11 @@ class AnalyticsExpenses(BaseModel):
     monthly_expenses: float
 
 class AnalyticsSpending(BaseModel):
-    spending_by_category: dict[str, float]
\ No newline at end of file
+    spending_by_category: dict[str, float]
+
+class AnalyticsItemSpending(BaseModel):
+    item: str
+    total: float
+    count: int
+    start_date: str
+    end_date: str
@@ -1,20 +1,20 @@
+import asyncio
 import base64
 import logging
 from typing import Dict, Any, Optional
-from google import genai
 from google.genai import types
 import json
 import re
 from datetime import datetime
 
+from gemini_service import gemini
+from model_router import model_router
+
 logger = logging.getLogger(__name__)
 
 class ReceiptService:
     """Service for processing receipt images using Gemini vision capabilities."""
     
-    def __init__(self):
-        self.client = genai.Client()
-    
     async def extract_receipt_data(self, image_data: bytes, mime_type: str) -> Dict[str, Any]:
         """
         Extract transaction details from a receipt image using Gemini vision.
@@ -43,7 +43,7 @@ class ReceiptService:
                 "date": "Date in ISO format (YYYY-MM-DD), use today's date if not clear",
                 "category": "Best category guess (food, groceries, gas, shopping, entertainment, etc.)",
                 "description": "Brief description of the purchase",
-                "items": ["list of main items purchased if visible"],
+                "items": [{"name": "item name", "price": "line total as a number", "quantity": "number of units"}],
                 "confidence": "high/medium/low based on image clarity"
             }
             
@@ -52,6 +52,7 @@ class ReceiptService:
             - Amount should be the final total including tax, but not including tips unless explicitly part of total
             - Look for keywords like "Total", "Grand Total", "Amount Due", "Balance Due", or currency symbols
             - If multiple amounts are visible, choose the final total amount to be paid
+            - List each purchased item if visible; omit price or quantity when they cannot be read
             - Use common expense categories: food, groceries, gas, shopping, entertainment, healthcare, transportation, etc.
             - If date is unclear, use today's date
             - Be conservative with confidence rating
@@ -60,10 +61,10 @@ class ReceiptService:
             Return only valid JSON, no additional text.
             """
             
-            # Generate content using Gemini
-            response = self.client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=[image_part, prompt]
+            # Generate content using the routed Gemini model tier
+            response = await self._generate(
+                contents=[image_part, prompt],
+                image_bytes=len(image_data)
             )
             
             if not response.text:
@@ -85,6 +86,23 @@ class ReceiptService:
                 "confidence": "low"
             }
     
+    async def _generate(self, contents: list, image_bytes: int):
+        """Call the routed model, falling back to the next tier if it is slow or fails."""
+        decision = model_router.route("receipt", image_bytes=image_bytes)
+        candidates = decision.candidates
+        for index, candidate in enumerate(candidates):
+            try:
+                return await asyncio.wait_for(
+                    gemini.generate_content(model=candidate["model"], contents=contents),
+                    timeout=candidate["timeout_s"]
+                )
+            except Exception as e:
+                if index == len(candidates) - 1:
+                    raise
+                if isinstance(e, asyncio.TimeoutError):
+                    model_router.observe(candidate["model"], candidate["timeout_s"] * 1000, error=True)
+                logger.warning(f"Receipt model {candidate['model']} failed ({e!r}), falling back to {candidates[index + 1]['model']}")
+    
     def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
         """Parse Gemini's response and extract JSON."""
         try:
@@ -162,18 +180,42 @@ class ReceiptService:
             description = f"Purchase at {cleaned['merchant']}"
         cleaned["description"] = str(description).strip() or "Receipt purchase"
         
-        # Items (optional)
+        # Items (optional) - keep plain names for display plus structured line items for storage
         items = data.get("items", [])
+        cleaned["items"] = []
+        cleaned["line_items"] = []
         if isinstance(items, list):
-            cleaned["items"] = [str(item).strip() for item in items if item]
-        else:
-            cleaned["items"] = []
+            for item in items:
+                if not item:
+                    continue
+                if isinstance(item, dict):
+                    name = str(item.get("name", "")).strip()
+                    line_item = {
+                        "name": name,
+                        "amount": self._parse_number(item.get("price", item.get("amount"))),
+                        "quantity": self._parse_number(item.get("quantity")),
+                    }
+                else:
+                    name = str(item).strip()
+                    line_item = {"name": name, "amount": None, "quantity": None}
+                if name:
+                    cleaned["items"].append(name)
+                    cleaned["line_items"].append(line_item)
         
         # Confidence
         confidence = str(data.get("confidence", "medium")).lower()
         cleaned["confidence"] = confidence if confidence in ["high", "medium", "low"] else "medium"
         
         return cleaned
+    
+    def _parse_number(self, value: Any) -> Optional[float]:
+        """Parse a price/quantity that may arrive as a string like '$3.50'."""
+        if value is None:
+            return None
+        try:
+            return abs(float(re.sub(r"[^0-9.\-]", "", str(value))))
+        except ValueError:
+            return None
 
 # Global instance
 receipt_service = ReceiptService()
\ No newline at end of file
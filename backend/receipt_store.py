@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from typing import Optional
+from fastapi import UploadFile
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+STORE_ROOT = os.getenv(
+    "RECEIPT_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "receipt_images")
+)
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZE = (320, 320)
+
+EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/heic": ".heic",
+    "image/heif": ".heif",
+}
+MIME_TYPES = {ext: mime for mime, ext in EXTENSIONS.items()}
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+class UnsupportedImageTypeError(ValueError):
+    pass
+
+
+class ReceiptImageStore:
+    """
+    Content-addressed store for receipt images on local disk.
+
+    Images are named by the SHA-256 of their bytes and sharded two levels deep
+    (ab/cd/abcd...), so an identical upload is stored once. Uploads are streamed
+    to disk in chunks and a JPEG thumbnail is written next to each original.
+    """
+
+    def __init__(self, root: str = STORE_ROOT):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def is_valid_hash(self, image_hash: str) -> bool:
+        return bool(_HASH_RE.match(image_hash or ""))
+
+    def _shard_dir(self, image_hash: str) -> str:
+        return os.path.join(self.root, image_hash[:2], image_hash[2:4])
+
+    def image_path(self, image_hash: str) -> Optional[str]:
+        """Path of the original image for a hash, or None if it isn't stored."""
+        if not self.is_valid_hash(image_hash):
+            return None
+        shard = self._shard_dir(image_hash)
+        for ext in MIME_TYPES:
+            path = os.path.join(shard, image_hash + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def thumbnail_path(self, image_hash: str) -> Optional[str]:
+        if not self.is_valid_hash(image_hash):
+            return None
+        path = os.path.join(self._shard_dir(image_hash), f"{image_hash}.thumb.jpg")
+        return path if os.path.exists(path) else None
+
+    def media_type(self, path: str) -> str:
+        return MIME_TYPES.get(os.path.splitext(path)[1], "application/octet-stream")
+
+    async def save_upload(self, file: UploadFile, mime_type: str, max_bytes: int) -> str:
+        """
+        Stream an upload to disk while hashing it and return the content hash.
+        Raises UnsupportedImageTypeError for a type with no stored extension and
+        ImageTooLargeError if the upload exceeds max_bytes.
+        """
+        if mime_type not in EXTENSIONS:
+            raise UnsupportedImageTypeError(f"Unsupported image type: {mime_type}")
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = await file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ImageTooLargeError(f"Image exceeds {max_bytes} bytes")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            image_hash = digest.hexdigest()
+            existing_path = self.image_path(image_hash)
+            if existing_path:
+                logger.info(f"Receipt image already stored: {image_hash}")
+                # The first upload's thumbnail may have failed or been removed
+                if not self.thumbnail_path(image_hash):
+                    await asyncio.to_thread(self._write_thumbnail, existing_path, image_hash)
+                return image_hash
+
+            shard = self._shard_dir(image_hash)
+            os.makedirs(shard, exist_ok=True)
+            final_path = os.path.join(shard, image_hash + EXTENSIONS[mime_type])
+            os.replace(tmp_path, final_path)
+            tmp_path = None
+            await asyncio.to_thread(self._write_thumbnail, final_path, image_hash)
+            logger.info(f"Stored receipt image {image_hash} ({size} bytes)")
+            return image_hash
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _write_thumbnail(self, path: str, image_hash: str):
+        """Pre-generate a JPEG thumbnail; a failure here never fails the upload."""
+        thumb_path = os.path.join(self._shard_dir(image_hash), f"{image_hash}.thumb.jpg")
+        try:
+            with Image.open(path) as image:
+                # draft() lets the JPEG decoder downscale while decoding
+                image.draft("RGB", THUMBNAIL_SIZE)
+                image.thumbnail(THUMBNAIL_SIZE)
+                image.convert("RGB").save(thumb_path, "JPEG", quality=80)
+        except Exception as e:
+            logger.warning(f"Could not create thumbnail for {image_hash}: {e}")
+
+    def read_bytes(self, image_hash: str) -> bytes:
+        """Read a stored image, for callers (like Gemini extraction) that need inline bytes."""
+        path = self.image_path(image_hash)
+        if not path:
+            raise FileNotFoundError(image_hash)
+        with open(path, "rb") as f:
+            return f.read()
+
+# Global instance
+receipt_store = ReceiptImageStore()
@@ -0,0 +1,99 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from database import get_data_version
+
+CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "600"))
+CACHE_MAX_BYTES = int(os.getenv("CHAT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """'  How am I doing this month?? ' and 'how am i doing this month' share one cache entry."""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", prompt.lower()).strip())
+
+
+def cache_opt_out(cache_control: Optional[str]) -> bool:
+    """Clients skip the cache with 'Cache-Control: no-cache' or 'no-store'."""
+    directives = (cache_control or "").lower()
+    return "no-cache" in directives or "no-store" in directives
+
+
+class ResponseCache:
+    """
+    LRU cache of complete chat answers, stored as the list of streamed chunks.
+
+    Keys combine the model, the normalized prompt and the finance data version,
+    so any committed write makes older answers unreachable; they then age out
+    through the TTL or LRU eviction. Memory is bounded by total text size.
+
+    Callers read the data version when a request starts and pass it to both
+    get() and put(): an answer generated while a write landed is not stored,
+    since it may describe the data from before the write.
+    """
+
+    def __init__(self, ttl_seconds: float = CACHE_TTL_SECONDS, max_bytes: int = CACHE_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str, int], Tuple[float, List[str], int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, model: str, prompt: str, version: int) -> Tuple[str, str, int]:
+        return (model, normalize_prompt(prompt), version)
+
+    def get(self, model: str, prompt: str, version: Optional[int] = None) -> Optional[List[str]]:
+        key = self._key(model, prompt, get_data_version() if version is None else version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, model: str, prompt: str, chunks: List[str], version: Optional[int] = None):
+        """Store an answer generated against data `version` (default: the current one)."""
+        size = sum(len(chunk) for chunk in chunks)
+        if not chunks or size > self.max_bytes:
+            return
+        current = get_data_version()
+        if version is not None and version != current:
+            # Data changed while the answer was generated
+            return
+        key = self._key(model, prompt, current)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, list(chunks), size)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+# Global instance
+chat_cache = ResponseCache()
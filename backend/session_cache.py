@@ -0,0 +1,208 @@
+import asyncio
+import copy
+import logging
+import os
+import time
+import types as pytypes
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, DatabaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.database_session_service import (
+    StorageAppState, StorageEvent, StorageSession, StorageUserState, _extract_state_delta,
+)
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+# How long the flusher waits after the first queued event so later ones share a transaction
+SESSION_CACHE_FLUSH_DELAY = float(os.getenv("SESSION_CACHE_FLUSH_DELAY_SECONDS", "0.05"))
+# A failed batch is retried after this delay, doubled per consecutive failure up to the max
+SESSION_CACHE_RETRY_BASE_DELAY = float(os.getenv("SESSION_CACHE_RETRY_BASE_DELAY_SECONDS", "0.5"))
+SESSION_CACHE_RETRY_MAX_DELAY = float(os.getenv("SESSION_CACHE_RETRY_MAX_DELAY_SECONDS", "30"))
+
+SessionKey = Tuple[str, str, str]
+
+
+class CachedSessionService(BaseSessionService):
+    """
+    LRU cache of live Session objects in front of DatabaseSessionService.
+
+    get_session serves hot sessions from memory, and every caller of the same
+    session shares one object, so concurrent connections see each other's
+    events. append_event updates that object immediately and queues the
+    event; a single background flusher writes queued events (and their state
+    deltas) to the database in one transaction per batch, in append order.
+    A cache miss flushes the session's queued events before loading it, so
+    a reload never misses a write. Assumes one process owns a session's
+    writes at a time.
+    """
+
+    def __init__(self, inner: DatabaseSessionService, max_entries: int = SESSION_CACHE_SIZE):
+        self.inner = inner
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[SessionKey, Session]" = OrderedDict()
+        self._load_locks: Dict[SessionKey, asyncio.Lock] = {}
+        self._pending: Dict[SessionKey, List[Event]] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "batches": 0, "events_persisted": 0, "flush_failures": 0, "flush_ms": 0.0}
+
+    def __getattr__(self, name):
+        # metadata, database_session_factory, ... come from the wrapped service
+        return getattr(self.inner, name)
+
+    def _remember(self, key: SessionKey, session: Session):
+        self._entries[key] = session
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, app_name: str, user_id: str, session_id: str):
+        """Drop a session from memory; the next get_session reloads it from the database."""
+        self._entries.pop((app_name, user_id, session_id), None)
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[Dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session = await self.inner.create_session(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+        self._remember((app_name, user_id, session.id), session)
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        session = self._entries.get(key)
+        if session is None:
+            lock = self._load_locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                # Another caller may have loaded it while we waited
+                session = self._entries.get(key)
+                if session is None:
+                    self._stats["misses"] += 1
+                    if key in self._pending:
+                        await self.flush()
+                    session = await self.inner.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+                    if session is None:
+                        return None
+                else:
+                    self._stats["hits"] += 1
+            self._load_locks.pop(key, None)
+        else:
+            self._stats["hits"] += 1
+        self._remember(key, session)
+
+        if config is None:
+            return session
+        # Filtered views are copies of the shared session
+        view = copy.copy(session)
+        events = session.events
+        if config.after_timestamp:
+            events = [e for e in events if e.timestamp >= config.after_timestamp]
+        if config.num_recent_events:
+            events = events[-config.num_recent_events:]
+        view.events = list(events)
+        return view
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        return await self.inner.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self._entries.pop(key, None)
+        self._pending.pop(key, None)
+        await self.inner.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        await super().append_event(session=session, event=event)
+        shared = self._entries.get(key)
+        if shared is not None and shared is not session:
+            # A filtered view, or an object from before an eviction: the cached
+            # copy lacks this event, so reload it (after a flush) next time
+            self._entries.pop(key, None)
+        self._pending.setdefault(key, []).append(event)
+        self._schedule_flush()
+        return event
+
+    def _schedule_flush(self):
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+        self._wakeup.set()
+
+    async def _flush_loop(self):
+        failures = 0
+        while True:
+            if failures:
+                # The failed batch is back in the queue: retry it without waiting for another append
+                await asyncio.sleep(min(SESSION_CACHE_RETRY_BASE_DELAY * 2 ** (failures - 1), SESSION_CACHE_RETRY_MAX_DELAY))
+            else:
+                await self._wakeup.wait()
+                await asyncio.sleep(SESSION_CACHE_FLUSH_DELAY)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                self._stats["flush_failures"] += 1
+                logger.error(f"Session cache flush failed (attempt {failures}), retrying: {e}")
+
+    async def flush(self):
+        """Persist every queued event. Safe to call concurrently; batches are written in order."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._pending:
+                batch, self._pending = self._pending, {}
+                started = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self._persist, batch)
+                except Exception:
+                    # Put the batch back in front of anything queued meanwhile
+                    for key, events in self._pending.items():
+                        batch.setdefault(key, []).extend(events)
+                    self._pending = batch
+                    raise
+                self._stats["batches"] += 1
+                self._stats["events_persisted"] += sum(len(events) for events in batch.values())
+                self._stats["flush_ms"] += (time.perf_counter() - started) * 1000
+
+    def _persist(self, batch: Dict[SessionKey, List[Event]]):
+        with self.inner.database_session_factory() as db:
+            for (app_name, user_id, session_id), events in batch.items():
+                storage_session = db.get(StorageSession, (app_name, user_id, session_id))
+                if storage_session is None:
+                    logger.warning(f"Dropping {len(events)} events for deleted session {session_id}")
+                    continue
+                owner = pytypes.SimpleNamespace(id=session_id, app_name=app_name, user_id=user_id)
+                for event in events:
+                    if event.actions and event.actions.state_delta:
+                        self._apply_state_delta(db, storage_session, event.actions.state_delta)
+                    db.add(StorageEvent.from_event(owner, event))
+            db.commit()
+
+    def _apply_state_delta(self, db, storage_session: StorageSession, state_delta: Dict[str, Any]):
+        app_delta, user_delta, session_delta = _extract_state_delta(state_delta)
+        if app_delta:
+            app_state = db.get(StorageAppState, storage_session.app_name)
+            app_state.state = {**app_state.state, **app_delta}
+        if user_delta:
+            user_state = db.get(StorageUserState, (storage_session.app_name, storage_session.user_id))
+            user_state.state = {**user_state.state, **user_delta}
+        if session_delta:
+            storage_session.state = {**storage_session.state, **session_delta}
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **{k: round(v, 2) for k, v in self._stats.items()},
+            "entries": len(self._entries),
+            "pending_events": sum(len(events) for events in self._pending.values()),
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+        }
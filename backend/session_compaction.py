@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import types as pytypes
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from google.adk.events import Event
+from google.adk.sessions.database_session_service import StorageEvent, StorageSession
+from google.genai import types
+
+from adk_services import session_service, financial_agent
+from gemini_service import gemini
+from model_router import model_router
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEEP_EVENTS = int(os.getenv("SESSION_KEEP_EVENTS", "40"))
+SESSION_MAX_TOKENS = int(os.getenv("SESSION_MAX_TOKENS", "8000"))
+SESSION_COMPACTION_INTERVAL_SECONDS = float(os.getenv("SESSION_COMPACTION_INTERVAL_SECONDS", "300"))
+SUMMARY_PREFIX = "Summary of our earlier conversation: "
+
+SUMMARY_PROMPT = """Summarize this conversation between a user and their financial assistant in under 150 words.
+Keep amounts, dates, transactions that were logged, goals, budgets and decisions. Write plain prose.
+
+"""
+
+
+def _estimate_tokens(content: Optional[Dict[str, Any]]) -> int:
+    # ~4 characters per token is close enough to decide when to compact
+    return len(json.dumps(content)) // 4 if content else 0
+
+
+def _event_text(content: Optional[Dict[str, Any]]) -> str:
+    """Text parts only; audio, function calls and responses are dropped from summaries."""
+    if not content:
+        return ""
+    return " ".join(part["text"].strip() for part in content.get("parts", []) if part.get("text")).strip()
+
+
+def _starts_user_turn(event: StorageEvent) -> bool:
+    # Cutting anywhere else could orphan a function response from its call.
+    # Voice turns carry audio or a transcription rather than typed text.
+    if event.author != "user" or not event.content:
+        return False
+    return any(part.get("text") or part.get("inline_data") for part in event.content.get("parts", []))
+
+
+def _is_turn_boundary(events: List[StorageEvent], index: int) -> bool:
+    # A completed model turn has answered every call in it, so the next event is a safe cut too
+    return _starts_user_turn(events[index]) or bool(events[index - 1].turn_complete)
+
+
+class SessionCompactor:
+    """
+    Keeps ADK session histories bounded. Events older than the last
+    SESSION_KEEP_EVENTS (or beyond SESSION_MAX_TOKENS of estimated context)
+    are summarized into a single model event and deleted. The summary is
+    timestamped just before the first kept event, so get_session loads it
+    first. Runs periodically as a background task.
+    """
+
+    def __init__(self, service, keep_events: int = SESSION_KEEP_EVENTS, max_tokens: int = SESSION_MAX_TOKENS):
+        self.service = service
+        self.keep_events = keep_events
+        self.max_tokens = max_tokens
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._stats: Dict[str, Any] = {
+            "runs": 0, "sessions_compacted": 0, "events_pruned": 0,
+            "last_run": None, "sessions": {},
+        }
+
+    def _load_events(self, app_name: str, user_id: str, session_id: str) -> List[StorageEvent]:
+        with self.service.database_session_factory() as db:
+            return (
+                db.query(StorageEvent)
+                .filter(StorageEvent.app_name == app_name)
+                .filter(StorageEvent.user_id == user_id)
+                .filter(StorageEvent.session_id == session_id)
+                .order_by(StorageEvent.timestamp.asc())
+                .all()
+            )
+
+    def _cut_index(self, events: List[StorageEvent]) -> int:
+        """Index of the first event to keep, or 0 if nothing should be pruned."""
+        cut = max(len(events) - self.keep_events, 0)
+        tokens = sum(_estimate_tokens(e.content) for e in events[cut:])
+        while tokens > self.max_tokens and cut < len(events) - 1:
+            tokens -= _estimate_tokens(events[cut].content)
+            cut += 1
+        while cut and cut < len(events) and not _is_turn_boundary(events, cut):
+            cut += 1
+        # Only a previous summary (or nothing) before the cut: nothing to gain
+        return cut if cut < len(events) and cut >= 2 else 0
+
+    async def _summarize(self, events: List[StorageEvent]) -> str:
+        lines = []
+        for event in events:
+            text = _event_text(event.content)
+            if text:
+                speaker = "User" if event.author == "user" else "Assistant"
+                lines.append(f"{speaker}: {text}")
+        transcript = "\n".join(lines)[-12000:]
+        if not transcript:
+            return "No text was exchanged earlier."
+        try:
+            decision = model_router.route("chat", prompt_chars=len(transcript))
+            response = await gemini.generate_content(model=decision.model, contents=[SUMMARY_PROMPT + transcript])
+            if response.text:
+                return response.text.strip()
+        except Exception as e:
+            logger.warning(f"Session summary generation failed, using extract: {e}")
+        # Extractive fallback: the most recent whole lines that fit
+        kept, size = [], 0
+        for line in reversed(lines):
+            size += len(line) + 1
+            if kept and size > 1500:
+                break
+            kept.append(line[:1500])
+        return "\n".join(reversed(kept))
+
+    def _replace_prefix(self, app_name: str, user_id: str, session_id: str, pruned: List[StorageEvent], first_kept: StorageEvent, summary: str):
+        summary_event = Event(
+            id=f"summary-{uuid.uuid4()}",
+            invocation_id=f"compaction-{uuid.uuid4()}",
+            author=financial_agent.name,
+            content=types.Content(role="model", parts=[types.Part(text=SUMMARY_PREFIX + summary)]),
+        )
+        owner = pytypes.SimpleNamespace(id=session_id, app_name=app_name, user_id=user_id)
+        storage_event = StorageEvent.from_event(owner, summary_event)
+        storage_event.timestamp = first_kept.timestamp - timedelta(microseconds=1)
+
+        with self.service.database_session_factory() as db:
+            db.query(StorageEvent).filter(
+                StorageEvent.app_name == app_name,
+                StorageEvent.user_id == user_id,
+                StorageEvent.session_id == session_id,
+                StorageEvent.id.in_([e.id for e in pruned]),
+            ).delete(synchronize_session=False)
+            db.add(storage_event)
+            db.commit()
+
+    async def _timed_load(self, app_name: str, user_id: str, session_id: str) -> float:
+        # Always a database load: a hit in the session cache in front of it would say nothing about compaction
+        database_service = getattr(self.service, "inner", self.service)
+        started = time.perf_counter()
+        await database_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        return round((time.perf_counter() - started) * 1000, 2)
+
+    async def compact_session(self, app_name: str, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+        key = f"{app_name}/{user_id}/{session_id}"
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Queued writes must be on disk before we decide what to prune
+            await self.service.flush()
+            events = await asyncio.to_thread(self._load_events, app_name, user_id, session_id)
+            cut = self._cut_index(events)
+            if not cut:
+                return None
+
+            load_ms_before = await self._timed_load(app_name, user_id, session_id)
+            tokens_before = sum(_estimate_tokens(e.content) for e in events)
+            summary = await self._summarize(events[:cut])
+            await asyncio.to_thread(self._replace_prefix, app_name, user_id, session_id, events[:cut], events[cut], summary)
+            # The cached copy still holds the pruned events
+            self.service.invalidate(app_name, user_id, session_id)
+            load_ms_after = await self._timed_load(app_name, user_id, session_id)
+            tokens_after = sum(_estimate_tokens(e.content) for e in events[cut:]) + len(summary) // 4
+
+            result = {
+                "events_before": len(events),
+                "events_after": len(events) - cut + 1,
+                "context_tokens_before": tokens_before,
+                "context_tokens_after": tokens_after,
+                "load_ms_before": load_ms_before,
+                "load_ms_after": load_ms_after,
+            }
+            self._stats["sessions_compacted"] += 1
+            self._stats["events_pruned"] += cut
+            self._stats["sessions"][key] = result
+            logger.info(f"Compacted session {key}: {result}")
+            return result
+
+    def _list_sessions(self) -> List[tuple]:
+        with self.service.database_session_factory() as db:
+            return [
+                (s.app_name, s.user_id, s.id)
+                for s in db.query(StorageSession.app_name, StorageSession.user_id, StorageSession.id).all()
+            ]
+
+    async def compact_all(self):
+        self._stats["runs"] += 1
+        self._stats["last_run"] = time.time()
+        for app_name, user_id, session_id in await asyncio.to_thread(self._list_sessions):
+            try:
+                await self.compact_session(app_name, user_id, session_id)
+            except Exception as e:
+                logger.error(f"Session compaction failed for {session_id}: {e}")
+
+    async def run_forever(self, interval: float = SESSION_COMPACTION_INTERVAL_SECONDS):
+        while True:
+            await self.compact_all()
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._stats
+
+# Global instance
+session_compactor = SessionCompactor(session_service)
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+from fastapi import Header, HTTPException, Query
+from google.adk.sessions import Session
+
+from adk_services import session_service
+
+logger = logging.getLogger(__name__)
+
+APP_NAME = "PennyWise"
+# The app has no login yet; requests without X-User-Id act as this user
+DEFAULT_USER_ID = os.getenv("DEFAULT_USER_ID", "user_123")
+DEFAULT_CONVERSATION_ID = "default"
+# Conversations with no connection for this long are forgotten (their sessions stay in the DB)
+IDLE_SECONDS = 3600
+
+_VALID_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def validate_id(value: str, kind: str) -> str:
+    if not _VALID_ID.match(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {kind}: use 1-64 letters, digits, '_' or '-'")
+    return value
+
+
+def session_id_for(user_id: str, conversation_id: str) -> str:
+    # The default conversation keeps the original "<user>_session" ID so existing history still loads.
+    # Other conversations get their own "_c_" namespace, so a conversation named "session" cannot alias it.
+    if conversation_id == DEFAULT_CONVERSATION_ID:
+        return f"{user_id}_session"
+    return f"{user_id}_c_{conversation_id}"
+
+
+@dataclass
+class SessionIdentity:
+    user_id: str
+    conversation_id: str
+
+    @property
+    def session_id(self) -> str:
+        return session_id_for(self.user_id, self.conversation_id)
+
+
+def session_identity(
+    x_user_id: Optional[str] = Header(None),
+    x_conversation_id: Optional[str] = Header(None),
+    conversation_id: Optional[str] = Query(None),
+) -> SessionIdentity:
+    """FastAPI dependency: who is calling and which conversation they mean."""
+    user_id = validate_id(x_user_id or DEFAULT_USER_ID, "user id")
+    conversation = validate_id(conversation_id or x_conversation_id or DEFAULT_CONVERSATION_ID, "conversation id")
+    return SessionIdentity(user_id=user_id, conversation_id=conversation)
+
+
+@dataclass
+class _Conversation:
+    user_id: str
+    conversation_id: str
+    session_id: str
+    created: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.time)
+    active: Dict[str, int] = field(default_factory=dict)
+
+
+class SessionRegistry:
+    """
+    Maps (user, conversation) to its own ADK session, creating it on first
+    use. Creation is serialized per key so concurrent first requests don't
+    race on the insert, while different conversations never wait on each
+    other. Tracks which conversations have live voice/chat connections.
+    """
+
+    def __init__(self, service=session_service):
+        self.service = service
+        self._conversations: Dict[Tuple[str, str], _Conversation] = {}
+        self._create_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self.created = 0
+
+    def new_conversation_id(self) -> str:
+        return uuid.uuid4().hex[:12]
+
+    async def get_or_create(self, identity: SessionIdentity) -> Session:
+        key = (identity.user_id, identity.conversation_id)
+        session = await self.service.get_session(
+            app_name=APP_NAME, user_id=identity.user_id, session_id=identity.session_id
+        )
+        if session is None:
+            lock = self._create_locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                session = await self.service.get_session(
+                    app_name=APP_NAME, user_id=identity.user_id, session_id=identity.session_id
+                )
+                if session is None:
+                    session = await self.service.create_session(
+                        app_name=APP_NAME, user_id=identity.user_id, session_id=identity.session_id
+                    )
+                    self.created += 1
+                    logger.info(f"Created session {identity.session_id} for user {identity.user_id}")
+            self._create_locks.pop(key, None)
+
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            self._prune()
+            conversation = self._conversations[key] = _Conversation(
+                identity.user_id, identity.conversation_id, identity.session_id
+            )
+        conversation.last_seen = time.time()
+        return session
+
+    def _prune(self):
+        cutoff = time.time() - IDLE_SECONDS
+        for key, c in list(self._conversations.items()):
+            if c.last_seen < cutoff and not any(c.active.values()):
+                del self._conversations[key]
+
+    async def exists(self, identity: SessionIdentity) -> bool:
+        session = await self.service.get_session(
+            app_name=APP_NAME, user_id=identity.user_id, session_id=identity.session_id
+        )
+        return session is not None
+
+    async def acquire(self, identity: SessionIdentity, kind: str) -> Session:
+        """Get the session and count one more live `kind` ("voice", "chat") connection on it."""
+        session = await self.get_or_create(identity)
+        conversation = self._conversations[(identity.user_id, identity.conversation_id)]
+        conversation.active[kind] = conversation.active.get(kind, 0) + 1
+        return session
+
+    def release(self, identity: SessionIdentity, kind: str):
+        conversation = self._conversations.get((identity.user_id, identity.conversation_id))
+        if conversation and conversation.active.get(kind):
+            conversation.active[kind] -= 1
+            conversation.last_seen = time.time()
+
+    def conversations(self, user_id: str) -> list:
+        return [
+            {
+                "conversation_id": c.conversation_id,
+                "session_id": c.session_id,
+                "last_seen": c.last_seen,
+                "active_connections": {k: v for k, v in c.active.items() if v},
+            }
+            for (owner, _), c in self._conversations.items() if owner == user_id
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        active = [c for c in self._conversations.values() if any(c.active.values())]
+        return {
+            "known_conversations": len(self._conversations),
+            "users": len({c.user_id for c in self._conversations.values()}),
+            "sessions_created": self.created,
+            "active_conversations": len(active),
+            "active_connections": sum(sum(c.active.values()) for c in active),
+        }
+
+# Global instance
+session_registry = SessionRegistry()
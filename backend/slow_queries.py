@@ -0,0 +1,211 @@
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+
+from metrics import current_route
+from tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their query plan
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "50"))
+# Log parameter types and sizes instead of values (they can hold user data)
+SLOW_QUERY_REDACT = os.getenv("SLOW_QUERY_REDACT", "1") != "0"
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") != "0"
+# Distinct query shapes tracked; the least recently seen are forgotten first
+SLOW_QUERY_MAX_SHAPES = int(os.getenv("SLOW_QUERY_MAX_SHAPES", "500"))
+# A shape's plan is captured again after this long, in case indexes or data changed
+EXPLAIN_REFRESH_SECONDS = 600
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """One shape per query: literals become ?, IN lists collapse, whitespace is squeezed."""
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _SPACE.sub(" ", shape).strip()
+    # SQLAlchemy renders expanding IN parameters as (?, ?, ...) with one ? per value
+    return _IN_LIST.sub("(?...)", shape)
+
+
+def _redact(value: Any) -> str:
+    if value is None:
+        return "None"
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def format_parameters(parameters: Any, redact: bool = SLOW_QUERY_REDACT) -> Any:
+    if isinstance(parameters, dict):
+        return {k: _redact(v) if redact else repr(v)[:200] for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(v) if redact else repr(v)[:200] for v in parameters]
+    return _redact(parameters) if redact else repr(parameters)[:200]
+
+
+def _caller() -> str:
+    """Innermost frame of our own code that led to the statement, e.g. 'tools.py:88 get_transactions'."""
+    for frame in reversed(traceback.extract_stack(limit=60)[:-2]):
+        if frame.filename.startswith(_BACKEND_DIR) and not frame.filename.endswith(("slow_queries.py", "metrics.py")):
+            return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+    return "unknown"
+
+
+class SlowQueryLog:
+    """
+    Times every statement on an engine and aggregates them by normalized
+    shape (count, total, max). Statements over SLOW_QUERY_MS are logged with
+    their parameters (redacted by default), the calling route and our code's
+    frame that issued them, plus SQLite's EXPLAIN QUERY PLAN, captured once
+    per shape and refreshed every EXPLAIN_REFRESH_SECONDS. Plans that scan a
+    table without an index are flagged as full scans.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, max_shapes: int = SLOW_QUERY_MAX_SHAPES,
+                 explain: bool = SLOW_QUERY_EXPLAIN):
+        self.threshold_ms = threshold_ms
+        self.max_shapes = max_shapes
+        self.explain = explain
+        self._shapes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Statement text -> shape; SQLAlchemy reuses compiled strings, so normalizing is rarely needed
+        self._normalized: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.slow_total = 0
+
+    def attach(self, engine):
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slow_log_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            elapsed_ms = (time.perf_counter() - conn.info["slow_log_started"].pop()) * 1000
+            self.observe(conn, statement, parameters, executemany, elapsed_ms)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(context):
+            started = context.connection.info.get("slow_log_started") if context.connection is not None else None
+            if started:
+                started.pop()
+
+    def _shape_of(self, statement: str) -> str:
+        shape = self._normalized.get(statement)
+        if shape is None:
+            shape = normalize_sql(statement)
+            self._normalized[statement] = shape
+            if len(self._normalized) > self.max_shapes * 4:
+                self._normalized.popitem(last=False)
+        return shape
+
+    def observe(self, conn, statement: str, parameters: Any, executemany: bool, elapsed_ms: float):
+        with self._lock:
+            shape = self._shape_of(statement)
+            entry = self._shapes.get(shape)
+            if entry is None:
+                entry = self._shapes[shape] = {
+                    "shape": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "slow_count": 0,
+                    "routes": {}, "caller": None, "plan": None, "full_scan": None, "explained_at": 0.0,
+                }
+                if len(self._shapes) > self.max_shapes:
+                    self._shapes.popitem(last=False)
+            else:
+                self._shapes.move_to_end(shape)
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            if elapsed_ms < self.threshold_ms:
+                return
+            entry["slow_count"] += 1
+            self.slow_total += 1
+            needs_plan = self.explain and time.monotonic() - entry["explained_at"] > EXPLAIN_REFRESH_SECONDS
+            if needs_plan:
+                entry["explained_at"] = time.monotonic()
+
+        # Only slow statements get here: the stack walk and EXPLAIN stay off the fast path
+        route = current_route()
+        caller = _caller()
+        trace_id = current_trace_id()
+        plan = self._explain(conn, statement, parameters) if needs_plan and not executemany else None
+        with self._lock:
+            if plan is not None:
+                entry["plan"] = plan
+                entry["full_scan"] = any(_is_full_scan(step) for step in plan)
+            entry["routes"][route] = entry["routes"].get(route, 0) + 1
+            entry["caller"] = caller
+        logger.warning(
+            f"Slow query {elapsed_ms:.1f}ms on {route} from {caller}: {entry['shape']} "
+            f"params={format_parameters(parameters)}"
+            + (f" plan={' | '.join(entry['plan'])}" if entry["plan"] else "")
+            + (" [FULL SCAN]" if entry["full_scan"] else "")
+            + (f" trace={trace_id}" if trace_id else "")
+        )
+
+    def _explain(self, conn, statement: str, parameters: Any) -> Optional[List[str]]:
+        if conn.dialect.name != "sqlite" or not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            return None
+        try:
+            # A separate DBAPI cursor, so the statement's own results are left alone
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+                return [row[-1] for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.debug(f"EXPLAIN QUERY PLAN failed: {e}")
+            return None
+
+    def top(self, limit: int = 20, order: str = "total") -> List[Dict[str, Any]]:
+        """Slowest query shapes by total, max or average time."""
+        keys = {
+            "total": lambda e: e["total_ms"],
+            "max": lambda e: e["max_ms"],
+            "avg": lambda e: e["total_ms"] / e["count"],
+        }
+        with self._lock:
+            entries = [dict(e, routes=dict(e["routes"])) for e in self._shapes.values()]
+        entries.sort(key=keys.get(order, keys["total"]), reverse=True)
+        return [
+            {
+                "shape": e["shape"],
+                "count": e["count"],
+                "total_ms": round(e["total_ms"], 1),
+                "avg_ms": round(e["total_ms"] / e["count"], 2),
+                "max_ms": round(e["max_ms"], 1),
+                "slow_count": e["slow_count"],
+                "routes": e["routes"],
+                "caller": e["caller"],
+                "plan": e["plan"],
+                "full_scan": e["full_scan"],
+            }
+            for e in entries[:limit]
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "shapes": len(self._shapes),
+            "slow_statements": self.slow_total,
+            "redacted": SLOW_QUERY_REDACT,
+        }
+
+
+def _is_full_scan(step: str) -> bool:
+    # "SCAN transactions" reads every row; "SCAN t USING (COVERING) INDEX ..." walks an index instead
+    return step.startswith("SCAN ") and "USING" not in step
+
+# Global instance
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,74 @@
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+import analytics
+from database import SessionLocal, get_data_version
+
+logger = logging.getLogger(__name__)
+
+
+class FinancialSnapshotCache:
+    """
+    Per-user memo of a compact financial summary (balance, this month's totals,
+    budget utilization, goals and recent transactions).
+
+    Each entry is stamped with the data version it was built from; any committed
+    write advances the version, so the next read rebuilds the snapshot.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, user_id: str) -> Dict[str, Any]:
+        version = get_data_version()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+
+        # Build outside the lock; a concurrent write only makes this entry stale
+        snapshot = self._build()
+        with self._lock:
+            self._entries[user_id] = (version, snapshot)
+            self.builds += 1
+        return snapshot
+
+    def _build(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            income = analytics.monthly_income(db)
+            expenses = analytics.monthly_expenses(db)
+            return {
+                "as_of": datetime.now().isoformat(timespec="seconds"),
+                "balance": round(analytics.total_balance(db), 2),
+                "this_month": {
+                    "income": round(income, 2),
+                    "expenses": round(expenses, 2),
+                    "net": round(income - expenses, 2),
+                },
+                "budget_utilization": analytics.budget_utilization(db),
+                "budgets": analytics.budget_list(db),
+                "goals": analytics.goal_list(db),
+                "recent_transactions": analytics.recent_transactions(db, limit=5),
+            }
+        finally:
+            db.close()
+
+    def render(self, user_id: str) -> str:
+        """Compact JSON of the parts worth putting in the model's context."""
+        snapshot = self.get(user_id)
+        compact = {key: value for key, value in snapshot.items() if key != "budgets"}
+        return json.dumps(compact, separators=(",", ":"))
+
+    def stats(self) -> Dict[str, int]:
+        return {"users": len(self._entries), "hits": self.hits, "builds": self.builds}
+
+# Global instance
+snapshot_cache = FinancialSnapshotCache()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test where session compaction may cut a history, including voice-only conversations
+"""
+
+import os
+import tempfile
+
+# Throwaway database; set before the app modules read it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test_session_compaction.db")
+
+from google.adk.sessions.database_session_service import StorageEvent
+
+from session_compaction import SessionCompactor
+
+AUDIO = {"inline_data": {"mime_type": "audio/pcm", "data": "AAAA"}}
+
+
+def _user_audio():
+    return StorageEvent(author="user", content={"role": "user", "parts": [AUDIO]})
+
+
+def _model_audio():
+    return StorageEvent(author="FinancialAgent", content={"role": "model", "parts": [AUDIO]})
+
+
+def _model_turn_complete():
+    return StorageEvent(author="FinancialAgent", turn_complete=True)
+
+
+def _tool_call():
+    call = {"function_call": {"name": "get_balance", "args": {}}}
+    response = {"function_response": {"name": "get_balance", "response": {"balance": 10}}}
+    return [
+        StorageEvent(author="FinancialAgent", content={"role": "model", "parts": [call]}),
+        StorageEvent(author="FinancialAgent", content={"role": "user", "parts": [response]}),
+    ]
+
+
+def test_voice_only_history_is_cut_at_a_user_turn():
+    events = []
+    for _ in range(6):
+        events += [_user_audio(), *_tool_call(), _model_audio(), _model_turn_complete()]
+    compactor = SessionCompactor(service=None, keep_events=7, max_tokens=100000)
+
+    cut = compactor._cut_index(events)
+    assert cut > 0
+    assert events[cut].author == "user"
+
+
+def test_history_without_user_content_is_cut_after_a_completed_turn():
+    # Nothing of the user's side was stored: fall back to the end of a model turn
+    events = []
+    for _ in range(6):
+        events += [*_tool_call(), _model_audio(), _model_turn_complete()]
+    compactor = SessionCompactor(service=None, keep_events=6, max_tokens=100000)
+
+    cut = compactor._cut_index(events)
+    assert cut > 0
+    assert events[cut - 1].turn_complete
+    assert "function_call" in events[cut].content["parts"][0]
+
+
+if __name__ == "__main__":
+    test_voice_only_history_is_cut_at_a_user_turn()
+    test_history_without_user_content_is_cut_after_a_completed_turn()
+    print("🎉 Session compaction tests passed!")
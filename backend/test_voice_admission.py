@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test that warm live sessions count against voice capacity but never keep a new connection out
+"""
+
+import asyncio
+import os
+import tempfile
+
+# Local stand-in for Gemini Live and a throwaway database; set before the app modules read them
+os.environ["VOICE_MODEL_STANDIN"] = "1"
+os.environ["VOICE_STANDIN_CONNECT_MS"] = "20"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test_voice_admission.db")
+
+from database import engine, create_tables
+from adk_services import initialize_adk_services
+from session_registry import SessionIdentity
+from voice_admission import voice_admission
+from voice_pool import warm_pool
+
+
+async def _wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def _full_pool_admits_new_connection():
+    voice_admission.max_sessions = 2
+    voice_admission.wait_seconds = 1.0
+    warm_pool.warm(SessionIdentity("warm_user_1", "main"))
+    warm_pool.warm(SessionIdentity("warm_user_2", "main"))
+    await _wait_for(lambda: warm_pool.stats()["size"] == 2)
+    assert voice_admission.stats()["in_use"] == 2
+    assert not voice_admission.accepting
+
+    # Every slot is held by an idle warm stream: the newcomer gets one of them
+    assert await voice_admission.acquire("caller")
+    stats = voice_admission.stats()
+    assert stats["warm_reclaimed"] == 1
+    assert warm_pool.stats()["size"] == 1
+    assert stats["active"] == 1 and stats["in_use"] == 2
+
+    # A caller taking over its own warm entry is not charged for it, and it is not reclaimed
+    remaining_user = next(iter(warm_pool._entries))[0]
+    assert await voice_admission.acquire(remaining_user, claims_warm=True)
+    assert voice_admission.stats()["warm_reclaimed"] == 1
+    assert warm_pool.has_warm(SessionIdentity(remaining_user, "main"))
+    voice_admission.release(remaining_user)
+
+    voice_admission.release("caller")
+    warm_pool.close_all()
+
+
+def test_full_pool_admits_new_connection():
+    create_tables()
+    initialize_adk_services(engine)
+    asyncio.run(_full_pool_admits_new_connection())
+
+
+if __name__ == "__main__":
+    test_full_pool_admits_new_connection()
+    print("🎉 Voice admission tests passed!")
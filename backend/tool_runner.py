@@ -0,0 +1,183 @@
+import asyncio
+import bisect
+import inspect
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+
+from tracing import tracer, in_context
+
+logger = logging.getLogger(__name__)
+
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT_SECONDS", "3.0"))
+# Per-tool overrides of DEFAULT_TOOL_TIMEOUT for read tools
+TOOL_TIMEOUTS: Dict[str, float] = {}
+# Tools that change data are never started ahead of ADK asking for them, and have no
+# timeout: the worker thread would still commit after we gave up, and a retry would
+# write the same record twice
+WRITE_TOOLS = {"add_transaction"}
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class ToolRunner:
+    """
+    Executes the agent's synchronous tools on a dedicated, bounded thread pool
+    so a slow query or SQLite lock never blocks the event loop that also pumps
+    live audio.
+
+    Installed as the agent's before_tool_callback: ADK calls it for each tool
+    call and uses its return value as the tool response. Every read has a
+    timeout, writes run to completion, and failures come back as a structured
+    error instead of raising. When the model asks for several read-only
+    tools in one turn, all of them are started on the first callback, so they
+    run in parallel even though ADK awaits them one after another.
+    """
+
+    def __init__(self, max_workers: int = TOOL_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-tool")
+        self._tools: Dict[str, Callable] = {}
+        self._started: Dict[str, Tuple[asyncio.Task, float]] = {}
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, tools: Iterable[Callable]):
+        for func in tools:
+            self._tools[func.__name__] = func
+
+    def _prepare_args(self, func: Callable, args: Dict[str, Any], user_id: Optional[str]) -> Tuple[Dict[str, Any], list]:
+        params = inspect.signature(func).parameters
+        call_args = {k: v for k, v in args.items() if k in params}
+        if "user_id" in params and user_id:
+            # The backend owns the user id; never trust the model's guess
+            call_args["user_id"] = user_id
+        missing = [
+            name for name, p in params.items()
+            if p.default is inspect.Parameter.empty and name not in call_args
+        ]
+        return call_args, missing
+
+    async def _execute(self, name: str, args: Dict[str, Any], user_id: Optional[str]) -> Dict[str, Any]:
+        func = self._tools[name]
+        call_args, missing = self._prepare_args(func, args, user_id)
+        if missing:
+            return {"error": f"Invoking `{name}()` failed: missing required parameters {', '.join(missing)}."}
+
+        timeout = None if name in WRITE_TOOLS else TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+        started = time.perf_counter()
+        outcome = "ok"
+        span = tracer.start_span(f"tool {name}", attributes={"tool.name": name})
+        if timeout is not None:
+            span.set_attribute("tool.timeout_seconds", timeout)
+        try:
+            loop = asyncio.get_running_loop()
+            # The worker thread runs in this context, so the tool's queries nest under its span
+            with trace.use_span(span, end_on_exit=False):
+                call = in_context(func, **call_args)
+            result = await asyncio.wait_for(loop.run_in_executor(self._executor, call), timeout=timeout)
+            return result if isinstance(result, dict) else {"result": result}
+        except asyncio.TimeoutError:
+            # The worker thread finishes on its own; we just stop waiting for it
+            outcome = "timeout"
+            logger.warning(f"Tool {name} timed out after {timeout}s")
+            return {
+                "error": f"{name} timed out",
+                "status": "timeout",
+                "message": "This information is temporarily unavailable. Tell the user and offer to try again.",
+            }
+        except Exception as e:
+            outcome = "error"
+            span.record_exception(e)
+            logger.error(f"Tool {name} failed: {e}")
+            return {
+                "error": f"{name} failed: {e}",
+                "status": "error",
+                "message": "Something went wrong fetching this information. Tell the user and offer to try again.",
+            }
+        finally:
+            self._observe(name, (time.perf_counter() - started) * 1000, outcome)
+            span.set_attribute("tool.outcome", outcome)
+            if outcome != "ok":
+                span.set_status(Status(StatusCode.ERROR, outcome))
+            span.end()
+
+    def _start(self, call_id: str, name: str, args: Dict[str, Any], user_id: Optional[str]) -> asyncio.Task:
+        task = asyncio.create_task(self._execute(name, args, user_id))
+        self._started[call_id] = (task, time.monotonic())
+        return task
+
+    def _start_read_only_siblings(self, tool_context, own_call_id: str, user_id: Optional[str]):
+        """Start every other read-only call from the same model turn."""
+        invocation = getattr(tool_context, "_invocation_context", None)
+        session = getattr(invocation, "session", None)
+        if session is None:
+            return
+        # The function-call event was appended to the session before ADK ran any tool
+        for event in reversed(session.events[-10:]):
+            calls = event.get_function_calls()
+            if any(call.id == own_call_id for call in calls):
+                for call in calls:
+                    if (call.id != own_call_id and call.id not in self._started
+                            and call.name in self._tools and call.name not in WRITE_TOOLS):
+                        self._start(call.id, call.name, dict(call.args or {}), user_id)
+                return
+
+    def _prune(self):
+        cutoff = time.monotonic() - 60
+        for call_id, (task, created) in list(self._started.items()):
+            if task.done() and created < cutoff:
+                del self._started[call_id]
+
+    async def before_tool_callback(self, tool, args: Dict[str, Any], tool_context) -> Optional[Dict[str, Any]]:
+        if tool.name not in self._tools:
+            return None  # Not ours; let ADK run it
+
+        call_id = getattr(tool_context, "function_call_id", None) or f"{tool.name}:{id(args)}"
+        invocation = getattr(tool_context, "_invocation_context", None)
+        user_id = getattr(invocation, "user_id", None)
+
+        self._prune()
+        entry = self._started.pop(call_id, None)
+        if entry is None:
+            self._start_read_only_siblings(tool_context, call_id, user_id)
+            task = asyncio.create_task(self._execute(tool.name, args, user_id))
+        else:
+            task = entry[0]
+        return await task
+
+    def _observe(self, name: str, latency_ms: float, outcome: str):
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {
+                "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                "count": 0, "sum_ms": 0.0, "timeouts": 0, "errors": 0,
+            })
+            histogram["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+            histogram["count"] += 1
+            histogram["sum_ms"] += latency_ms
+            histogram["timeouts"] += outcome == "timeout"
+            histogram["errors"] += outcome == "error"
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tool cumulative latency histograms; bucket labels are upper bounds in ms."""
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["le_inf"]
+        with self._lock:
+            return {
+                name: {
+                    "count": h["count"],
+                    "avg_ms": round(h["sum_ms"] / h["count"], 2) if h["count"] else 0.0,
+                    "timeouts": h["timeouts"],
+                    "errors": h["errors"],
+                    "histogram": dict(zip(labels, itertools.accumulate(h["buckets"]))),
+                }
+                for name, h in self._histograms.items()
+            }
+
+# Global instance
+tool_runner = ToolRunner()
@@ -2,7 +2,11 @@ import uuid
 from datetime import datetime
 from sqlalchemy.orm import Session
 from database import SessionLocal
-from models import TransactionDB, BudgetDB, GoalDB, TransactionType
+from models import TransactionDB, TransactionType, LineItem
+from line_items import insert_line_items, item_spending, period_bounds
+from receipt_store import receipt_store
+import analytics
+from snapshot import snapshot_cache
 from typing import List, Dict, Any, Optional
 
 def add_transaction(
@@ -11,7 +15,9 @@ def add_transaction(
     amount: float,
     category: Optional[str] = None,
     type: Optional[str] = None,
-    date: Optional[str] = None
+    date: Optional[str] = None,
+    items: Optional[List[LineItem]] = None,
+    receipt_image: Optional[str] = None
 ) -> dict:
     """
     Adds a new transaction to the database. If category/type/date are missing, the AI can decide/fill them.
@@ -22,9 +28,15 @@ def add_transaction(
         category (str, optional): Category of the transaction. AI can fill if missing.
         type (str, optional): 'income' or 'expense'. AI can fill if missing.
         date (str, optional): Date in ISO format. Defaults to now if missing.
+        items (list of LineItem, optional): Line items from a receipt: name, amount (line total) and
+            quantity, stored for item-level analytics.
+        receipt_image (str, optional): Image hash of the uploaded receipt, if any.
     Returns:
-        dict: The created transaction as a dictionary.
+        dict: The created transaction as a dictionary, or an error if the receipt image is unknown.
     """
+    # Same check as the REST endpoints: never link a hash that was not uploaded
+    if receipt_image and not receipt_store.image_path(receipt_image):
+        return {"error": f"Unknown receipt image: {receipt_image}"}
     db_gen = get_db()
     db = next(db_gen)
     try:
@@ -41,9 +53,13 @@ def add_transaction(
             amount=amount,
             category=category,
             date=date,
-            type=TransactionType(type)
+            type=TransactionType(type),
+            receipt_image=receipt_image
         )
         db.add(transaction)
+        db.flush()
+        if items:
+            insert_line_items(db, transaction_id, date, items)
         db.commit()
         db.refresh(transaction)
         return {
@@ -64,28 +80,24 @@ def get_db():
     finally:
         db.close()
 
-def get_transactions(user_id: str) -> List[Dict[str, Any]]:
+def get_transactions(user_id: str, limit: Optional[int] = None, category: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Retrieves the 5 most recent transactions for a given user.
+    Retrieves the most recent transactions for a given user.
     Args:
         user_id (str): The ID of the user.
+        limit (int, optional): How many transactions to return (default 5, at most 50).
+        category (str, optional): Only return transactions in this category.
     Returns:
         A list of dictionaries, where each dictionary represents a transaction.
     """
+    limit = min(max(limit or 5, 1), 50)
+    if limit == 5 and not category:
+        return snapshot_cache.get(user_id)["recent_transactions"]
+
     db_gen = get_db()
     db = next(db_gen)
     try:
-        transactions = db.query(TransactionDB).order_by(TransactionDB.date.desc()).limit(5).all()
-        return [
-            {
-                "description": t.description,
-                "amount": t.amount,
-                "category": t.category,
-                "date": t.date,
-                "type": t.type.value,
-            }
-            for t in transactions
-        ]
+        return analytics.recent_transactions(db, limit, category)
     finally:
         next(db_gen, None)
 
@@ -97,43 +109,69 @@ def get_budgets(user_id: str) -> List[Dict[str, Any]]:
     Returns:
         A list of dictionaries, where each dictionary represents a budget.
     """
+    return snapshot_cache.get(user_id)["budgets"]
+
+def get_goals(user_id: str) -> List[Dict[str, Any]]:
+    """
+    Retrieves the current financial goals for a given user.
+    Args:
+        user_id (str): The ID of the user.
+    Returns:
+        A list of dictionaries, where each dictionary represents a financial goal.
+    """
+    return snapshot_cache.get(user_id)["goals"]
+
+def get_item_spending(user_id: str, item: str, period: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Totals how much the user spent on a specific receipt item (e.g. 'coffee').
+    Args:
+        user_id (str): The ID of the user.
+        item (str): Item name or its first word(s), e.g. 'coffee' or 'oat milk'.
+        period (str, optional): 'month', 'quarter' or 'year'. All time if omitted.
+    Returns:
+        dict: The matched item, total amount, number of line items and the date range used.
+    """
     db_gen = get_db()
     db = next(db_gen)
     try:
-        budgets = db.query(BudgetDB).all()
-        return [
-            {
-                "category": b.category,
-                "limit": b.limit,
-                "spent": b.spent,
-                "period": b.period.value,
-            }
-            for b in budgets
-        ]
+        start_date, end_date = period_bounds(period)
+        return item_spending(db, item, start_date, end_date)
     finally:
         next(db_gen, None)
 
-def get_goals(user_id: str) -> List[Dict[str, Any]]:
+def get_spending_summary(
+    user_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    category: Optional[str] = None,
+    group_by: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Retrieves the current financial goals for a given user.
+    Summarizes the user's money over a date range in one call, computed on the server.
+    Prefer this over get_transactions for any question about totals, trends or where money went.
     Args:
         user_id (str): The ID of the user.
+        start_date (str, optional): First day, YYYY-MM-DD. Defaults to the first of this month.
+        end_date (str, optional): Last day, YYYY-MM-DD. Defaults to today.
+        category (str, optional): Only include this category, e.g. 'Food & Dining'.
+        group_by (str, optional): 'category' (default), 'merchant', 'day', 'week' or 'month'.
     Returns:
-        A list of dictionaries, where each dictionary represents a financial goal.
+        dict: Income, expenses and net for the range, expenses grouped as requested,
+        top merchants, and the change versus the previous period of the same length.
     """
     db_gen = get_db()
     db = next(db_gen)
     try:
-        goals = db.query(GoalDB).all()
-        return [
-            {
-                "title": g.title,
-                "target_amount": g.target_amount,
-                "current_amount": g.current_amount,
-                "deadline": g.deadline,
-                "category": g.category,
-            }
-            for g in goals
-        ]
+        return analytics.spending_summary(db, start_date, end_date, category, group_by or "category")
     finally:
         next(db_gen, None)
+
+def get_budget_utilization(user_id: str) -> List[Dict[str, Any]]:
+    """
+    Shows how much of each budget has been used in its current week or month.
+    Args:
+        user_id (str): The ID of the user.
+    Returns:
+        A list of budgets with limit, spent, remaining and utilization_pct, most used first.
+    """
+    return snapshot_cache.get(user_id)["budget_utilization"]
@@ -0,0 +1,349 @@
+import argparse
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from dotenv import load_dotenv
+from opentelemetry import context as otel_context, trace
+from opentelemetry.propagate import extract
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider, ReadableSpan
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy import event
+
+from metrics import route_of
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Where finished spans go: "none" (tracing off), "file" (JSON lines) or "otlp" (a collector)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(_BACKEND_DIR, "traces.jsonl"))
+# Share of traces kept, decided once at the root; an incoming traceparent header's decision wins
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "pennywise-backend")
+# SQL text on DB spans is cut to this many characters (parameters are never recorded)
+TRACE_STATEMENT_CHARS = 500
+
+tracer = trace.get_tracer("pennywise")
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends one JSON object per finished span to a file; `python tracing.py` reads it back."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = [json.dumps(_span_record(span), default=str) for span in spans]
+        with self._lock:
+            if self._file.closed:
+                return SpanExportResult.FAILURE
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+def _span_record(span: ReadableSpan) -> Dict[str, Any]:
+    return {
+        "trace_id": format(span.context.trace_id, "032x"),
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "name": span.name,
+        "kind": span.kind.name,
+        "start_ns": span.start_time,
+        "end_ns": span.end_time,
+        "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+        "events": [
+            {"name": e.name, "offset_ms": round((e.timestamp - span.start_time) / 1e6, 3), "attributes": dict(e.attributes or {})}
+            for e in span.events
+        ],
+    }
+
+
+def _exporter() -> Optional[SpanExporter]:
+    if TRACE_EXPORTER == "file":
+        return JsonLinesSpanExporter(TRACE_FILE)
+    if TRACE_EXPORTER == "otlp":
+        try:
+            # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("TRACE_EXPORTER=otlp needs opentelemetry-exporter-otlp-proto-http; tracing is off")
+            return None
+        return OTLPSpanExporter()
+    if TRACE_EXPORTER != "none":
+        logger.warning(f"Unknown TRACE_EXPORTER {TRACE_EXPORTER!r}; tracing is off")
+    return None
+
+
+def setup_tracing() -> Optional[TracerProvider]:
+    """
+    Installs the global tracer provider when an exporter is configured.
+    ADK's own spans (invocation, agent_run, call_llm, execute_tool) go
+    through the global provider too, so they nest under ours.
+    """
+    exporter = _exporter()
+    if exporter is None:
+        return None
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": TRACE_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(TRACE_SAMPLE_RATE)),
+    )
+    # Spans are exported from a background thread in batches, off the request path
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing to {TRACE_EXPORTER} at sample rate {TRACE_SAMPLE_RATE}")
+    return provider
+
+# Global instance
+tracer_provider = setup_tracing()
+TRACING_ENABLED = tracer_provider is not None
+
+
+def shutdown_tracing():
+    """Flush spans still queued for export."""
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace id of the sampled span running this code, for log lines."""
+    span_context = trace.get_current_span().get_span_context()
+    return format(span_context.trace_id, "032x") if span_context.is_valid and span_context.trace_flags.sampled else None
+
+
+def current_context() -> otel_context.Context:
+    return otel_context.get_current()
+
+
+def in_context(func: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """
+    Binds func to a copy of the caller's context, for loop.run_in_executor,
+    which (unlike asyncio.to_thread and Starlette's threadpool) does not carry
+    contextvars into the worker thread. Spans opened there, e.g. by the
+    queries a tool runs, then nest under the caller's span.
+    """
+    ctx = contextvars.copy_context()
+    return lambda: ctx.run(func, *args, **kwargs)
+
+
+def _wall_ns(perf: float) -> int:
+    """A time.perf_counter() reading as epoch nanoseconds, which span timestamps use."""
+    return time.time_ns() - int((time.perf_counter() - perf) * 1e9)
+
+
+def record_span(name: str, start: float, end: Optional[float] = None, attributes: Optional[Dict[str, Any]] = None,
+                parent: Optional[otel_context.Context] = None, error: bool = False,
+                events: Optional[Dict[str, Optional[float]]] = None) -> Optional[trace.Span]:
+    """
+    Records a span after the fact from perf_counter() readings, for work
+    that is already timed (model calls, voice turns) so it gets no extra
+    code path. Events are named perf_counter() marks inside the span.
+    """
+    if not TRACING_ENABLED:
+        return None
+    span = tracer.start_span(name, context=parent, attributes=attributes, start_time=_wall_ns(start))
+    for event_name, at in (events or {}).items():
+        if at is not None:
+            span.add_event(event_name, timestamp=_wall_ns(at))
+    if error:
+        span.set_status(Status(StatusCode.ERROR))
+    span.end(end_time=_wall_ns(end if end is not None else time.perf_counter()))
+    return span
+
+
+def trace_engine(engine, name: str):
+    """
+    A span per SQL statement, under whatever span issued it. Statements run
+    outside any sampled span (startup, background flushes) are not traced.
+    """
+    if not TRACING_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if not trace.get_current_span().is_recording():
+            conn.info.setdefault("trace_spans", []).append(None)
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        span = tracer.start_span(f"db {operation}", kind=SpanKind.CLIENT, attributes={
+            "db.system": conn.dialect.name,
+            "db.name": name,
+            "db.operation": operation,
+            "db.statement": statement[:TRACE_STATEMENT_CHARS],
+            "db.executemany": executemany,
+        })
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span = conn.info["trace_spans"].pop()
+        if span is not None:
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set_attribute("db.rowcount", cursor.rowcount)
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+        if spans:
+            span = spans.pop()
+            if span is not None:
+                span.record_exception(context.original_exception)
+                span.set_status(Status(StatusCode.ERROR, str(context.original_exception)[:200]))
+                span.end()
+
+
+def _headers(scope) -> Dict[str, str]:
+    return {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+
+class TracingMiddleware:
+    """
+    Plain ASGI middleware that opens the root span of every HTTP request and
+    WebSocket connection, continuing the caller's trace if it sent a W3C
+    traceparent header. The span is named after the route template once
+    routing ran, and HTTP responses carry its id in an X-Trace-Id header.
+    Everything the request awaits or spawns (asyncio tasks, threadpool
+    calls) inherits the span through contextvars.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        method = scope.get("method", "WS")
+        span = tracer.start_span(f"{method} {scope['path']}", context=extract(_headers(scope)), kind=SpanKind.SERVER,
+                                 attributes={"http.request.method": method, "url.path": scope["path"]})
+        status = [None]
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                span.add_event("response.start")
+                if span.is_recording():
+                    trace_id = format(span.get_span_context().trace_id, "032x")
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", trace_id.encode())]}
+            elif message["type"] == "websocket.accept":
+                span.add_event("websocket.accept")
+            await send(message)
+
+        try:
+            with trace.use_span(span, end_on_exit=False):
+                await self.app(scope, receive, send_traced)
+        except BaseException as e:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, type(e).__name__))
+            raise
+        finally:
+            route = route_of(scope)
+            span.update_name(f"{method} {route}")
+            span.set_attribute("http.route", route)
+            if status[0] is not None:
+                span.set_attribute("http.response.status_code", status[0])
+                if status[0] >= 500:
+                    span.set_status(Status(StatusCode.ERROR))
+            span.end()
+
+
+# --- Reading a trace file back ---
+
+def load_traces(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def critical_path(span: Dict[str, Any], children: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    The chain of spans that set this span's end time: walking back from its
+    end, the child that finished last, then the one that finished last
+    before that child started, and so on, each expanded the same way.
+    Shortening anything off this path does not make the request faster.
+    """
+    path = [span]
+    cursor = span["end_ns"]
+    chain = []
+    for child in sorted(children.get(span["span_id"], []), key=lambda s: s["end_ns"], reverse=True):
+        if child["end_ns"] <= cursor:
+            chain.append(child)
+            cursor = child["start_ns"]
+    for child in reversed(chain):
+        path.extend(critical_path(child, children))
+    return path
+
+
+def _print_tree(span, children, root_start, critical, depth=0):
+    kids = sorted(children.get(span["span_id"], []), key=lambda s: s["start_ns"])
+    # Self time: what this span spent outside its children (overlapping children counted once)
+    covered, edge = 0, span["start_ns"]
+    for kid in kids:
+        start, end = max(kid["start_ns"], edge), min(kid["end_ns"], span["end_ns"])
+        if end > start:
+            covered += end - start
+            edge = end
+    self_ms = (span["end_ns"] - span["start_ns"] - covered) / 1e6
+    marker = "*" if span["span_id"] in critical else " "
+    offset = (span["start_ns"] - root_start) / 1e6
+    print(f"{marker} {offset:9.1f}ms {span['duration_ms']:9.1f}ms  self {self_ms:8.1f}ms  {'  ' * depth}{span['name']}"
+          + (" [ERROR]" if span["status"] == "ERROR" else ""))
+    for kid in kids:
+        _print_tree(kid, children, root_start, critical, depth + 1)
+
+
+def report(path: str, slowest: int = 5, name: Optional[str] = None):
+    """Prints the slowest traces as span trees, critical path marked with *."""
+    roots = []
+    trees = {}
+    for trace_id, spans in load_traces(path).items():
+        ids = {s["span_id"] for s in spans}
+        children: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for s in spans:
+            if s["parent_id"] in ids:
+                children[s["parent_id"]].append(s)
+            elif name is None or name in s["name"]:
+                # Parent missing from the file (remote caller, or not yet flushed): treat as a root
+                roots.append(s)
+        trees[trace_id] = children
+    roots.sort(key=lambda s: s["duration_ms"], reverse=True)
+    for root in roots[:slowest]:
+        children = trees[root["trace_id"]]
+        critical = {s["span_id"] for s in critical_path(root, children)}
+        print(f"trace {root['trace_id']}  {root['name']}  {root['duration_ms']:.1f}ms")
+        print(f"  {'start':>9s}   {'duration':>9s}")
+        _print_tree(root, children, root["start_ns"], critical)
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Slowest traces from a TRACE_EXPORTER=file trace file, with their critical path")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE)
+    parser.add_argument("--slowest", type=int, default=5, help="how many traces to print")
+    parser.add_argument("--name", help="only root spans whose name contains this, e.g. 'POST /api/ai/chat'")
+    args = parser.parse_args()
+    report(args.path, args.slowest, args.name)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Live model streams one worker will hold at once: connected, parked for resume,
+# warm in the pool, or still winding down after their connection ended
+VOICE_MAX_SESSIONS = int(os.getenv("VOICE_MAX_SESSIONS", "50"))
+VOICE_MAX_SESSIONS_PER_USER = int(os.getenv("VOICE_MAX_SESSIONS_PER_USER", "2"))
+# How long a new connection waits for a free slot before it is turned away
+VOICE_ADMISSION_WAIT_SECONDS = float(os.getenv("VOICE_ADMISSION_WAIT_SECONDS", "5"))
+VOICE_ADMISSION_MAX_WAITING = int(os.getenv("VOICE_ADMISSION_MAX_WAITING", "20"))
+
+# WebSocket close code for "at capacity, try again later" (RFC 6455 registry)
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class VoiceAdmission:
+    """
+    Caps concurrent live voice sessions per worker and per user.
+
+    A slot is taken before a live session is claimed and given back when that
+    live session ends; a session parked for resume keeps its slot. Streams
+    held by no connection (warm pool entries, sessions still closing) use up
+    capacity too, through unowned_streams; a connection that will take over
+    its own conversation's warm entry doesn't count that one. When no
+    slot is free, connections wait in arrival order for up to
+    VOICE_ADMISSION_WAIT_SECONDS; a freed slot goes to the first waiter that
+    fits (a user at their own cap doesn't hold up everyone behind them). If
+    the wait times out or too many are already waiting, acquire() returns
+    False and the caller closes with CLOSE_TRY_AGAIN_LATER.
+    """
+
+    def __init__(self, max_sessions: int = VOICE_MAX_SESSIONS,
+                 max_per_user: int = VOICE_MAX_SESSIONS_PER_USER,
+                 wait_seconds: float = VOICE_ADMISSION_WAIT_SECONDS,
+                 max_waiting: int = VOICE_ADMISSION_MAX_WAITING):
+        self.max_sessions = max_sessions
+        self.max_per_user = max_per_user
+        self.wait_seconds = wait_seconds
+        self.max_waiting = max_waiting
+        self._active = 0
+        self._per_user: Dict[str, int] = {}
+        self._waiters: Deque[Tuple[str, bool, asyncio.Future]] = deque()
+        # Open live streams no admitted connection holds; set by voice_pool.py
+        self.unowned_streams: Callable[[], int] = lambda: 0
+        # Closes the oldest idle warm stream (not one of keep_user's); True if there was one.
+        # Set by voice_pool.py, so warm entries never keep a real connection out
+        self.reclaim: Callable[[Optional[str]], bool] = lambda keep_user: False
+        self._stats: Dict[str, float] = {
+            "admitted": 0, "admitted_after_wait": 0, "rejected_timeout": 0,
+            "rejected_queue_full": 0, "warm_reclaimed": 0, "wait_ms_total": 0.0,
+        }
+
+    def _in_use(self, claims_warm: bool = False) -> int:
+        return self._active + max(0, self.unowned_streams() - int(claims_warm))
+
+    def _fits(self, user_id: str, claims_warm: bool = False) -> bool:
+        return self._in_use(claims_warm) < self.max_sessions and self._per_user.get(user_id, 0) < self.max_per_user
+
+    def _take(self, user_id: str):
+        self._active += 1
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+
+    async def acquire(self, user_id: str, claims_warm: bool = False) -> bool:
+        """
+        Take a slot for one live session of this user; False if none freed up
+        in time. claims_warm: the caller will take over a warm pool entry, so
+        admitting it opens no new stream.
+        """
+        # Waiters that would fit are woken as soon as a slot frees, so anyone
+        # still waiting is blocked and taking a free slot here jumps no one
+        if self._fits(user_id, claims_warm):
+            self._take(user_id)
+            self._stats["admitted"] += 1
+            return True
+        if self._in_use(claims_warm) >= self.max_sessions and self.reclaim(user_id if claims_warm else None):
+            # Its stream ending wakes the waiters, this one included
+            self._stats["warm_reclaimed"] += 1
+        if len(self._waiters) >= self.max_waiting:
+            self._stats["rejected_queue_full"] += 1
+            logger.warning(f"Voice admission queue full; rejecting {user_id}")
+            return False
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (user_id, claims_warm, waiter)
+        self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.wait_seconds)
+        except asyncio.TimeoutError:
+            self._stats["rejected_timeout"] += 1
+            logger.warning(f"No voice slot for {user_id} within {self.wait_seconds:.0f}s")
+            return False
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+        self._stats["admitted"] += 1
+        self._stats["admitted_after_wait"] += 1
+        self._stats["wait_ms_total"] += (time.perf_counter() - started) * 1000
+        return True
+
+    def release(self, user_id: str):
+        self._active = max(0, self._active - 1)
+        remaining = self._per_user.get(user_id, 0) - 1
+        if remaining > 0:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+        self.wake()
+
+    def wake(self):
+        """Hand freed capacity to waiters; also called when a stream outside any slot ends."""
+        for entry in list(self._waiters):
+            user_id, claims_warm, waiter = entry
+            if waiter.done():
+                self._waiters.remove(entry)
+            elif self._fits(user_id, claims_warm):
+                self._waiters.remove(entry)
+                self._take(user_id)
+                waiter.set_result(True)
+
+    @property
+    def accepting(self) -> bool:
+        return self._in_use() < self.max_sessions
+
+    def stats(self) -> Dict[str, Any]:
+        waited = self._stats["admitted_after_wait"]
+        in_use = self._in_use()
+        return {
+            "active": self._active,
+            "unowned_streams": in_use - self._active,
+            "in_use": in_use,
+            "max_sessions": self.max_sessions,
+            "max_per_user": self.max_per_user,
+            "waiting": len(self._waiters),
+            "utilization": round(in_use / self.max_sessions, 3) if self.max_sessions else 1.0,
+            "accepting": self.accepting,
+            **{k: v for k, v in self._stats.items() if k != "wait_ms_total"},
+            "avg_wait_ms": round(self._stats["wait_ms_total"] / waited, 1) if waited else 0.0,
+        }
+
+# Global instance
+voice_admission = VoiceAdmission()
@@ -0,0 +1,200 @@
+from typing import Optional
+import numpy as np
+
+# Transport codecs a voice client may negotiate. Sizes are per 16-bit input sample.
+CODEC_PCM16 = "pcm16"   # 2 bytes
+CODEC_MULAW = "mulaw"   # 1 byte, G.711 µ-law
+CODEC_ADPCM = "adpcm"   # 4 bits, IMA-ADPCM in self-contained blocks
+CODECS = (CODEC_PCM16, CODEC_MULAW, CODEC_ADPCM)
+
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+# --- µ-law (vectorized G.711) ---
+
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 8159  # on the 14-bit scale the encoder works in
+
+
+def mulaw_encode(pcm: np.ndarray) -> bytes:
+    v = pcm.astype(np.int32) >> 2
+    mask = np.where(v < 0, 0x7F, 0xFF)
+    v = np.minimum(np.abs(v), _MULAW_CLIP) + (_MULAW_BIAS >> 2)
+    segment = np.floor(np.log2(v)).astype(np.int32) - 5
+    code = np.where(segment >= 8, 0x7F, (segment << 4) | ((v >> (segment + 1)) & 0x0F))
+    return (code ^ mask).astype(np.uint8).tobytes()
+
+
+def mulaw_decode(data: bytes) -> np.ndarray:
+    u = ~np.frombuffer(data, dtype=np.uint8).astype(np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    magnitude = (((u & 0x0F) << 3) + _MULAW_BIAS) << exponent
+    return np.where(u & 0x80, _MULAW_BIAS - magnitude, magnitude - _MULAW_BIAS).astype(np.int16)
+
+
+# --- IMA-ADPCM ---
+# Each block is: predictor int16 LE, step index u8, flags u8, then one nibble per
+# sample, low nibble first. Blocks carry their own state so any frame decodes alone.
+# Flag bit 0 marks an odd sample count, whose last byte's high nibble is padding.
+# The predictor recursion is inherently sequential, so this is a plain loop over samples.
+
+_STEPS = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767,
+]
+_INDEX_ADJUST = [-1, -1, -1, -1, 2, 4, 6, 8]
+ADPCM_HEADER_BYTES = 4
+ADPCM_FLAG_ODD = 0x01
+
+
+class AdpcmEncoder:
+    def __init__(self):
+        self.predictor = 0
+        self.index = 0
+
+    def encode(self, pcm: np.ndarray) -> bytes:
+        flags = ADPCM_FLAG_ODD if len(pcm) % 2 else 0
+        header = int(self.predictor).to_bytes(2, "little", signed=True) + bytes([self.index, flags])
+        predictor, index = self.predictor, self.index
+        nibbles = bytearray(len(pcm))
+        for i, sample in enumerate(pcm.tolist()):
+            step = _STEPS[index]
+            diff = sample - predictor
+            nibble = 8 if diff < 0 else 0
+            diff = abs(diff)
+            delta = step >> 3
+            if diff >= step:
+                nibble |= 4
+                diff -= step
+                delta += step
+            if diff >= step >> 1:
+                nibble |= 2
+                diff -= step >> 1
+                delta += step >> 1
+            if diff >= step >> 2:
+                nibble |= 1
+                delta += step >> 2
+            predictor = max(-32768, min(32767, predictor - delta if nibble & 8 else predictor + delta))
+            index = max(0, min(88, index + _INDEX_ADJUST[nibble & 7]))
+            nibbles[i] = nibble
+        self.predictor, self.index = predictor, index
+
+        packed = np.frombuffer(bytes(nibbles) + b"\x00" * (len(nibbles) % 2), dtype=np.uint8)
+        return header + (packed[0::2] | (packed[1::2] << 4)).astype(np.uint8).tobytes()
+
+
+def adpcm_decode(block: bytes) -> np.ndarray:
+    if len(block) < ADPCM_HEADER_BYTES:
+        raise ValueError("ADPCM block shorter than its header")
+    predictor = int.from_bytes(block[:2], "little", signed=True)
+    index = min(block[2], 88)
+    packed = np.frombuffer(block[ADPCM_HEADER_BYTES:], dtype=np.uint8)
+    nibbles = np.empty(len(packed) * 2, dtype=np.uint8)
+    nibbles[0::2] = packed & 0x0F
+    nibbles[1::2] = packed >> 4
+    if block[3] & ADPCM_FLAG_ODD and len(nibbles):
+        nibbles = nibbles[:-1]
+
+    out = np.empty(len(nibbles), dtype=np.int16)
+    for i, nibble in enumerate(nibbles.tolist()):
+        step = _STEPS[index]
+        delta = step >> 3
+        if nibble & 4:
+            delta += step
+        if nibble & 2:
+            delta += step >> 1
+        if nibble & 1:
+            delta += step >> 2
+        predictor = max(-32768, min(32767, predictor - delta if nibble & 8 else predictor + delta))
+        index = max(0, min(88, index + _INDEX_ADJUST[nibble & 7]))
+        out[i] = predictor
+    return out
+
+
+# --- Resampling ---
+
+class Resampler:
+    """
+    Streaming resampler for int16 mono: a windowed-sinc low-pass when
+    downsampling, then linear interpolation with NumPy. Keeps filter history
+    and the fractional read position between chunks, so consecutive chunks
+    join without clicks.
+    """
+
+    TAPS = 31
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.step = src_rate / dst_rate
+        self._position = 0.0
+        self._previous = 0.0
+        self._taps: Optional[np.ndarray] = None
+        if dst_rate < src_rate:
+            cutoff = 0.5 * dst_rate / src_rate * 0.9
+            n = np.arange(self.TAPS) - (self.TAPS - 1) / 2
+            taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hanning(self.TAPS)
+            self._taps = (taps / taps.sum()).astype(np.float32)
+            self._history = np.zeros(self.TAPS - 1, dtype=np.float32)
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        if self.src_rate == self.dst_rate or not len(pcm):
+            return pcm
+        x = pcm.astype(np.float32)
+        if self._taps is not None:
+            padded = np.concatenate([self._history, x])
+            self._history = padded[-(self.TAPS - 1):]
+            x = np.convolve(padded, self._taps, mode="valid")
+
+        # Index 0 of `joined` is the last sample of the previous chunk (time -1)
+        joined = np.concatenate([[self._previous], x])
+        positions = np.arange(self._position, len(x) - 1 + 1e-9, self.step)
+        out = np.interp(positions + 1, np.arange(len(joined)), joined)
+        self._previous = float(x[-1])
+        self._position = (positions[-1] + self.step - len(x)) if len(positions) else self._position - len(x)
+        return np.clip(np.round(out), -32768, 32767).astype(np.int16)
+
+
+class AudioTranscoder:
+    """
+    One direction of a connection's audio: PCM16 at the model's rate on one
+    side, the client's codec and sample rate on the other. Stateful (ADPCM
+    predictor, resampler phase), so chunks must be fed in order.
+    """
+
+    def __init__(self, codec: str, client_rate: int, model_rate: int):
+        self.codec = codec
+        self.client_rate = client_rate
+        self.model_rate = model_rate
+        self._to_client = Resampler(model_rate, client_rate)
+        self._to_model = Resampler(client_rate, model_rate)
+        self._adpcm = AdpcmEncoder()
+
+    @property
+    def passthrough(self) -> bool:
+        return self.codec == CODEC_PCM16 and self.client_rate == self.model_rate
+
+    def encode(self, pcm: bytes) -> bytes:
+        """Model PCM16 -> client codec/rate."""
+        samples = self._to_client.process(np.frombuffer(pcm, dtype=np.int16))
+        if self.codec == CODEC_MULAW:
+            return mulaw_encode(samples)
+        if self.codec == CODEC_ADPCM:
+            return self._adpcm.encode(samples)
+        return samples.tobytes()
+
+    def decode(self, data: bytes) -> bytes:
+        """Client codec/rate -> model PCM16."""
+        if self.codec == CODEC_MULAW:
+            samples = mulaw_decode(data)
+        elif self.codec == CODEC_ADPCM:
+            samples = adpcm_decode(data)
+        else:
+            if len(data) % 2:
+                raise ValueError("PCM payload is not whole 16-bit samples")
+            samples = np.frombuffer(data, dtype=np.int16)
+        return self._to_model.process(samples).tobytes()
@@ -0,0 +1,238 @@
+import bisect
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from tracing import record_span
+
+# Histogram bucket upper bounds, in ms; the last bucket is everything slower
+BUCKETS_MS = [10, 25, 50, 75, 100, 150, 200, 300, 400, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000]
+
+# Per-turn intervals, all in ms. "Speech end" is when the user stopped talking: the
+# VAD's activity end minus its trailing silence, a typed message, or failing both
+# the last audio chunk sent to the model before it answered.
+METRICS = {
+    "speech_end_to_activity_end": "speech end -> VAD activity end (its hangover)",
+    "speech_end_to_first_event": "speech end -> first model event",
+    "speech_end_to_first_audio_sent": "speech end -> first audio byte written to the socket",
+    "first_audio_to_sent": "first model audio part -> written to the socket (our bridge)",
+    "tool_call": "one tool call -> its response",
+    "speech_end_to_turn_complete": "speech end -> turn_complete",
+}
+RECENT_TURNS = 50
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: O(log buckets) to record, percentiles estimated from bucket bounds."""
+
+    def __init__(self, bounds: List[float] = BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value_ms: float):
+        self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return float(self.bounds[i]) if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 1) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 1),
+            "buckets": {
+                **{f"le_{b}": n for b, n in zip(self.bounds, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+_histograms: Dict[str, Histogram] = {name: Histogram() for name in METRICS}
+_recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_TURNS)
+_counts: Dict[str, int] = {"turns": 0, "interrupted": 0, "unanchored": 0}
+
+
+def _ms(start: Optional[float], end: Optional[float]) -> Optional[float]:
+    return (end - start) * 1000 if start is not None and end is not None else None
+
+
+class TurnTimer:
+    """
+    Timestamps for the current voice turn of one live session.
+
+    The bridge calls the mark methods as things happen; each is a
+    perf_counter() read and an assignment, so they are safe on the audio hot
+    path. Intervals are worked out and added to the shared histograms once
+    per turn: at turn_complete, or when the turn's first audio frame is
+    written if that comes later.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        # Trace context of the WebSocket connection the turns belong to; set when it claims the session
+        self.trace_parent = None
+        self._reset()
+
+    def _reset(self):
+        self.last_chunk: Optional[float] = None
+        self.speech_end: Optional[float] = None
+        self.activity_end: Optional[float] = None
+        self.user_text: Optional[float] = None
+        self.first_event: Optional[float] = None
+        self.first_audio: Optional[float] = None
+        self.first_audio_sent: Optional[float] = None
+        self.completed: Optional[float] = None
+        self.tool_calls: Dict[str, Dict[str, Any]] = {}
+
+    # --- client side ---
+
+    def audio_chunk(self):
+        # Audio that keeps streaming while the model answers isn't part of this turn's question
+        if self.first_event is None:
+            self.last_chunk = time.perf_counter()
+
+    def vad_end(self, trailing_silence_ms: float):
+        """The VAD closed a speech segment after this much silence."""
+        self.activity_end = time.perf_counter()
+        self.speech_end = self.activity_end - trailing_silence_ms / 1000
+
+    def text(self):
+        self.user_text = time.perf_counter()
+
+    # --- model side ---
+
+    def model_event(self, event):
+        now = time.perf_counter()
+        if self.completed is not None:
+            # Previous turn never got an audio frame out (purged or dropped)
+            self._finish()
+        if self.first_event is None:
+            self.first_event = now
+        content = getattr(event, "content", None)
+        for part in (getattr(content, "parts", None) or []):
+            call = getattr(part, "function_call", None)
+            if call:
+                self.tool_calls[call.id or call.name] = {"name": call.name, "start": now, "end": None}
+            response = getattr(part, "function_response", None)
+            if response:
+                entry = self.tool_calls.get(response.id or response.name)
+                if entry:
+                    entry["end"] = now
+            inline = getattr(part, "inline_data", None)
+            if inline is not None and self.first_audio is None:
+                self.first_audio = now
+
+    def audio_sent(self):
+        # Frames still draining from an earlier turn don't count
+        if self.first_audio_sent is None and self.first_audio is not None:
+            self.first_audio_sent = time.perf_counter()
+            if self.completed is not None:
+                self._finish()
+
+    def interrupted(self):
+        _counts["interrupted"] += 1
+        self._reset()
+
+    def turn_complete(self):
+        self.completed = time.perf_counter()
+        # Audio is written by the sender task; wait for its first frame
+        if self.first_audio is None or self.first_audio_sent is not None:
+            self._finish()
+
+    def _finish(self):
+        ends = [t for t in (self.speech_end, self.user_text) if t is not None]
+        anchor = max(ends) if ends else self.last_chunk
+        intervals = {"first_audio_to_sent": _ms(self.first_audio, self.first_audio_sent)}
+        if anchor is not None:
+            intervals.update({
+                "speech_end_to_activity_end": _ms(self.speech_end, self.activity_end),
+                "speech_end_to_first_event": _ms(anchor, self.first_event),
+                "speech_end_to_first_audio_sent": _ms(anchor, self.first_audio_sent),
+                "speech_end_to_turn_complete": _ms(anchor, self.completed),
+            })
+        else:
+            # Model spoke without a user turn (e.g. a greeting): nothing to measure from
+            _counts["unanchored"] += 1
+
+        recorded = {}
+        for name, value in intervals.items():
+            if value is not None and value >= 0:
+                _histograms[name].record(value)
+                recorded[name] = round(value, 1)
+        tools = []
+        for entry in self.tool_calls.values():
+            duration = _ms(entry["start"], entry["end"])
+            if duration is not None:
+                _histograms["tool_call"].record(duration)
+            tools.append({
+                "name": entry["name"],
+                "start_ms": _offset(anchor, entry["start"]),
+                "end_ms": _offset(anchor, entry["end"]),
+            })
+
+        self._trace(anchor)
+        _counts["turns"] += 1
+        _recent.append({
+            "session_id": self.session_id,
+            "intervals": recorded,
+            # Every stage of the turn, in ms from speech end
+            "timeline": {
+                "last_chunk": _offset(anchor, self.last_chunk),
+                "activity_end": _offset(anchor, self.activity_end),
+                "first_event": _offset(anchor, self.first_event),
+                "first_audio": _offset(anchor, self.first_audio),
+                "first_audio_sent": _offset(anchor, self.first_audio_sent),
+                "turn_complete": _offset(anchor, self.completed),
+            },
+            "tools": tools,
+        })
+        self._reset()
+
+    def _trace(self, anchor: Optional[float]):
+        start = anchor if anchor is not None else self.first_event
+        ends = [t for t in (self.completed, self.first_audio_sent) if t is not None]
+        if start is None or not ends:
+            return
+        events = {
+            "last_chunk": self.last_chunk,
+            "activity_end": self.activity_end,
+            "first_event": self.first_event,
+            "first_audio": self.first_audio,
+            "first_audio_sent": self.first_audio_sent,
+            "turn_complete": self.completed,
+        }
+        for entry in self.tool_calls.values():
+            events[f"tool_call {entry['name']}"] = entry["start"]
+            events[f"tool_response {entry['name']}"] = entry["end"]
+        record_span("voice turn", start, max(ends), attributes={"voice.session_id": self.session_id},
+                    parent=self.trace_parent, events=events)
+
+
+def _offset(anchor: Optional[float], t: Optional[float]) -> Optional[float]:
+    value = _ms(anchor, t)
+    return round(value, 1) if value is not None else None
+
+
+def latency_stats() -> Dict[str, Any]:
+    return {
+        **_counts,
+        "metrics": {name: {"description": METRICS[name], **hist.summary()} for name, hist in _histograms.items()},
+        "recent_turns": list(_recent),
+    }
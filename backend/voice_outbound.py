@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from voice_protocol import VoiceProtocol, OUTPUT_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Model audio arrives in parts of very uneven size; coalesce into frames of this length
+VOICE_OUT_FRAME_MS = int(os.getenv("VOICE_OUT_FRAME_MS", "60"))
+# Audio a slow client may fall behind by before the oldest queued audio is dropped
+VOICE_OUT_MAX_BUFFER_MS = int(os.getenv("VOICE_OUT_MAX_BUFFER_MS", "2000"))
+# How long a connection whose model stream ended waits for queued output to reach the client
+DRAIN_TIMEOUT_SECONDS = 2.0
+
+# Totals across all connections, for /api/ai/voice/stats
+_totals: Dict[str, float] = {
+    "connections": 0, "frames_sent": 0, "parts_in": 0, "audio_ms_sent": 0.0,
+    "audio_ms_dropped": 0.0, "audio_ms_purged": 0.0, "purges": 0, "max_queue_ms": 0.0,
+}
+
+
+def _ms(num_bytes: int, sample_rate: int) -> float:
+    return num_bytes / 2 / sample_rate * 1000  # 16-bit mono
+
+
+class OutboundAudioQueue:
+    """
+    Per-connection queue between the live model and the voice WebSocket.
+
+    Small PCM parts are coalesced into VOICE_OUT_FRAME_MS frames; a partial
+    frame is flushed if nothing else arrives within one frame time, before a
+    control message, and on a sample-rate change. A single sender task writes
+    to the socket, so a slow client only grows this queue; past
+    VOICE_OUT_MAX_BUFFER_MS the oldest audio is dropped (control messages
+    never are). purge() discards all queued audio at once for barge-in.
+    """
+
+    def __init__(self, protocol: VoiceProtocol, frame_ms: int = VOICE_OUT_FRAME_MS,
+                 max_buffer_ms: int = VOICE_OUT_MAX_BUFFER_MS):
+        self.protocol = protocol
+        self.frame_ms = frame_ms
+        self.max_buffer_ms = max_buffer_ms
+        # ("audio", (pcm, rate)) or ("control", message)
+        self._queue: Deque[Tuple[str, Any]] = deque()
+        self._queued_ms = 0.0
+        self._pending = bytearray()
+        self._pending_rate = OUTPUT_SAMPLE_RATE
+        self._ready = asyncio.Event()
+        self._sending = False
+        # Called after each audio frame is written (see voice_latency.py)
+        self.on_audio_sent: Optional[Callable[[], None]] = None
+        self.stats: Dict[str, float] = {
+            "frames_sent": 0, "parts_in": 0, "audio_ms_sent": 0.0, "audio_ms_dropped": 0.0,
+            "audio_ms_purged": 0.0, "purges": 0, "max_queue_ms": 0.0,
+        }
+        _totals["connections"] += 1
+
+    @property
+    def queued_ms(self) -> float:
+        return self._queued_ms + _ms(len(self._pending), self._pending_rate)
+
+    def attach(self, protocol: VoiceProtocol):
+        """Send to a new connection from now on (voice session resumed after a drop)."""
+        self.protocol = protocol
+
+    def _frame_bytes(self, sample_rate: int) -> int:
+        return sample_rate * 2 * self.frame_ms // 1000
+
+    def _enqueue_audio(self, pcm: bytes, sample_rate: int):
+        self._queue.append(("audio", (pcm, sample_rate)))
+        self._queued_ms += _ms(len(pcm), sample_rate)
+        # Drop the oldest audio (not control messages) until we are back under the bound
+        while self._queued_ms > self.max_buffer_ms:
+            for i, (kind, item) in enumerate(self._queue):
+                if kind == "audio":
+                    del self._queue[i]
+                    dropped = _ms(len(item[0]), item[1])
+                    self._queued_ms -= dropped
+                    self._count("audio_ms_dropped", dropped)
+                    break
+        if self._queued_ms > self.stats["max_queue_ms"]:
+            self.stats["max_queue_ms"] = self._queued_ms
+            _totals["max_queue_ms"] = max(_totals["max_queue_ms"], self._queued_ms)
+        self._ready.set()
+
+    def _flush_pending(self):
+        if self._pending:
+            self._enqueue_audio(bytes(self._pending), self._pending_rate)
+            self._pending.clear()
+
+    def push_audio(self, pcm: bytes, sample_rate: int = OUTPUT_SAMPLE_RATE):
+        self._count("parts_in", 1)
+        if sample_rate != self._pending_rate:
+            self._flush_pending()
+            self._pending_rate = sample_rate
+        self._pending.extend(pcm)
+        frame_bytes = self._frame_bytes(sample_rate)
+        while len(self._pending) >= frame_bytes:
+            self._enqueue_audio(bytes(self._pending[:frame_bytes]), sample_rate)
+            del self._pending[:frame_bytes]
+
+    def push_control(self, message: Dict[str, Any]):
+        # Audio before this message must reach the client before it
+        self._flush_pending()
+        self._queue.append(("control", message))
+        self._ready.set()
+
+    def purge(self):
+        """Discard every queued and partial audio frame immediately (barge-in)."""
+        purged = self._queued_ms + _ms(len(self._pending), self._pending_rate)
+        self._pending.clear()
+        self._queue = deque(entry for entry in self._queue if entry[0] == "control")
+        self._queued_ms = 0.0
+        self._count("purges", 1)
+        self._count("audio_ms_purged", purged)
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT_SECONDS) -> bool:
+        """Wait until everything queued, partial frame included, is written; False on timeout."""
+        self._flush_pending()
+        self._ready.set()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self._queue or self._sending:
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    def _count(self, key: str, value: float):
+        self.stats[key] += value
+        _totals[key] += value
+
+    async def run(self):
+        """Sender loop; run as a task for the lifetime of the connection."""
+        while True:
+            if not self._queue:
+                try:
+                    await asyncio.wait_for(self._ready.wait(), timeout=self.frame_ms / 1000)
+                except asyncio.TimeoutError:
+                    # Nothing new for a frame time: don't hold back the tail of an utterance
+                    self._flush_pending()
+                self._ready.clear()
+                continue
+
+            kind, item = self._queue.popleft()
+            self._sending = True
+            try:
+                if kind == "control":
+                    await self.protocol.send_control(item)
+                    continue
+                pcm, sample_rate = item
+                duration = _ms(len(pcm), sample_rate)
+                self._queued_ms -= duration
+                await self.protocol.send_audio(pcm, sample_rate)
+            finally:
+                self._sending = False
+            if self.on_audio_sent:
+                self.on_audio_sent()
+            self._count("frames_sent", 1)
+            self._count("audio_ms_sent", duration)
+
+
+def outbound_stats() -> Dict[str, float]:
+    return {k: round(v, 1) for k, v in _totals.items()}
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+from google.adk.agents import LiveRequestQueue
+from google.adk.agents.run_config import RunConfig
+from google.genai import types
+
+from adk_services import runner
+from session_registry import session_registry, SessionIdentity
+from voice_vad import GEMINI_SILENCE_DURATION_MS
+from voice_latency import TurnTimer
+from voice_standin import standin_run_live, VOICE_MODEL_STANDIN
+from voice_admission import voice_admission
+
+logger = logging.getLogger(__name__)
+
+VOICE_WARM_POOL_SIZE = int(os.getenv("VOICE_WARM_POOL_SIZE", "4"))
+# Each warm entry holds an open model connection; close it if nobody claims it in time
+VOICE_WARM_IDLE_SECONDS = float(os.getenv("VOICE_WARM_IDLE_SECONDS", "120"))
+# How long a claim waits for a cold live session to finish connecting before it is used anyway
+LIVE_READY_TIMEOUT_SECONDS = 10.0
+
+_END = object()
+
+# Live sessions whose model stream is still open, owned or not
+_open_streams: Set["LiveSession"] = set()
+
+
+def live_run_config() -> RunConfig:
+    """RunConfig for voice: AUDIO responses with Gemini's automatic activity detection."""
+    return RunConfig(
+        response_modalities=["AUDIO"],
+        realtime_input_config={
+            "automatic_activity_detection": {
+                "disabled": False,  # Enable automatic VAD
+                # Optimized settings for better responsiveness
+                "start_of_speech_sensitivity": types.StartSensitivity.START_SENSITIVITY_HIGH,
+                "end_of_speech_sensitivity": types.EndSensitivity.END_SENSITIVITY_HIGH,
+                "prefix_padding_ms": 200,  # Capture beginning of speech
+                "silence_duration_ms": GEMINI_SILENCE_DURATION_MS,  # Faster response time
+            }
+        }
+    )
+
+
+class _TrackedRequestQueue(LiveRequestQueue):
+    """ADK's live flow first reads this queue once the model connection is up and history is sent."""
+
+    def __init__(self):
+        super().__init__()
+        self.ready = asyncio.Event()
+
+    async def get(self):
+        self.ready.set()
+        return await super().get()
+
+
+class LiveSession:
+    """
+    One runner.run_live stream, pumped by a background task into a buffer
+    so it can connect before anyone is listening.
+    """
+
+    def __init__(self, identity: SessionIdentity):
+        self.identity = identity
+        self.queue = _TrackedRequestQueue()
+        self.created = time.monotonic()
+        # Per-turn latency marks; lives here so they survive a resumed connection
+        self.turns = TurnTimer(identity.session_id)
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._pump: Optional[asyncio.Task] = None
+        # Held by a connection (or parked for one), which has an admission slot for it
+        self.owned = False
+
+    def start(self, session):
+        run_live = standin_run_live if VOICE_MODEL_STANDIN else runner.run_live
+        live_events = run_live(session=session, live_request_queue=self.queue, run_config=live_run_config())
+        self._pump = asyncio.create_task(self._run(live_events))
+        _open_streams.add(self)
+        self._pump.add_done_callback(self._stream_ended)
+
+    def _stream_ended(self, task: asyncio.Task):
+        _open_streams.discard(self)
+        if not self.owned:
+            # A warm or closing stream just gave its capacity back
+            voice_admission.wake()
+
+    async def _run(self, live_events):
+        try:
+            async for event in live_events:
+                await self._events.put(event)
+        except Exception as e:
+            logger.error(f"Live session for {self.identity.session_id} ended with error: {e}")
+        finally:
+            await self._events.put(_END)
+
+    @property
+    def alive(self) -> bool:
+        return self._pump is not None and not self._pump.done()
+
+    async def wait_ready(self, timeout: float = LIVE_READY_TIMEOUT_SECONDS) -> bool:
+        try:
+            await asyncio.wait_for(self.queue.ready.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def events(self) -> AsyncIterator[Any]:
+        while True:
+            event = await self._events.get()
+            if event is _END:
+                return
+            yield event
+
+    def close(self, wind_down_seconds: float = 5.0):
+        # Until its stream has wound down it still counts against capacity, unowned
+        self.owned = False
+        try:
+            self.queue.close()
+        except Exception as e:
+            logger.warning(f"Error closing live_request_queue: {e}")
+        if self._pump and not self._pump.done():
+            # ADK winds the stream down after close(); cancel if it hasn't within a few seconds
+            asyncio.get_running_loop().call_later(wind_down_seconds, self._pump.cancel)
+
+
+class WarmLivePool:
+    """
+    Pre-established live sessions, keyed by user and conversation so the
+    agent keeps that conversation's history and tools act for that user.
+    A conversation is warmed when its voice connection ends (the usual
+    reconnect/next-turn case) or when a client asks ahead of opening the
+    socket. Claims take a warm entry when one exists and otherwise start
+    cold; both paths record time-to-ready. Entries older than
+    VOICE_WARM_IDLE_SECONDS are closed; at most VOICE_WARM_POOL_SIZE are kept.
+    """
+
+    def __init__(self, max_size: int = VOICE_WARM_POOL_SIZE, idle_seconds: float = VOICE_WARM_IDLE_SECONDS):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._entries: Dict[Tuple[str, str], LiveSession] = {}
+        self._warming: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._ready_ms: Dict[str, Deque[float]] = {"warm": deque(maxlen=500), "cold": deque(maxlen=500)}
+        self._stats = {"claims_warm": 0, "claims_cold": 0, "warmed": 0, "expired": 0, "warm_failures": 0, "reclaimed": 0}
+
+    def warm(self, identity: SessionIdentity):
+        """Start warming a live session for this conversation in the background."""
+        key = (identity.user_id, identity.conversation_id)
+        if self.max_size <= 0 or key in self._entries or key in self._warming:
+            return
+        if not voice_admission.accepting:
+            return  # A warm stream would take capacity admitted connections need
+        if len(self._entries) + len(self._warming) >= self.max_size:
+            if not self._entries:
+                return  # Full of sessions still connecting
+            self._evict_oldest()
+        self._warming[key] = asyncio.create_task(self._warm(key, identity))
+
+    async def _warm(self, key, identity: SessionIdentity):
+        try:
+            session = await session_registry.get_or_create(identity)
+            live = LiveSession(identity)
+            live.start(session)
+            if not await live.wait_ready() or not live.alive:
+                live.close()
+                self._stats["warm_failures"] += 1
+                return
+            self._entries[key] = live
+            self._stats["warmed"] += 1
+            logger.info(f"Warm live session ready for {identity.session_id}")
+        except Exception as e:
+            self._stats["warm_failures"] += 1
+            logger.warning(f"Warming live session for {identity.session_id} failed: {e}")
+        finally:
+            self._warming.pop(key, None)
+
+    def reclaim(self, keep_user: Optional[str] = None) -> bool:
+        """Close the oldest warm entry not belonging to keep_user right away, to free its capacity."""
+        candidates = [key for key in self._entries if key[0] != keep_user]
+        if not candidates:
+            return False
+        key = min(candidates, key=lambda k: self._entries[k].created)
+        # Nobody is listening to a warm stream, so there is nothing to wind down
+        self._entries.pop(key).close(wind_down_seconds=0)
+        self._stats["reclaimed"] += 1
+        logger.info(f"Reclaimed warm live session of {key[0]}/{key[1]} for a new connection")
+        return True
+
+    def _evict_oldest(self):
+        if self._entries:
+            key = min(self._entries, key=lambda k: self._entries[k].created)
+            self._entries.pop(key).close()
+
+    def has_warm(self, identity: SessionIdentity) -> bool:
+        """Whether a claim for this conversation would take over a stream already open."""
+        key = (identity.user_id, identity.conversation_id)
+        live = self._entries.get(key)
+        return key in self._warming or (live is not None and live.alive)
+
+    async def claim(self, identity: SessionIdentity, session) -> Tuple[LiveSession, bool]:
+        """A ready live session for this conversation: (session, was_warm)."""
+        started = time.perf_counter()
+        key = (identity.user_id, identity.conversation_id)
+        if key in self._warming:
+            # Already connecting for this conversation; finishing that beats starting over
+            await asyncio.shield(self._warming[key])
+        live = self._entries.pop(key, None)
+        warm = live is not None and live.alive
+        if not warm:
+            if live:
+                live.close()
+            live = LiveSession(identity)
+            live.start(session)
+        live.owned = True
+        await live.wait_ready()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        kind = "warm" if warm else "cold"
+        self._ready_ms[kind].append(elapsed_ms)
+        self._stats[f"claims_{kind}"] += 1
+        logger.info(f"Live session for {identity.session_id} ready in {elapsed_ms:.0f}ms ({kind})")
+        return live, warm
+
+    async def run_reaper(self, interval: float = 10.0):
+        """Close warm entries nobody claimed within the idle timeout."""
+        while True:
+            await asyncio.sleep(interval)
+            cutoff = time.monotonic() - self.idle_seconds
+            for key, live in list(self._entries.items()):
+                if live.created < cutoff or not live.alive:
+                    self._entries.pop(key).close()
+                    self._stats["expired"] += 1
+
+    def close_all(self):
+        for live in self._entries.values():
+            live.close()
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        def summary(values: Deque[float]) -> Dict[str, float]:
+            ordered = sorted(values)
+            if not ordered:
+                return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0}
+            return {
+                "count": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2], 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+            }
+
+        return {
+            **self._stats,
+            "size": len(self._entries),
+            "warming": len(self._warming),
+            "max_size": self.max_size,
+            "ready_latency": {kind: summary(values) for kind, values in self._ready_ms.items()},
+        }
+
+# Global instance
+warm_pool = WarmLivePool()
+
+
+def unowned_streams() -> int:
+    """Open model streams no connection holds: warm entries, ones still connecting, ones winding down."""
+    return sum(1 for live in _open_streams if not live.owned)
+
+# Warm and closing streams are real Gemini Live connections; admission counts them
+voice_admission.unowned_streams = unowned_streams
+voice_admission.reclaim = warm_pool.reclaim
@@ -0,0 +1,160 @@
+import asyncio
+import base64
+import json
+import re
+import struct
+from typing import Any, Dict, Optional, Tuple
+from fastapi import WebSocket
+
+from metrics import registry
+from voice_codec import (
+    AudioTranscoder, CODECS, CODEC_PCM16, CODEC_MULAW, CODEC_ADPCM, MIN_SAMPLE_RATE, MAX_SAMPLE_RATE,
+)
+
+# Binary audio frames: an 8-byte header followed by the encoded audio.
+#   version  u8   PROTOCOL_VERSION
+#   kind     u8   FRAME_PCM16 (16-bit LE PCM), FRAME_MULAW or FRAME_ADPCM
+#   rate     u16  sample rate in Hz
+#   seq      u32  per-direction frame counter (wraps)
+# All integers are big-endian. Control messages (interrupt, turn_complete,
+# text, errors) stay JSON text frames in both protocols.
+PROTOCOL_VERSION = 1
+FRAME_PCM16 = 1
+FRAME_MULAW = 2
+FRAME_ADPCM = 3
+HEADER = struct.Struct("!BBHI")
+
+PROTOCOL_BINARY = "binary"
+PROTOCOL_JSON = "json"
+
+# What the model takes and produces
+INPUT_SAMPLE_RATE = 16000
+OUTPUT_SAMPLE_RATE = 24000
+
+FRAME_KINDS = {CODEC_PCM16: FRAME_PCM16, CODEC_MULAW: FRAME_MULAW, CODEC_ADPCM: FRAME_ADPCM}
+MIME_TYPES = {CODEC_PCM16: "audio/pcm", CODEC_MULAW: "audio/pcmu", CODEC_ADPCM: "audio/x-ima-adpcm"}
+
+_RATE = re.compile(r"rate=(\d+)")
+
+# Wire bytes of audio frames, in both protocols (JSON frames count their base64 text)
+_audio_bytes = registry.counter("voice_audio_bytes_total", "Voice audio bytes on the WebSocket", ("direction", "codec"))
+
+
+def sample_rate_of(mime_type: Optional[str], default: int = OUTPUT_SAMPLE_RATE) -> int:
+    """'audio/pcm;rate=24000' -> 24000"""
+    found = _RATE.search(mime_type or "")
+    return int(found.group(1)) if found else default
+
+
+def encode_audio_frame(audio: bytes, sample_rate: int, seq: int, kind: int = FRAME_PCM16) -> bytes:
+    return HEADER.pack(PROTOCOL_VERSION, kind, sample_rate, seq & 0xFFFFFFFF) + audio
+
+
+def decode_audio_frame(frame: bytes) -> Tuple[int, int, int, bytes]:
+    """Return (kind, sample_rate, seq, audio); raises ValueError for anything that isn't a v1 audio frame."""
+    if len(frame) < HEADER.size:
+        raise ValueError(f"frame shorter than the {HEADER.size}-byte header")
+    version, kind, sample_rate, seq = HEADER.unpack_from(frame)
+    if version != PROTOCOL_VERSION or kind not in FRAME_KINDS.values():
+        raise ValueError(f"unsupported frame version={version} kind={kind}")
+    return kind, sample_rate, seq, frame[HEADER.size:]
+
+
+class VoiceProtocol:
+    """
+    Per-connection wire format for the voice WebSocket.
+
+    Clients ask for binary audio with ?protocol=binary, and may ask for a
+    transport codec (?codec=pcm16|mulaw|adpcm) and their native sample rate
+    (?rate=8000..48000). The server confirms what it will use in its first
+    message; unsupported values fall back to the defaults, and clients that
+    ask for nothing keep the original JSON + base64 16 kHz in / 24 kHz out.
+    Transcoding and resampling run in a worker thread, in order, so the
+    event loop only shuttles bytes.
+    """
+
+    def __init__(self, websocket: WebSocket, requested: Optional[str],
+                 codec: Optional[str] = None, rate: Optional[int] = None):
+        self.websocket = websocket
+        self.binary = requested == PROTOCOL_BINARY
+        self.codec = codec if codec in CODECS else CODEC_PCM16
+        client_rate = rate if rate and MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE else None
+        self.input_rate = client_rate or INPUT_SAMPLE_RATE
+        self.output_rate = client_rate or OUTPUT_SAMPLE_RATE
+        self._inbound = AudioTranscoder(self.codec, self.input_rate, INPUT_SAMPLE_RATE)
+        self._outbound = AudioTranscoder(self.codec, self.output_rate, OUTPUT_SAMPLE_RATE)
+        self._sent = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def name(self) -> str:
+        return PROTOCOL_BINARY if self.binary else PROTOCOL_JSON
+
+    async def send_hello(self, extra: Optional[Dict[str, Any]] = None):
+        await self.send_control({
+            "type": "protocol",
+            "protocol": self.name,
+            "version": PROTOCOL_VERSION,
+            "header_bytes": HEADER.size if self.binary else 0,
+            "codec": self.codec,
+            "input_sample_rate": self.input_rate,
+            "output_sample_rate": self.output_rate,
+            **(extra or {}),
+        })
+
+    async def send_control(self, message: Dict[str, Any]):
+        await self.websocket.send_text(json.dumps(message))
+
+    async def send_audio(self, pcm: bytes, sample_rate: int = OUTPUT_SAMPLE_RATE):
+        """Send model PCM16 to the client in its negotiated codec and rate."""
+        if sample_rate != self._outbound.model_rate:
+            self._outbound = AudioTranscoder(self.codec, self.output_rate, sample_rate)
+        if self._outbound.passthrough:
+            audio = pcm
+        else:
+            audio = await asyncio.to_thread(self._outbound.encode, pcm)
+
+        if self.binary:
+            frame = encode_audio_frame(audio, self.output_rate, self._sent, FRAME_KINDS[self.codec])
+            await self.websocket.send_bytes(frame)
+        else:
+            message = {"mime_type": MIME_TYPES[self.codec], "data": base64.b64encode(audio).decode("ascii")}
+            if self.codec != CODEC_PCM16 or self.output_rate != OUTPUT_SAMPLE_RATE:
+                message["rate"] = self.output_rate
+            frame = json.dumps(message)
+            await self.websocket.send_text(frame)
+        self._sent += 1
+        self.bytes_out += len(frame)
+        _audio_bytes.inc(len(frame), "out", self.codec)
+
+    def parse_incoming(self, message: Dict[str, Any]) -> Tuple[Optional[bytes], Optional[Dict[str, Any]]]:
+        """
+        Split one ASGI websocket.receive message into (audio, control). Audio is
+        still in the client's codec; pass it to to_model_pcm(). Raises ValueError
+        for malformed frames.
+        """
+        if message.get("bytes") is not None:
+            self.bytes_in += len(message["bytes"])
+            kind, _, _, audio = decode_audio_frame(message["bytes"])
+            if kind != FRAME_KINDS[self.codec]:
+                raise ValueError(f"frame kind {kind} does not match negotiated codec {self.codec}")
+            _audio_bytes.inc(len(message["bytes"]), "in", self.codec)
+            return audio, None
+        text = message.get("text")
+        if text is None:
+            return None, None
+        self.bytes_in += len(text)
+        control = json.loads(text)
+        if control.get("mime_type") == MIME_TYPES[self.codec] and control.get("data"):
+            _audio_bytes.inc(len(text), "in", self.codec)
+            return base64.b64decode(control["data"]), None
+        return None, control
+
+    async def to_model_pcm(self, audio: bytes) -> bytes:
+        """Client codec/rate -> 16 kHz PCM16 for the model."""
+        if self._inbound.passthrough:
+            if len(audio) % 2:
+                raise ValueError("PCM payload is not whole 16-bit samples")
+            return audio
+        return await asyncio.to_thread(self._inbound.decode, audio)
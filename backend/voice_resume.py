@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import secrets
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from session_registry import SessionIdentity
+from voice_admission import voice_admission
+from voice_outbound import OutboundAudioQueue
+from voice_pool import LiveSession, warm_pool
+
+logger = logging.getLogger(__name__)
+
+# How long a dropped voice connection's live session is kept for the client to come back
+VOICE_RESUME_GRACE_SECONDS = float(os.getenv("VOICE_RESUME_GRACE_SECONDS", "30"))
+# Agent audio buffered for replay while the client is away; older audio is dropped first
+VOICE_RESUME_REPLAY_MS = int(os.getenv("VOICE_RESUME_REPLAY_MS", "15000"))
+
+
+@dataclass
+class ParkedVoiceSession:
+    token: str
+    identity: SessionIdentity
+    live: LiveSession
+    outbound: OutboundAudioQueue
+    # Still running while parked: keeps moving agent output into `outbound`
+    agent_task: asyncio.Task
+    # The queue's own bound, restored on resume
+    max_buffer_ms: int = 0
+    parked_at: float = field(default_factory=time.monotonic)
+    expiry: Optional[asyncio.TimerHandle] = None
+
+
+class VoiceResumeStore:
+    """
+    Live sessions of voice connections that dropped without a normal close.
+
+    Every connection gets a resume token in its first message. When the socket
+    goes away abnormally, the live session, its outbound queue and the task
+    feeding that queue are parked here instead of being torn down. The agent
+    keeps talking into the queue (bounded by VOICE_RESUME_REPLAY_MS), and a
+    client reconnecting with ?resume_token= within VOICE_RESUME_GRACE_SECONDS
+    takes it all back: the queued output is replayed and no new live session is
+    negotiated. A parked session keeps its admission slot. Unclaimed sessions
+    are closed and handed to the warm pool path.
+    """
+
+    def __init__(self, grace_seconds: float = VOICE_RESUME_GRACE_SECONDS,
+                 replay_ms: int = VOICE_RESUME_REPLAY_MS):
+        self.grace_seconds = grace_seconds
+        self.replay_ms = replay_ms
+        self._parked: Dict[str, ParkedVoiceSession] = {}
+        self._stats: Dict[str, float] = {"parked": 0, "resumed": 0, "expired": 0, "rejected": 0, "replayed_ms": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.grace_seconds > 0
+
+    def new_token(self) -> str:
+        return secrets.token_urlsafe(18)
+
+    def park(self, token: str, identity: SessionIdentity, live: LiveSession,
+             outbound: OutboundAudioQueue, agent_task: asyncio.Task):
+        parked = ParkedVoiceSession(token, identity, live, outbound, agent_task, outbound.max_buffer_ms)
+        # Hold more than a live client would, so the whole gap can be replayed
+        outbound.max_buffer_ms = max(outbound.max_buffer_ms, self.replay_ms)
+        parked.expiry = asyncio.get_running_loop().call_later(self.grace_seconds, self._expire, token)
+        # The model stream ending leaves nothing to resume
+        agent_task.add_done_callback(lambda _: self._expire(token))
+        self._parked[token] = parked
+        self._stats["parked"] += 1
+        logger.info(f"Parked live session for {identity.session_id} for {self.grace_seconds:.0f}s")
+
+    def resume(self, token: str, user_id: str) -> Optional[ParkedVoiceSession]:
+        """Take back a parked session; None if the token is unknown, expired or someone else's."""
+        parked = self._parked.get(token)
+        if parked is None or parked.identity.user_id != user_id:
+            self._stats["rejected"] += 1
+            return None
+        del self._parked[token]
+        if parked.expiry:
+            parked.expiry.cancel()
+        parked.outbound.max_buffer_ms = parked.max_buffer_ms
+        self._stats["resumed"] += 1
+        self._stats["replayed_ms"] += parked.outbound.queued_ms
+        logger.info(
+            f"Resumed live session for {parked.identity.session_id} after "
+            f"{time.monotonic() - parked.parked_at:.1f}s with {parked.outbound.queued_ms:.0f}ms to replay"
+        )
+        return parked
+
+    def _expire(self, token: str):
+        parked = self._parked.pop(token, None)
+        if parked is None:
+            return
+        if parked.expiry:
+            parked.expiry.cancel()
+        parked.agent_task.cancel()
+        parked.live.close()
+        voice_admission.release(parked.identity.user_id)
+        self._stats["expired"] += 1
+        logger.info(f"Resume window for {parked.identity.session_id} closed")
+        # Same as a normal disconnect: have a live session ready if they come back later
+        warm_pool.warm(parked.identity)
+
+    def close_all(self):
+        for token in list(self._parked):
+            parked = self._parked.pop(token)
+            if parked.expiry:
+                parked.expiry.cancel()
+            parked.agent_task.cancel()
+            parked.live.close()
+            voice_admission.release(parked.identity.user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            **{k: round(v, 1) for k, v in self._stats.items()},
+            "grace_seconds": self.grace_seconds,
+            "parked_now": {
+                parked.identity.session_id: round(now - parked.parked_at, 1)
+                for parked in self._parked.values()
+            },
+        }
+
+# Global instance
+resume_store = VoiceResumeStore()
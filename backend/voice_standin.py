@@ -0,0 +1,100 @@
+import asyncio
+import os
+from typing import AsyncIterator, Optional
+import numpy as np
+from google.adk.events import Event
+from google.genai import types
+
+from voice_protocol import OUTPUT_SAMPLE_RATE
+from voice_vad import GEMINI_SILENCE_DURATION_MS, VAD_MIN_ENERGY
+
+# Set VOICE_MODEL_STANDIN=1 to answer voice sessions locally instead of calling Gemini
+# Live, e.g. to size voice workers with load_test_voice.py without model quota or cost.
+VOICE_MODEL_STANDIN = os.getenv("VOICE_MODEL_STANDIN", "0") == "1"
+# Time to "connect" and send history before the first request is read
+STANDIN_CONNECT_MS = int(os.getenv("VOICE_STANDIN_CONNECT_MS", "300"))
+# Time from end of speech to the first audio part of the reply
+STANDIN_THINK_MS = int(os.getenv("VOICE_STANDIN_THINK_MS", "400"))
+# Length of each spoken reply, delivered as 40 ms parts at real-time pace
+STANDIN_REPLY_MS = int(os.getenv("VOICE_STANDIN_REPLY_MS", "2000"))
+STANDIN_PART_MS = 40
+
+AUTHOR = "voice_standin"
+
+
+def _reply_part(index: int) -> bytes:
+    """40 ms of a soft 220 Hz tone at 24 kHz, phase-continuous across parts."""
+    samples = OUTPUT_SAMPLE_RATE * STANDIN_PART_MS // 1000
+    t = (np.arange(samples) + index * samples) / OUTPUT_SAMPLE_RATE
+    return (3000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+
+
+def _audio_event(index: int) -> Event:
+    blob = types.Blob(mime_type=f"audio/pcm;rate={OUTPUT_SAMPLE_RATE}", data=_reply_part(index))
+    return Event(author=AUTHOR, content=types.Content(role="model", parts=[types.Part(inline_data=blob)]))
+
+
+def _is_speech(data: bytes) -> bool:
+    samples = np.frombuffer(data[: len(data) - len(data) % 2], dtype=np.int16).astype(np.float32)
+    return bool(samples.size) and float(np.sqrt(np.mean(samples * samples))) > VAD_MIN_ENERGY
+
+
+async def standin_run_live(session, live_request_queue, run_config=None) -> AsyncIterator[Event]:
+    """
+    Same shape as runner.run_live, with Gemini Live replaced by a fixed
+    script: after GEMINI_SILENCE_DURATION_MS without speech (or on a text
+    message) it thinks for STANDIN_THINK_MS, then streams STANDIN_REPLY_MS
+    of tone and a turn_complete. Speech during a reply interrupts it, like
+    barge-in does on the real model.
+    """
+    await asyncio.sleep(STANDIN_CONNECT_MS / 1000)
+    loop = asyncio.get_running_loop()
+    heard_speech = False
+    last_speech = 0.0
+    reply_at: Optional[float] = None   # when the pending reply starts
+    next_part: Optional[int] = None    # index of the next part of the reply being spoken
+    next_part_at = 0.0
+    parts_per_reply = max(STANDIN_REPLY_MS // STANDIN_PART_MS, 1)
+
+    while True:
+        now = loop.time()
+        if next_part is not None:
+            timeout = max(next_part_at - now, 0)
+        elif reply_at is not None:
+            timeout = max(reply_at - now, 0)
+        elif heard_speech:
+            timeout = max(last_speech + GEMINI_SILENCE_DURATION_MS / 1000 - now, 0)
+        else:
+            timeout = None
+
+        try:
+            request = await asyncio.wait_for(live_request_queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            request = None
+
+        if request is None:
+            if next_part is not None:
+                yield _audio_event(next_part)
+                next_part += 1
+                next_part_at += STANDIN_PART_MS / 1000
+                if next_part >= parts_per_reply:
+                    next_part = None
+                    yield Event(author=AUTHOR, turn_complete=True)
+            elif reply_at is not None:
+                reply_at, next_part, next_part_at = None, 0, loop.time()
+            elif heard_speech:
+                heard_speech = False
+                reply_at = loop.time() + STANDIN_THINK_MS / 1000
+            continue
+
+        if request.close:
+            return
+        if request.content is not None:
+            reply_at = loop.time() + STANDIN_THINK_MS / 1000
+            continue
+        if request.blob is not None and _is_speech(request.blob.data):
+            if next_part is not None or reply_at is not None:
+                next_part = reply_at = None
+                yield Event(author=AUTHOR, interrupted=True)
+            heard_speech = True
+            last_speech = loop.time()
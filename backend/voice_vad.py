@@ -0,0 +1,145 @@
+import itertools
+import os
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import numpy as np
+
+# Gemini's own end-of-speech detection waits for this much silence (see the RunConfig in ai.py)
+GEMINI_SILENCE_DURATION_MS = 600
+
+VAD_ENABLED = os.getenv("VOICE_VAD", "1") != "0"
+VAD_FRAME_MS = 20
+# Audio kept from before speech onset so the first syllable isn't clipped
+VAD_PREROLL_MS = int(os.getenv("VOICE_VAD_PREROLL_MS", "200"))
+# Audio forwarded after the last speech frame; must outlast GEMINI_SILENCE_DURATION_MS so
+# the model still sees the pause that ends a turn
+VAD_HANGOVER_MS = int(os.getenv("VOICE_VAD_HANGOVER_MS", str(GEMINI_SILENCE_DURATION_MS + 200)))
+# RMS (int16 scale) below which a frame is never speech, whatever the noise floor
+VAD_MIN_ENERGY = float(os.getenv("VOICE_VAD_MIN_ENERGY", "300"))
+# Speech must be this many times louder than the tracked noise floor
+VAD_NOISE_FACTOR = 3.0
+# Noisy, high zero-crossing frames count as speech only when clearly loud
+VAD_MAX_ZCR = 0.35
+
+# Open connections' detectors, keyed "<session id>#<connection number>": a conversation
+# may have two sockets open, and each keeps its own entry
+active_detectors: Dict[str, "VoiceActivityDetector"] = {}
+_connection_numbers = itertools.count(1)
+_closed_totals: Dict[str, float] = {"ms_forwarded": 0.0, "ms_suppressed": 0.0, "segments": 0}
+
+Event = Tuple[str, Optional[bytes]]
+
+
+class VoiceActivityDetector:
+    """
+    Energy + zero-crossing-rate VAD over 16-bit mono PCM, computed for all
+    20 ms frames of a chunk at once with NumPy.
+
+    process() turns incoming audio into ("start", None), ("audio", pcm) and
+    ("end", None) events: silence is swallowed, a pre-roll of recent
+    audio is released when speech begins, and audio keeps flowing for a
+    hangover period after the last speech frame. The noise floor adapts
+    on non-speech frames.
+    """
+
+    def __init__(self, sample_rate: int = 16000, session_id: Optional[str] = None):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * VAD_FRAME_MS // 1000
+        self.preroll: Deque[bytes] = deque(maxlen=max(VAD_PREROLL_MS // VAD_FRAME_MS, 1))
+        self.hangover_frames = max(VAD_HANGOVER_MS // VAD_FRAME_MS, 1)
+        self.noise_floor = VAD_MIN_ENERGY / VAD_NOISE_FACTOR
+        self.in_speech = False
+        self._silent_frames = 0
+        self._leftover = np.zeros(0, dtype=np.int16)
+        self.stats: Dict[str, float] = {"ms_processed": 0.0, "ms_forwarded": 0.0, "ms_suppressed": 0.0, "segments": 0}
+        # Listed in vad_stats() until close() when created for a session
+        self.key = f"{session_id}#{next(_connection_numbers)}" if session_id else None
+        if self.key:
+            active_detectors[self.key] = self
+
+    @property
+    def hangover_ms(self) -> int:
+        """Silence between the last speech frame and the "end" event."""
+        return self.hangover_frames * VAD_FRAME_MS
+
+    def _classify(self, frames: np.ndarray) -> np.ndarray:
+        samples = frames.astype(np.float32)
+        energy = np.sqrt(np.mean(samples * samples, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+        threshold = max(VAD_MIN_ENERGY, self.noise_floor * VAD_NOISE_FACTOR)
+        speech = (energy > threshold) & ((zcr < VAD_MAX_ZCR) | (energy > 2 * threshold))
+
+        quiet = energy[~speech]
+        if quiet.size:
+            # Slow EWMA toward the current background level
+            self.noise_floor += 0.05 * (float(np.median(quiet)) - self.noise_floor)
+        return speech
+
+    def process(self, pcm: bytes) -> List[Event]:
+        samples = np.concatenate([self._leftover, np.frombuffer(pcm, dtype=np.int16)])
+        usable = len(samples) - len(samples) % self.frame_samples
+        self._leftover = samples[usable:]
+        if not usable:
+            return []
+        frames = samples[:usable].reshape(-1, self.frame_samples)
+        speech = self._classify(frames)
+
+        events: List[Event] = []
+        forwarded: List[bytes] = []
+        for frame, is_speech in zip(frames, speech):
+            data = frame.tobytes()
+            if self.in_speech:
+                forwarded.append(data)
+                self._silent_frames = 0 if is_speech else self._silent_frames + 1
+                if self._silent_frames >= self.hangover_frames:
+                    self._emit_audio(events, forwarded)
+                    events.append(("end", None))
+                    forwarded = []
+                    self.in_speech = False
+            elif is_speech:
+                events.append(("start", None))
+                forwarded.extend(self.preroll)
+                self.preroll.clear()
+                forwarded.append(data)
+                self.in_speech = True
+                self._silent_frames = 0
+                self.stats["segments"] += 1
+            else:
+                self.preroll.append(data)
+        self._emit_audio(events, forwarded)
+
+        self.stats["ms_processed"] += len(frames) * VAD_FRAME_MS
+        self.stats["ms_suppressed"] = self.stats["ms_processed"] - self.stats["ms_forwarded"]
+        return events
+
+    def _emit_audio(self, events: List[Event], frames: List[bytes]):
+        if frames:
+            data = b"".join(frames)
+            events.append(("audio", data))
+            self.stats["ms_forwarded"] += len(data) / 2 / self.sample_rate * 1000
+
+    def close(self):
+        """Fold this detector's counters into the totals and forget it."""
+        if self.key:
+            active_detectors.pop(self.key, None)
+        for key in _closed_totals:
+            _closed_totals[key] += self.stats[key]
+
+
+def vad_stats() -> Dict[str, object]:
+    """Totals over every connection so far, plus per-connection counters for open ones."""
+    totals = dict(_closed_totals)
+    for detector in active_detectors.values():
+        for key in totals:
+            totals[key] += detector.stats[key]
+    processed = totals["ms_forwarded"] + totals["ms_suppressed"]
+    return {
+        "enabled": VAD_ENABLED,
+        **{k: round(v, 1) for k, v in totals.items()},
+        "suppressed_share": round(totals["ms_suppressed"] / processed, 3) if processed else 0.0,
+        "sessions": {
+            key: {k: round(v, 1) for k, v in detector.stats.items()}
+            for key, detector in active_detectors.items()
+        },
+    }
@@ -20,10 +20,47 @@ interface ReceiptData {
   category: string;
   description: string;
   items: string[];
+  line_items?: { name: string; amount?: number | null; quantity?: number | null }[];
   confidence: string;
 }
 
-const WS_URL = `ws://${window.location.hostname}:8000/api/ai/voice/ws/user_123`;
+// Items with their prices, so the agent can store line-item amounts with the transaction
+const formatLineItems = (receipt: ReceiptData): string => {
+  const lineItems = receipt.line_items ?? receipt.items.map(name => ({ name, amount: null, quantity: null }));
+  return lineItems
+    .map(item =>
+      item.name +
+      (item.quantity != null ? ` x${item.quantity}` : '') +
+      (item.amount != null ? ` $${item.amount.toFixed(2)}` : ''))
+    .join(', ') || 'none';
+};
+
+// protocol=binary: audio travels as raw PCM binary frames; JSON stays for control messages
+const WS_URL = `ws://${window.location.hostname}:8000/api/ai/voice/ws/user_123?protocol=binary`;
+
+// Binary audio frame header (see backend/voice_protocol.py):
+// version u8 | kind u8 | sample rate u16 | seq u32, big-endian, then 16-bit PCM
+const FRAME_HEADER_BYTES = 8;
+const FRAME_VERSION = 1;
+const FRAME_PCM16 = 1;
+
+function encodeAudioFrame(pcm: Int16Array, sampleRate: number, seq: number): ArrayBuffer {
+  const frame = new ArrayBuffer(FRAME_HEADER_BYTES + pcm.byteLength);
+  const view = new DataView(frame);
+  view.setUint8(0, FRAME_VERSION);
+  view.setUint8(1, FRAME_PCM16);
+  view.setUint16(2, sampleRate);
+  view.setUint32(4, seq >>> 0);
+  new Int16Array(frame, FRAME_HEADER_BYTES).set(pcm);
+  return frame;
+}
+
+function decodeAudioFrame(frame: ArrayBuffer): ArrayBuffer | null {
+  if (frame.byteLength < FRAME_HEADER_BYTES) return null;
+  const view = new DataView(frame);
+  if (view.getUint8(0) !== FRAME_VERSION || view.getUint8(1) !== FRAME_PCM16) return null;
+  return frame.slice(FRAME_HEADER_BYTES);
+}
 
 export default function LiveAIVoiceChat({ onBack }: { onBack: () => void }) {
   const [messages, setMessages] = useState<VoiceMessage[]>([]);
@@ -38,11 +75,14 @@ export default function LiveAIVoiceChat({ onBack }: { onBack: () => void }) {
   const audioContextRef = useRef<AudioContext | null>(null);
   const processorRef = useRef<ScriptProcessorNode | null>(null);
   const currentAudioSource = useRef<AudioBufferSourceNode | null>(null);
-  const audioChunkBuffer = useRef<string[]>([]);
+  const audioChunkBuffer = useRef<ArrayBuffer[]>([]);
+  const binaryProtocol = useRef(false);
+  // Issued by the server; lets a reconnect pick up the same live session after a drop
+  const resumeToken = useRef<string | null>(null);
   const isPlayingAudio = useRef(false);
   const reconnectTimeoutRef = useRef<number | null>(null);
 
-  // Helper: encode PCM to base64
+  // Helper: encode PCM to base64 (JSON fallback protocol)
   function arrayBufferToBase64(buffer: ArrayBuffer) {
     let binary = '';
     const bytes = new Uint8Array(buffer);
@@ -88,10 +128,10 @@ Amount: $${receiptData.amount.toFixed(2)}
 Date: ${receiptData.date}
 Category: ${receiptData.category}
 Description: ${receiptData.description}
-Items: ${receiptData.items.join(', ')}
+Items: ${formatLineItems(receiptData)}
 Confidence: ${receiptData.confidence}
 
-Please acknowledge that you've received this receipt information and ask if I'd like you to add it as a transaction to my records.`;
+Please acknowledge that you've received this receipt information and ask if I'd like you to add it as a transaction to my records. If I do, include the items as objects with name, amount and quantity.`;
 
       const message = {
         mime_type: "text/plain",
@@ -125,8 +165,7 @@ Please acknowledge that you've received this receipt information and ask if I'd
       while (audioChunkBuffer.current.length > 0) {
         const chunks = audioChunkBuffer.current.splice(0, 3); // Process smaller chunks for responsiveness
         let totalLength = 0;
-        const pcmArrays = chunks.map(base64 => {
-          const buffer = base64ToArrayBuffer(base64);
+        const pcmArrays = chunks.map(buffer => {
           const pcm = new Int16Array(buffer);
           totalLength += pcm.length;
           return pcm;
@@ -202,13 +241,15 @@ Please acknowledge that you've received this receipt information and ask if I'd
           pcm[i] = s < 0 ? s * 32768 : s * 32767;
         }
         
-        const base64 = arrayBufferToBase64(pcm.buffer);
-        
-        // Send audio more frequently but log less frequently
-        ws.current.send(JSON.stringify({ 
-          mime_type: 'audio/pcm', 
-          data: base64 
-        }));
+        // Binary frames once the server confirmed the protocol, else the JSON fallback
+        if (binaryProtocol.current) {
+          ws.current.send(encodeAudioFrame(pcm, 16000, frameCount));
+        } else {
+          ws.current.send(JSON.stringify({ 
+            mime_type: 'audio/pcm', 
+            data: arrayBufferToBase64(pcm.buffer) 
+          }));
+        }
         
         // Log every 100 frames (~2 seconds) to avoid spam
         frameCount++;
@@ -277,29 +318,49 @@ Please acknowledge that you've received this receipt information and ask if I'd
     
     console.log('Connecting to WebSocket...');
     setConnectionStatus('connecting');
-    ws.current = new WebSocket(WS_URL);
+    binaryProtocol.current = false;
+    const url = resumeToken.current
+      ? `${WS_URL}&resume_token=${encodeURIComponent(resumeToken.current)}`
+      : WS_URL;
+    ws.current = new WebSocket(url);
+    ws.current.binaryType = 'arraybuffer';
     
     ws.current.onopen = () => {
       console.log('WebSocket connected');
       setConnectionStatus('connected');
-      setMessages([]);
       startContinuousRecording();
     };
     
+    const handleAudioChunk = (pcm: ArrayBuffer) => {
+      audioChunkBuffer.current.push(pcm);
+      playBufferedAudio();
+      setMessages(prev => [...prev, { 
+        id: Date.now().toString(), 
+        isUser: false, 
+        isAudio: true 
+      }]);
+    };
+
     ws.current.onmessage = (event) => {
       try {
+        if (event.data instanceof ArrayBuffer) {
+          const pcm = decodeAudioFrame(event.data);
+          if (pcm) handleAudioChunk(pcm);
+          return;
+        }
+
         const msg = JSON.parse(event.data);
-        console.log('Received message:', msg);
         
-        if (msg.mime_type === 'audio/pcm' && msg.data) {
-          audioChunkBuffer.current.push(msg.data);
-          playBufferedAudio();
-          setMessages(prev => [...prev, { 
-            id: Date.now().toString(), 
-            isUser: false, 
-            isAudio: true, 
-            audioData: msg.data 
-          }]);
+        if (msg.type === 'protocol') {
+          binaryProtocol.current = msg.protocol === 'binary';
+          resumeToken.current = msg.resume_token ?? null;
+          console.log('Voice protocol:', msg.protocol, msg.resumed ? '(resumed)' : '');
+          // A resumed session replays what the agent said meanwhile; keep the conversation on screen
+          if (!msg.resumed) {
+            setMessages([]);
+          }
+        } else if (msg.mime_type === 'audio/pcm' && msg.data) {
+          handleAudioChunk(base64ToArrayBuffer(msg.data));
         } else if (msg.mime_type === 'text/plain' && msg.data) {
           setTranscript(msg.data);
           setMessages(prev => [...prev, { 
@@ -335,15 +396,18 @@ Please acknowledge that you've received this receipt information and ask if I'd
       setConnectionStatus('disconnected');
       stopRecording();
       
-      // Auto-reconnect after 3 seconds unless it was a manual close
+      // Auto-reconnect after 3 seconds unless it was a manual close; the server keeps
+      // the live session for a while so the reconnect resumes it
       if (event.code !== 1000) {
         if (reconnectTimeoutRef.current) {
           clearTimeout(reconnectTimeoutRef.current);
         }
+        // 1013: the server is at voice capacity, so back off for longer
+        const delay = event.code === 1013 ? 10000 : 3000;
         reconnectTimeoutRef.current = window.setTimeout(() => {
           console.log('Attempting to reconnect...');
           connectWebSocket();
-        }, 3000);
+        }, delay);
       }
     };
   };
@@ -356,8 +420,10 @@ Please acknowledge that you've received this receipt information and ask if I'd
         clearTimeout(reconnectTimeoutRef.current);
       }
       stopRecording();
+      resumeToken.current = null;
       if (ws.current) {
-        ws.current.close();
+        // Normal closure: the server ends the live session instead of holding it for a resume
+        ws.current.close(1000);
       }
     };
   }, []);
@@ -20,6 +20,7 @@ interface ReceiptData {
   category: string;
   description: string;
   items: string[];
+  line_items?: { name: string; amount?: number | null; quantity?: number | null }[];
   confidence: string;
 }
 
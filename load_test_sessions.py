@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Load test for per-user, per-conversation sessions.
+
+Simulates N concurrent users. Each one starts its own conversation, checks
+its status, and (with --voice) opens the voice WebSocket on that
+conversation and sends text turns. Reports latency percentiles, errors and
+the server's session registry/cache stats.
+
+    python load_test_sessions.py --users 50 --turns 3
+    python load_test_sessions.py --users 10 --voice
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+import websockets
+
+BASE_URL = "http://localhost:8000"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_user(client, index, args, timings, errors):
+    headers = {"X-User-Id": f"load_user_{index}"}
+    try:
+        started = time.perf_counter()
+        response = await client.post("/api/ai/session/init", params={"new_conversation": "true"}, headers=headers)
+        response.raise_for_status()
+        timings["init"].append((time.perf_counter() - started) * 1000)
+        conversation_id = response.json()["conversation_id"]
+
+        for _ in range(args.turns):
+            started = time.perf_counter()
+            response = await client.get("/api/ai/session/status", params={"conversation_id": conversation_id}, headers=headers)
+            response.raise_for_status()
+            if response.json()["status"] != "exists":
+                raise RuntimeError(f"session for user {index} not found")
+            timings["status"].append((time.perf_counter() - started) * 1000)
+
+        if args.voice:
+            ws_url = f"{args.url.replace('http', 'ws', 1)}/api/ai/voice/ws/load_user_{index}?conversation_id={conversation_id}"
+            async with websockets.connect(ws_url) as websocket:
+                # The server opens with a protocol hello; it is not a model reply
+                await asyncio.wait_for(websocket.recv(), timeout=args.timeout)
+                for turn in range(args.turns):
+                    started = time.perf_counter()
+                    await websocket.send(json.dumps({"mime_type": "text/plain", "data": f"Turn {turn}: what's my balance?"}))
+                    await asyncio.wait_for(websocket.recv(), timeout=args.timeout)
+                    timings["voice_first_response"].append((time.perf_counter() - started) * 1000)
+    except Exception as e:
+        errors.append(f"user {index}: {e}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--users", type=int, default=20, help="concurrent users")
+    parser.add_argument("--turns", type=int, default=3, help="requests per user")
+    parser.add_argument("--voice", action="store_true", help="also open a voice WebSocket per user (uses the live model)")
+    parser.add_argument("--timeout", type=float, default=20.0)
+    args = parser.parse_args()
+
+    timings = {"init": [], "status": [], "voice_first_response": []}
+    errors = []
+    limits = httpx.Limits(max_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(run_user(client, i, args, timings, errors) for i in range(args.users)))
+        elapsed = time.perf_counter() - started
+        stats = (await client.get("/api/ai/sessions/stats")).json()
+
+    print(f"{args.users} users x {args.turns} turns in {elapsed:.2f}s, {len(errors)} errors")
+    for name, values in timings.items():
+        if values:
+            print(f"  {name:22s} n={len(values):4d}  p50={statistics.median(values):7.1f}ms  "
+                  f"p95={percentile(values, 95):7.1f}ms  max={max(values):7.1f}ms")
+    for error in errors[:10]:
+        print(f"  ! {error}")
+    print("Server session stats:")
+    print(json.dumps({k: stats.get(k) for k in ("registry", "cache")}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Load test for the live voice WebSocket.
+
+Opens N concurrent /api/ai/voice/ws sessions (binary protocol). Each one
+streams 16 kHz PCM at real-time pace in turns: an utterance, then silence
+while the reply plays. Some replies are cut short with an interrupt
+(barge-in). Reports:
+- end-to-end turn latency: last speech chunk sent -> first reply audio frame received;
+- frames missing from the server's sequence numbers;
+- audio the server dropped for slow clients;
+- the server's CPU and memory per session, taken from /api/ai/voice/stats
+  over the window when all sessions are connected.
+
+Without Gemini quota, start the backend with the local stand-in model:
+
+    VOICE_MODEL_STANDIN=1 VOICE_MAX_SESSIONS=500 python main.py
+    python load_test_voice.py --sessions 200 --duration 60
+    python load_test_voice.py --sessions 20 --wav sample_16k.wav --interrupt-rate 0.3
+
+--wav takes 16 kHz mono 16-bit audio; otherwise a synthetic voice-like
+signal is used.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import struct
+import time
+import wave
+
+import httpx
+import numpy as np
+import websockets
+
+BASE_URL = "http://localhost:8000"
+SAMPLE_RATE = 16000
+# Binary frame header, see backend/voice_protocol.py
+HEADER = struct.Struct("!BBHI")
+PROTOCOL_VERSION = 1
+FRAME_PCM16 = 1
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def synthetic_speech(seconds, seed):
+    """A voiced, syllable-rate modulated signal loud enough for the server's VAD."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 110 + 60 * rng.random()
+    voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 5))
+    envelope = 0.55 + 0.45 * np.sin(2 * np.pi * 4 * t + rng.random() * 6)
+    signal = 5000 * voice * envelope + 300 * rng.standard_normal(len(t))
+    return np.clip(signal, -32768, 32767).astype(np.int16).tobytes()
+
+
+def load_wav(path):
+    with wave.open(path, "rb") as wav:
+        if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise SystemExit(f"{path}: need 16 kHz mono 16-bit PCM")
+        return wav.readframes(wav.getnframes())
+
+
+class SessionStats:
+    def __init__(self):
+        self.latencies = []
+        self.frames = 0
+        self.missing_frames = 0
+        self.turns_completed = 0
+        self.interrupts_sent = 0
+        self.interrupted = 0
+        self.last_seq = None
+        # Set when the last chunk of an utterance goes out; cleared by the first reply frame
+        self.speech_end = None
+        self.interrupt_at = None
+
+
+async def receive(websocket, stats, args):
+    async for message in websocket:
+        now = time.perf_counter()
+        if isinstance(message, bytes):
+            if len(message) < HEADER.size:
+                continue
+            _, _, _, seq = HEADER.unpack_from(message)
+            if stats.last_seq is not None and seq > stats.last_seq + 1:
+                stats.missing_frames += seq - stats.last_seq - 1
+            stats.last_seq = seq
+            stats.frames += 1
+            if stats.speech_end is not None:
+                stats.latencies.append((now - stats.speech_end) * 1000)
+                stats.speech_end = None
+                if random.random() < args.interrupt_rate:
+                    stats.interrupt_at = now + random.uniform(0.2, 1.0)
+            continue
+        control = json.loads(message)
+        if control.get("turn_complete"):
+            stats.turns_completed += 1
+        elif control.get("interrupted"):
+            stats.interrupted += 1
+
+
+async def stream_turns(websocket, stats, utterances, args, deadline):
+    chunk_bytes = SAMPLE_RATE * 2 * args.chunk_ms // 1000
+    silence = bytes(chunk_bytes)
+    seq = 0
+    next_send = time.perf_counter()
+
+    async def send(pcm):
+        nonlocal seq, next_send
+        # Real-time pace on an absolute schedule, so slow sends don't drift the stream
+        next_send += args.chunk_ms / 1000
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        await websocket.send(HEADER.pack(PROTOCOL_VERSION, FRAME_PCM16, SAMPLE_RATE, seq & 0xFFFFFFFF) + pcm)
+        seq += 1
+
+    turn = 0
+    while time.perf_counter() < deadline:
+        utterance = utterances[turn % len(utterances)]
+        turn += 1
+        for offset in range(0, len(utterance) - chunk_bytes + 1, chunk_bytes):
+            await send(utterance[offset:offset + chunk_bytes])
+        stats.speech_end = time.perf_counter()
+
+        pause_until = time.perf_counter() + args.pause
+        while time.perf_counter() < min(pause_until, deadline):
+            if stats.interrupt_at and time.perf_counter() >= stats.interrupt_at:
+                # Barge in: tell the server, then start talking over the reply
+                stats.interrupt_at = None
+                stats.interrupts_sent += 1
+                await websocket.send(json.dumps({"type": "interrupt"}))
+                break
+            await send(silence)
+        stats.speech_end = None
+
+
+async def run_session(index, args, utterances, deadline, results):
+    ws_url = (f"{args.url.replace('http', 'ws', 1)}/api/ai/voice/ws/voice_load_{index}"
+              f"?conversation_id=load&protocol=binary")
+    stats = SessionStats()
+    try:
+        started = time.perf_counter()
+        async with websockets.connect(ws_url, max_size=None, open_timeout=args.timeout) as websocket:
+            hello = json.loads(await asyncio.wait_for(websocket.recv(), timeout=args.timeout))
+            if hello.get("type") != "protocol":
+                results["rejected"] += 1
+                return
+            results["connect_ms"].append((time.perf_counter() - started) * 1000)
+            results["connected"] += 1
+            receiver = asyncio.create_task(receive(websocket, stats, args))
+            try:
+                await stream_turns(websocket, stats, utterances, args, deadline)
+            finally:
+                receiver.cancel()
+                await websocket.close()
+    except websockets.ConnectionClosed as e:
+        if e.rcvd and e.rcvd.code == CLOSE_TRY_AGAIN_LATER:
+            results["rejected"] += 1
+        else:
+            results["errors"].append(f"session {index}: closed {e}")
+    except Exception as e:
+        results["errors"].append(f"session {index}: {e!r}")
+    finally:
+        results["sessions"].append(stats)
+
+
+async def server_stats(client):
+    return (await client.get("/api/ai/voice/stats")).json()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent voice sessions")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds each session streams after ramp-up")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which sessions are opened")
+    parser.add_argument("--wav", help="16 kHz mono 16-bit WAV to use as speech (default: synthetic)")
+    parser.add_argument("--utterance", type=float, default=1.5, help="seconds of speech per turn (synthetic)")
+    parser.add_argument("--pause", type=float, default=4.0, help="seconds of silence after each utterance")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="audio per WebSocket frame")
+    parser.add_argument("--interrupt-rate", type=float, default=0.1, help="share of replies interrupted")
+    parser.add_argument("--timeout", type=float, default=20.0)
+    args = parser.parse_args()
+
+    if args.wav:
+        audio = load_wav(args.wav)
+        step = int(args.utterance * SAMPLE_RATE) * 2
+        utterances = [audio[i:i + step] for i in range(0, max(len(audio) - step, 0) + 1, step)] or [audio]
+    else:
+        utterances = [synthetic_speech(args.utterance, seed) for seed in range(8)]
+
+    results = {"connected": 0, "rejected": 0, "errors": [], "connect_ms": [], "sessions": []}
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        before = await server_stats(client)
+        started = time.perf_counter()
+        deadline = started + args.ramp + args.duration
+
+        async def delayed(index):
+            await asyncio.sleep(args.ramp * index / max(args.sessions, 1))
+            await run_session(index, args, utterances, deadline, results)
+
+        tasks = [asyncio.create_task(delayed(i)) for i in range(args.sessions)]
+
+        # Server cost is measured while every session is up
+        window_start = started + args.ramp + min(2.0, args.duration / 4)
+        window_end = deadline - min(1.0, args.duration / 4)
+        await asyncio.sleep(max(0.0, window_start - time.perf_counter()))
+        first = await server_stats(client)
+        first_at = time.perf_counter()
+        await asyncio.sleep(max(0.0, window_end - time.perf_counter()))
+        second = await server_stats(client)
+        second_at = time.perf_counter()
+
+        await asyncio.gather(*tasks)
+        after = await server_stats(client)
+        latency = (await client.get("/api/ai/voice/latency")).json()
+    elapsed = time.perf_counter() - started
+
+    sessions = results["sessions"]
+    latencies = [value for s in sessions for value in s.latencies]
+    print(f"{args.sessions} voice sessions over {elapsed:.1f}s: {results['connected']} connected, "
+          f"{results['rejected']} rejected at capacity, {len(results['errors'])} errors")
+    for name, values in (("connect", results["connect_ms"]), ("turn_latency", latencies)):
+        if values:
+            print(f"  {name:14s} n={len(values):5d}  p50={statistics.median(values):7.1f}ms  "
+                  f"p95={percentile(values, 95):7.1f}ms  p99={percentile(values, 99):7.1f}ms  max={max(values):7.1f}ms")
+    print(f"  turns completed {sum(s.turns_completed for s in sessions)}, "
+          f"interrupts sent {sum(s.interrupts_sent for s in sessions)}, "
+          f"interrupted acks {sum(s.interrupted for s in sessions)}")
+    frames = sum(s.frames for s in sessions)
+    missing = sum(s.missing_frames for s in sessions)
+    dropped_ms = after["outbound"]["audio_ms_dropped"] - before["outbound"]["audio_ms_dropped"]
+    print(f"  audio frames received {frames}, missing from sequence {missing}, "
+          f"dropped by server for slow clients {dropped_ms:.0f}ms")
+
+    live = first["admission"]["active"]
+    if live and second_at > first_at:
+        cpu = (second["process"]["cpu_seconds"] - first["process"]["cpu_seconds"]) / (second_at - first_at)
+        print(f"Server with {live} live sessions: {cpu * 100:.1f}% CPU, {cpu * 100 / live:.2f}% CPU per session")
+        if first["process"]["rss_mb"] is not None and before["process"]["rss_mb"] is not None:
+            rss = first["process"]["rss_mb"] - before["process"]["rss_mb"]
+            print(f"  RSS {first['process']['rss_mb']:.0f}MB, +{rss:.0f}MB over idle, {rss / live:.2f}MB per session")
+    server_turns = latency["metrics"]["speech_end_to_first_audio_sent"]
+    print(f"Server-side speech end -> first audio sent: p50={server_turns['p50_ms']}ms p95={server_turns['p95_ms']}ms")
+    for error in results["errors"][:10]:
+        print(f"  ! {error}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -7,6 +7,7 @@ export interface Transaction {
   category: string;
   date: string;
   type: 'income' | 'expense';
+  receipt_image?: string | null;
 }
 
 export interface Budget {
@@ -187,13 +188,14 @@ class ApiService {
 
   /**
    * Stream financial advice from the AI backend.
-   * Returns an async generator yielding text chunks.
+   * Parses the Server-Sent Events stream and yields each text chunk as it arrives.
    */
   async *streamFinancialAdvice(prompt: string): AsyncGenerator<string, void, unknown> {
     const response = await fetch(`${this.apiBaseUrl}/api/ai/chat/stream`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        Accept: 'text/event-stream',
       },
       body: JSON.stringify({ prompt }),
     });
@@ -212,9 +214,28 @@ class ApiService {
       done = streamDone;
       if (value) {
         buffer += decoder.decode(value, { stream: true });
-        // Yield each chunk as soon as it arrives
-        yield buffer;
-        buffer = '';
+      }
+
+      // Events are separated by a blank line; keep any partial event in the buffer
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        let eventType = 'message';
+        const dataLines: string[] = [];
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event:')) {
+            eventType = line.slice(6).trim();
+          } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(line.startsWith('data: ') ? 6 : 5));
+          }
+        }
+
+        if (eventType === 'message' || eventType === 'error') {
+          yield dataLines.join('\n');
+        }
       }
     }
   }